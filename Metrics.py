@@ -1,16 +1,28 @@
 import os
 import csv
 import json
+import argparse
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from tqdm import tqdm
 from common.config import road_params
-from typing import Dict, List
+from src.Recorder import read_frames, EXTENSIONS, UUIDS_SUFFIX
+from src.Columnar import Recording
+from src.ResultCache import ResultCache
+from typing import Dict, List, Optional
 
 pd.options.mode.chained_assignment = None
 
+# Bump when flow_metrics or average_calculator change, the cached results of older versions are not reused
+METRICS_VERSION = "1"
+CACHE_FOLDER = ".metrics_cache" # inside the folder of the recordings
+CACHE_BYTES = 1 << 30 # cache size after eviction
+FLOW_COLUMNS = ['frame', 'section', 'num_vehicles', 'space_mean_speed', 'traffic_flow']
+
 
 def loc_conversion(value: float) -> float:
 
@@ -26,21 +38,108 @@ def loc_conversion(value: float) -> float:
     return value*2
 
 
-def assign_section(location: float) -> int:
+def load_recording(record_path: str) -> Dict[str, np.ndarray]:
 
-    """Assign vehicle to section of the motorway
+    """Loads the frame, x-coordinate and speed of every recorded vehicle as numeric arrays.
+    Columnar recordings are read from their columns directly
 
     Args:
-        location (float): x-coordinate of vehicle
+        record_path (str): .rec, .jsonl or .json recording
 
     Returns:
-        int: section index
+        Dict[str, np.ndarray]: frame, location (x-coordinate) and speed columns
+
+    Raises:
+        ValueError: if the file is not a recording
     """
 
-    return int(location[0]//loc_conversion(1000))
+    if record_path.endswith(EXTENSIONS['columnar']):
+        recording = Recording(record_path)
+        return {
+            'frame': np.asarray(recording.frame, dtype=np.int64),
+            'location': recording.x.astype(np.float64),
+            'speed': recording.speed.astype(np.float64),
+        }
+
+    # Collecting the columns one frame at a time
+    frames, locations, speeds = [], [], []
+    try:
+        for frame_key, frame_data in read_frames(record_path):
+            frames.append(np.full(len(frame_data), frame_key, dtype=np.int64))
+            locations.extend([vehicle['location'][0] for vehicle in frame_data])
+            speeds.extend([vehicle['speed'] for vehicle in frame_data])
+    except (KeyError, IndexError, TypeError, AttributeError) as error:
+        # Frames without vehicle locations and speeds, e.g. a json file that is not a recording
+        raise ValueError(f"{record_path} is not a recording") from error
+
+    return {
+        'frame': np.concatenate(frames) if frames else np.zeros(0, dtype=np.int64),
+        'location': np.array(locations, dtype=np.float64),
+        'speed': np.array(speeds, dtype=np.float64),
+    }
+
+
+def flow_metrics(recording: Dict[str, np.ndarray]) -> pd.DataFrame:
+
+    """Computes the density, space mean speed and traffic flow of every section in every frame.
+    Rows are grouped by an integer (frame, section) code and aggregated with np.bincount
 
+    Args:
+        recording (Dict[str, np.ndarray]): frame, location and speed columns of load_recording
 
-def interval_plots(flow_df: pd.DataFrame) -> None:
+    Returns:
+        pd.DataFrame: frame, section, num_vehicles, space_mean_speed and traffic_flow
+        of every occupied section, in order of appearance in the recording
+    """
+
+    frame, location = recording['frame'], recording['location']
+    if len(frame) == 0:
+        return pd.DataFrame({'frame': frame, 'section': frame, 'num_vehicles': frame,
+                             'space_mean_speed': location, 'traffic_flow': location})
+
+    # Converting pixel/s to km/h
+    speed = recording['speed'] * (3600/2000)
+
+    # Assign the sections, floor of the quotient corrected where the division rounded up
+    section_length = loc_conversion(1000)
+    section = np.floor(location / section_length).astype(np.int64)
+    section -= section * section_length > location
+    min_frame, min_section = frame.min(), section.min()
+    num_sections = int(section.max() - min_section) + 1
+    code = (frame - min_frame) * num_sections + (section - min_section)
+
+    # Counting the vehicles and summing the reciprocal speeds per (frame, section)
+    with np.errstate(divide='ignore'):
+        reciprocal_speed = 1 / speed
+    num_groups = int(frame.max() - min_frame + 1) * num_sections
+    counts = np.bincount(code, minlength=num_groups)
+    reciprocal_sum = np.bincount(code, weights=reciprocal_speed, minlength=num_groups)
+
+    # Occupied (frame, section) codes in order of their first row
+    first_row = np.full(num_groups, len(frame))
+    np.minimum.at(first_row, code, np.arange(len(frame)))
+    first_row = np.sort(first_row[counts > 0])
+    occupied = code[first_row]
+
+    # Computing space mean speed and traffic flow
+    num_vehicles = counts[occupied]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        space_mean_speed = num_vehicles / reciprocal_sum[occupied]
+    traffic_flow = space_mean_speed * num_vehicles
+
+    # Data clean up
+    valid = ~np.isnan(traffic_flow)
+
+    return pd.DataFrame({
+        'frame': frame[first_row][valid],
+        'section': (occupied % num_sections + min_section)[valid],
+        'num_vehicles': num_vehicles[valid],
+        'space_mean_speed': space_mean_speed[valid],
+        'traffic_flow': traffic_flow[valid],
+    })
+
+
+def interval_plots(flow_df: pd.DataFrame, plot_name: str) -> None:
 
     """Creating metric vs timestep plots forsections involving
     0, 1: Before on-ramp
@@ -50,6 +149,7 @@ def interval_plots(flow_df: pd.DataFrame) -> None:
 
     Args:
         flow_df (pd.DataFrame): dataframe of vehicle parameters
+        plot_name (str): path of the saved figure without the extension
     """
 
     intervals_to_plot = [0,1,2,3,4,7,8,14,15]
@@ -94,17 +194,17 @@ def interval_plots(flow_df: pd.DataFrame) -> None:
     plt.tight_layout()
 
     # Save the figure as a single image
-    plot_name = filename.replace(".json", "").replace("data/","")
     plt.savefig(f'{plot_name}.png', dpi=300)
-    print("Saved timesteps")
+    plt.close(fig)
 
 
-def fundamental_plots(flow_df: pd.DataFrame) -> None:
+def fundamental_plots(flow_df: pd.DataFrame, plot_name: str) -> None:
 
     """Creating fundamental plots
 
     Args:
         flow_df (pd.DataFrame): dataframe of vehicle parameters
+        plot_name (str): path of the saved figure without the extension
     """
 
     # Fundamental Diagrams
@@ -159,20 +259,18 @@ def fundamental_plots(flow_df: pd.DataFrame) -> None:
     # Adjust layout and display plots
     plt.tight_layout()
 
-    # Save the figure as a single image
-    plot_name2 = filename.replace(".json", "").replace("data/","")
-
-    # Change filename and format as needed
-    plt.savefig(f'{plot_name2}_plots.png', dpi=300)
-    print("Saved fundamental")
+    # Save the figure as a single image, change filename and format as needed
+    plt.savefig(f'{plot_name}_plots.png', dpi=300)
+    plt.close(fig)
 
 
-def metrics_plots(flow_df: pd.DataFrame) -> None:
+def metrics_plots(flow_df: pd.DataFrame, plot_name: str) -> None:
 
     """Creating fundamental plots without traffic model
 
     Args:
         flow_df (pd.DataFrame): dataframe of vehicle parameters
+        plot_name (str): path of the saved figure without the extension
     """
 
     # Find the indices of the maximum values for space_mean_speed and num_vehicles
@@ -258,11 +356,11 @@ def metrics_plots(flow_df: pd.DataFrame) -> None:
     # Adjust layout and display plots
     plt.tight_layout()
     # Save the figure as a single image
-    plot_name3 = filename.replace(".json", "").replace("data/","")
-    plt.savefig(f'{plot_name3}_points.png', dpi=300)
+    plt.savefig(f'{plot_name}_points.png', dpi=300)
+    plt.close(fig)
 
 
-def average_calculator(flow_df: pd.DataFrame) -> Dict[List[float]]:
+def average_calculator(flow_df: pd.DataFrame) -> Dict[int, List[float]]:
 
     """Computing averaged metrics
 
@@ -302,12 +400,12 @@ def saving_csv(csv_name: str, data: List[Dict[int, List[float]]]) -> None:
     """Saving data into csv file
 
     Args:
-        csv_name (str): _description_
+        csv_name (str): path of the csv file
         data (List[Dict[int, List[float]]]): metric data
     """
 
     # Extract headers from the dictionary
-    headers = list(average_data[0].keys())
+    headers = list(data[0].keys())
 
     # Write data to the CSV file
     with open(csv_name, mode='w', newline='') as csv_file:
@@ -317,74 +415,212 @@ def saving_csv(csv_name: str, data: List[Dict[int, List[float]]]) -> None:
         csv_writer.writeheader()
 
         # Write values from each dictionary
-        for data_dict in average_data:
+        for data_dict in data:
             # Write values
             for i in range(len(data_dict[0])):
                 row_data = {header: data_dict[header][i] for header in headers}
                 csv_writer.writerow(row_data)
 
 
-# Main executing section
-folderpath = "data/"
-average_data = []
-print("Getting metrics")
+def plot_name(record_path: str) -> str:
+
+    """Gets the name of the plots of a recording, saved in the working directory
+
+    Args:
+        record_path (str): recording
+
+    Returns:
+        str: path of the plots without the suffix and extension
+    """
+
+    return os.path.splitext(os.path.basename(record_path))[0]
+
+
+def plots_saved(record_path: str) -> bool:
 
-# Iterate through the files in the folder
-for filename in tqdm(os.listdir(folderpath), desc="Files"):
-    if filename.endswith('.json'):
-        json_path = os.path.join(folderpath, filename)
+    """Checks if the interval, fundamental and metrics plots of a recording exist
 
-        # Read JSON file
-        with open(json_path, 'r') as json_file:
-            json_data = json.load(json_file)
+    Args:
+        record_path (str): recording
+
+    Returns:
+        bool: True if all plots exist
+    """
+
+    name = plot_name(record_path)
+    return all(os.path.exists(f"{name}{suffix}.png") for suffix in ("", "_plots", "_points"))
 
-        # Convert data to a flat list of dictionaries
-        flat_data = []
-        for frame_key, frame_data in json_data.items():
-            for vehicle in frame_data:
-                flat_data.append({
-                    'frame': int(frame_key),
-                    'uuid': vehicle['uuid'],
-                    'vehicle_type': vehicle['vehicle_type'],
-                    'location': vehicle['location'],
-                    'speed': vehicle['speed'],
-                    'timestamp': vehicle['timestamp']
-                })
 
-        # Create a DataFrame from the flat data
-        initdf = pd.DataFrame(flat_data)
+def cached_summary(entry: Dict[str, np.ndarray]) -> Dict[int, List[float]]:
 
-        df = initdf.copy()
-        df = df.drop(columns=['vehicle_type', 'timestamp'])
+    """Reads the average_calculator summary of a cache entry
 
-        # Assign the sections
-        df['section'] = df['location'].apply(assign_section)
+    Args:
+        entry (Dict[str, np.ndarray]): cache entry with a JSON 'summary' array
+
+    Returns:
+        Dict[int, List[float]]: section -> [average speed, average density, average flow]
+    """
 
-        # Converting pixel/s to km/h
-        df['speed'] *= (3600/2000)
+    return {int(section): values for section, values in json.loads(str(entry['summary'])).items()}
+
+
+def analyze_file(record_path: str, plots: bool = False, cache_folder: Optional[str] = None,
+                 cache_key: Optional[str] = None) -> Dict[int, List[float]]:
+
+    """Computes the averaged metrics of a recording, optionally saving its plots
+    in the working directory under the name of the recording.
+    With a cache folder, the flow table and summary are reused while the recording is unchanged
+
+    Args:
+        record_path (str): .rec, .jsonl or .json recording
+        plots (bool): saves the interval, fundamental and metrics plots
+        cache_folder (Optional[str]): ResultCache folder, the recording is always processed if None
+        cache_key (Optional[str]): cache key of the recording, hashed from its content if None
+
+    Returns:
+        Dict[int, List[float]]: section -> [average speed, average density, average flow],
+        section 16 holds the averages over all sections
+    """
 
-        # Counting the number of unique vehicles per section
-        df['num_vehicles'] = df.groupby(['frame', 'section'])['uuid'].transform('count')
-        df['section'] = df['location'].apply(assign_section)
+    cache = None if cache_folder is None else ResultCache(cache_folder, version=METRICS_VERSION)
+    if cache is not None and cache_key is None:
+        cache_key = cache.file_key(record_path)
+    entry = None if cache is None else cache.load(cache_key)
 
-        # Computing space mean speed and traffic flow
-        df['reciprocal_speed'] = 1 / df['speed']
-        flow_df = df.drop_duplicates(subset=['frame', 'section','uuid'])
-        flow_df['space_mean_speed_denom'] = flow_df.groupby(['frame', 'section'])['reciprocal_speed'].transform('sum')
-        flow_df['space_mean_speed'] = flow_df['num_vehicles'] / flow_df['space_mean_speed_denom']
-        flow_df['traffic_flow'] = flow_df['space_mean_speed'] * flow_df['num_vehicles']
+    if entry is None:
+        flow_df = flow_metrics(load_recording(record_path))
+        summary = average_calculator(flow_df=flow_df)
+        if cache is not None:
+            arrays = {column: flow_df[column].to_numpy() for column in FLOW_COLUMNS}
+            cache.store(cache_key, {**arrays, 'summary': np.array(json.dumps(summary))})
+    else:
+        flow_df = pd.DataFrame({column: entry[column] for column in FLOW_COLUMNS})
+        summary = cached_summary(entry)
 
-        # Data clean up
-        flow_df = flow_df.drop_duplicates(subset=['frame', 'section'])
-        flow_df.dropna(subset=['traffic_flow'], inplace=True)
+    # The plots of an unchanged recording are only rendered again if they are missing
+    if plots and (entry is None or not plots_saved(record_path)):
+        name = plot_name(record_path)
+        interval_plots(flow_df=flow_df, plot_name=name)
+        fundamental_plots(flow_df=flow_df, plot_name=name)
+        metrics_plots(flow_df=flow_df, plot_name=name)
 
-        interval_plots(flow_df=flow_df)
+    return summary
+
+
+def try_analyze_file(record_path: str, plots: bool = False, cache_folder: Optional[str] = None,
+                     cache_key: Optional[str] = None) -> Optional[Dict[int, List[float]]]:
+
+    """Runs analyze_file, a file that is not a recording is skipped instead of aborting the folder
+
+    Args:
+        record_path (str): .rec, .jsonl or .json recording
+        plots (bool): saves the interval, fundamental and metrics plots
+        cache_folder (Optional[str]): ResultCache folder, the recording is always processed if None
+        cache_key (Optional[str]): cache key of the recording, hashed from its content if None
+
+    Returns:
+        Optional[Dict[int, List[float]]]: averaged metrics of the recording, None if skipped
+    """
+
+    try:
+        return analyze_file(record_path, plots, cache_folder, cache_key)
+    except ValueError as error:
+        print(f"Skipping {record_path}: {error}")
+        return None
+
+
+def analyze_folder(folderpath: str, workers: Optional[int] = None, plots: bool = True, csv_name: Optional[str] = None,
+                   cache: bool = True, cache_bytes: int = CACHE_BYTES) -> List[Dict[int, List[float]]]:
+
+    """Analyzes every recording of a folder in parallel worker processes,
+    the plots are rendered by the workers and the averaged metrics are saved to a csv file.
+    Recordings that are unchanged since the last run are read from the cache in the folder
+
+    Args:
+        folderpath (str): folder of the recordings
+        workers (Optional[int]): number of worker processes, defaults to the number of CPUs, 1 runs in this process
+        plots (bool): saves the plots of every recording
+        csv_name (Optional[str]): path of the csv file, defaults to averaged_data.csv in the folder
+        cache (bool): reuses and stores the results in the CACHE_FOLDER of the folder
+        cache_bytes (int): size of the cache after the least recently used results are evicted
+
+    Returns:
+        List[Dict[int, List[float]]]: averaged metrics of each recording, in the order of os.listdir.
+        Files that are not recordings are skipped
+    """
+
+    record_paths = [
+        os.path.join(folderpath, filename) for filename in os.listdir(folderpath)
+        if filename.endswith(tuple(EXTENSIONS.values())) and not filename.endswith(UUIDS_SUFFIX)
+    ]
+    average_data = [None] * len(record_paths)
+    cache_folder, cache_keys = None, [None] * len(record_paths)
+
+    # Reading the summaries of the unchanged recordings
+    if cache:
+        cache_folder = os.path.join(folderpath, CACHE_FOLDER)
+        result_cache = ResultCache(cache_folder, version=METRICS_VERSION, max_bytes=cache_bytes)
+        cache_keys = [result_cache.file_key(record_path) for record_path in record_paths]
+        result_cache.save_index()
+
+        for idx, (record_path, cache_key) in enumerate(zip(record_paths, cache_keys)):
+            if not plots or plots_saved(record_path):
+                entry = result_cache.load(cache_key, names=['summary'])
+                average_data[idx] = None if entry is None else cached_summary(entry)
+
+    pending = [idx for idx, summary in enumerate(average_data) if summary is None]
+    if cache:
+        print(f"{len(record_paths) - len(pending)} recordings unchanged, {len(pending)} to process")
+
+    pending_paths = [record_paths[idx] for idx in pending]
+    pending_keys = [cache_keys[idx] for idx in pending]
+    workers = min(workers or os.cpu_count(), max(len(pending), 1))
+
+    if workers == 1:
+        results = map(try_analyze_file, pending_paths, repeat(plots), repeat(cache_folder), pending_keys)
+        summaries = list(tqdm(results, total=len(pending), desc="Files"))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(try_analyze_file, pending_paths, repeat(plots), repeat(cache_folder), pending_keys)
+            summaries = list(tqdm(results, total=len(pending), desc="Files"))
+
+    for idx, summary in zip(pending, summaries):
+        average_data[idx] = summary
+    # Files that are not recordings are left out
+    average_data = [summary for summary in average_data if summary is not None]
+
+    if cache:
+        result_cache.evict()
+
+    if average_data:
+        saving_csv(csv_name=csv_name or os.path.join(folderpath, "averaged_data.csv"), data=average_data)
+
+    return average_data
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    """Command line entry point, e.g. python Metrics.py data/ --workers 8
+
+    Args:
+        argv (Optional[List[str]]): command line arguments, defaults to sys.argv
+    """
 
-        fundamental_plots(flow_df=flow_df)
+    parser = argparse.ArgumentParser(description="Computes the traffic metrics of the recordings in a folder")
+    parser.add_argument("folderpath", nargs="?", default="data/", help="folder of the recordings")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the number of CPUs")
+    parser.add_argument("--no-plots", dest="plots", action="store_false", help="skips the plots")
+    parser.add_argument("--csv", dest="csv_name", default=None, help="csv file, defaults to averaged_data.csv in the folder")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="processes every recording again")
+    parser.add_argument("--cache-size", type=int, default=CACHE_BYTES >> 20, help="cache size in MB")
+    args = parser.parse_args(argv)
 
-        metrics_plots(flow_df=flow_df)
+    print("Getting metrics")
+    analyze_folder(args.folderpath, workers=args.workers, plots=args.plots, csv_name=args.csv_name,
+                   cache=args.cache, cache_bytes=args.cache_size << 20)
+    print("Metrics Saved")
 
-        average_data.append(average_calculator(flow_df=flow_df))
 
-saving_csv(csv_name="data/averaged_data.csv", data=average_data)
-print("Metrics Saved")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
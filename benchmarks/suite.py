@@ -0,0 +1,399 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+from src.ACC import Convoy
+from src.Vehicle import Vehicle
+from src.Road import Road
+from src.VectorRoad import VectorRoad
+from src.Simulation import SimulationManager
+from src.SimConfig import SimConfig
+from src.FrameSnapshot import FrameSnapshot
+from src.Recorder import create_recorder, EXTENSIONS
+from common.config import TESTING_PARAMS, length_conversion
+from Metrics import analyze_file
+from typing import Dict, List, Any, Optional, Tuple
+
+SEED = 42 # run seed of every case
+
+# Pre-filled road
+VEHICLE_COUNTS = [100, 500, 1000, 3000]
+SPACING = length_conversion(40) # distance between the pre-filled vehicles of a lane
+WARMUP_FRAMES = 20 # frames stepped before measuring
+TIMED_FRAMES = 100
+REPEATS = 3 # the fastest repeat is reported
+
+# Headless runs, until num_vehicles despawned like Test.run_test
+INFLOWS = sorted({testing_list[4] for testing_list in TESTING_PARAMS.values()})
+MIXES = {"shc_only": 0., "convoy_heavy": 0.6} # acc_spawnrate, at the default vehicle inflow
+MAX_FRAMES = 20000 # stops a headless run that never reaches num_vehicles
+
+# Synthetic recordings analyzed by Metrics.py
+RECORD_FORMATS = ["jsonl", "json", "columnar"]
+SYNTHETIC_FRAMES = 600
+SYNTHETIC_VEHICLES = 500
+
+# Smaller workloads of --quick, results are only comparable to other --quick results
+QUICK = {
+    "vehicle_counts": [100, 500],
+    "timed_frames": 20,
+    "repeats": 1,
+    "num_vehicles": 10,
+    "road_length": length_conversion(4000),
+    "synthetic_frames": 100,
+}
+
+# Throughput of each case, a drop beyond the threshold is a regression
+THROUGHPUT_KEYS = ("steps_per_s", "vehicle_steps_per_s", "rows_per_s")
+# Workload of each case, identical between runs of the same settings
+WORKLOAD_KEYS = ("vehicles", "frames", "vehicle_steps", "rows")
+THRESHOLD = 0.1
+
+
+def count_vehicles(road: Road) -> int:
+
+    """Counts the vehicles on the road, including the sub-convoy vehicles of ACC
+
+    Args:
+        road (Road): road of the simulation
+
+    Returns:
+        int: number of vehicles
+    """
+
+    return sum(vehicle.num_subconvoy if isinstance(vehicle, Convoy) else 1 for vehicle in road.vehicle_list)
+
+
+def prefilled_road(config: SimConfig, count: int) -> Road:
+
+    """Creates a road with count SHC vehicles spread evenly over the motorway lanes.
+    Spawning is off and the road is long enough that no vehicle despawns while measured
+
+    Args:
+        config (SimConfig): base parameters
+        count (int): number of vehicles
+
+    Returns:
+        Road: road of the engine of the config
+    """
+
+    per_lane = -(-count // (config.num_lanes - 1))
+    config = config.update(vehicle_inflow=0, onramp_inflow=0, road_closed=None, testing=False,
+                           road_length=per_lane * SPACING + length_conversion(2000))
+
+    road = VectorRoad(config) if config.engine == 'vector' else Road(config)
+    lanes = [config.toplane_loc[1] + lane * config.lanewidth for lane in range(1, config.num_lanes)]
+
+    # Front vehicles first, in the order they would have spawned
+    for idx in reversed(range(count)):
+        x = config.toplane_loc[0] + (idx // len(lanes)) * SPACING
+        spawn_loc = [x, lanes[idx % len(lanes)]]
+        road.add_vehicle(Vehicle(config=config, logic_dict=config.shc_logic_dict, spawn_loc=spawn_loc, vehicle_type='shc',
+                                 rng=road.speed_rng))
+
+    return road
+
+
+def bench_prefilled(config: SimConfig, count: int, timed_frames: int, repeats: int) -> Dict[str, float]:
+
+    """Measures Road.update_vehicle on a pre-filled road
+
+    Args:
+        config (SimConfig): base parameters
+        count (int): number of vehicles
+        timed_frames (int): frames per repeat
+        repeats (int): number of repeats
+
+    Returns:
+        Dict[str, float]: workload and throughput of the fastest repeat
+    """
+
+    road = prefilled_road(config, count)
+    for _ in range(WARMUP_FRAMES):
+        road.update_vehicle()
+
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(timed_frames):
+            road.update_vehicle()
+        best = min(best, time.perf_counter() - start)
+
+    vehicles = count_vehicles(road)
+
+    return {
+        "vehicles": vehicles,
+        "frames": timed_frames,
+        "step_ms": best / timed_frames * 1000,
+        "steps_per_s": timed_frames / best,
+        "vehicle_steps_per_s": vehicles * timed_frames / best,
+    }
+
+
+def bench_headless(config: SimConfig) -> Dict[str, float]:
+
+    """Measures a headless run of the SimulationManager, without recording,
+    until num_vehicles vehicles despawned
+
+    Args:
+        config (SimConfig): parameters of the run
+
+    Returns:
+        Dict[str, float]: workload and throughput of the run
+    """
+
+    sim = SimulationManager(config.update(record=False, testing=False))
+    road = sim.road
+
+    frame, vehicle_steps, elapsed = 0, 0, 0.
+    while road.vehicle_despawn <= config.num_vehicles and frame < MAX_FRAMES:
+        start = time.perf_counter()
+        sim.update_frame(is_recording=False, frame=frame, restart=False)
+        elapsed += time.perf_counter() - start
+        vehicle_steps += count_vehicles(road)
+        frame += 1
+
+    return {
+        "frames": frame,
+        "vehicle_steps": vehicle_steps,
+        "seconds": elapsed,
+        "steps_per_s": frame / elapsed,
+        "vehicle_steps_per_s": vehicle_steps / elapsed,
+    }
+
+
+def synthetic_recording(config: SimConfig, record_format: str, num_frames: int, folderpath: str) -> str:
+
+    """Writes a recording of random vehicles with the recorder of a format
+
+    Args:
+        config (SimConfig): base parameters
+        record_format (str): jsonl, json or columnar
+        num_frames (int): number of frames
+        folderpath (str): folder of the recording
+
+    Returns:
+        str: path of the recording
+    """
+
+    config = config.update(record_format=record_format, folderpath=folderpath)
+    rng = np.random.default_rng(SEED)
+    lanes = [config.toplane_loc[1] + lane * config.lanewidth for lane in range(1, config.num_lanes)]
+    ids = list(range(SYNTHETIC_VEHICLES))
+    vehicle_types = ['shc'] * SYNTHETIC_VEHICLES
+
+    recorder = create_recorder(config)
+    for frame in range(num_frames):
+        x = rng.uniform(0, config.road_length, SYNTHETIC_VEHICLES)
+        y = rng.choice(lanes, SYNTHETIC_VEHICLES)
+        speed = rng.normal(config.desired_velocity, length_conversion(5), SYNTHETIC_VEHICLES)
+        recorder.write(frame, FrameSnapshot(ids, vehicle_types, x.tolist(), y.tolist(), speed.tolist()))
+
+    filepath = os.path.join(folderpath, f"synthetic{EXTENSIONS[record_format]}")
+    recorder.close(filepath, record_format=record_format)
+
+    return filepath
+
+
+def bench_metrics(config: SimConfig, record_format: str, num_frames: int) -> Dict[str, float]:
+
+    """Measures Metrics.analyze_file on a synthetic recording, without the cache and plots
+
+    Args:
+        config (SimConfig): base parameters
+        record_format (str): jsonl, json or columnar
+        num_frames (int): number of frames
+
+    Returns:
+        Dict[str, float]: workload and throughput of the analysis
+    """
+
+    with tempfile.TemporaryDirectory() as folderpath:
+        filepath = synthetic_recording(config, record_format, num_frames, folderpath)
+        size = os.path.getsize(filepath)
+
+        start = time.perf_counter()
+        analyze_file(filepath)
+        elapsed = time.perf_counter() - start
+
+    rows = num_frames * SYNTHETIC_VEHICLES
+
+    return {
+        "rows": rows,
+        "megabytes": size / 1e6,
+        "seconds": elapsed,
+        "rows_per_s": rows / elapsed,
+        "megabytes_per_s": size / 1e6 / elapsed,
+    }
+
+
+def run_suite(engines: List[str], quick: bool = False, groups: Optional[List[str]] = None) -> Dict[str, Any]:
+
+    """Runs the benchmark cases
+
+    Args:
+        engines (List[str]): simulation engines to measure, object and/or vector
+        quick (bool): runs the smaller workloads of QUICK
+        groups (Optional[List[str]]): prefilled, inflow, mix and/or metrics, all groups if None
+
+    Returns:
+        Dict[str, Any]: settings of the run and the results of each case
+    """
+
+    groups = groups or ["prefilled", "inflow", "mix", "metrics"]
+    settings = {
+        "quick": quick,
+        "seed": SEED,
+        "vehicle_counts": QUICK["vehicle_counts"] if quick else VEHICLE_COUNTS,
+        "timed_frames": QUICK["timed_frames"] if quick else TIMED_FRAMES,
+        "repeats": QUICK["repeats"] if quick else REPEATS,
+        "synthetic_frames": QUICK["synthetic_frames"] if quick else SYNTHETIC_FRAMES,
+    }
+
+    base_config = SimConfig.from_params().update(seed=SEED, record=False, testing=False, onramp_inflow=0, road_closed=None,
+                                                 acc_logic='normal', shc_logic='normal')
+    if quick:
+        base_config = base_config.update(num_vehicles=QUICK["num_vehicles"], road_length=QUICK["road_length"])
+    settings["num_vehicles"] = base_config.num_vehicles
+
+    cases = []
+    for engine in engines:
+        config = base_config.update(engine=engine)
+        if "prefilled" in groups:
+            for count in settings["vehicle_counts"]:
+                cases.append((f"prefilled/{engine}/{count}", bench_prefilled,
+                              (config, count, settings["timed_frames"], settings["repeats"])))
+        if "inflow" in groups:
+            for inflow in INFLOWS:
+                cases.append((f"inflow/{engine}/{inflow}", bench_headless, (config.update(vehicle_inflow=inflow),)))
+        if "mix" in groups:
+            for mix, acc_spawnrate in MIXES.items():
+                cases.append((f"mix/{engine}/{mix}", bench_headless, (config.update(acc_spawnrate=acc_spawnrate),)))
+    if "metrics" in groups:
+        for record_format in RECORD_FORMATS:
+            cases.append((f"metrics/{record_format}", bench_metrics, (base_config, record_format, settings["synthetic_frames"])))
+
+    results = {}
+    for name, bench, args in cases:
+        results[name] = bench(*args)
+        print(format_result(name, results[name]))
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "settings": settings,
+        "results": results,
+    }
+
+
+def format_result(name: str, result: Dict[str, float]) -> str:
+
+    """Formats the throughput of a case
+
+    Args:
+        name (str): case name
+        result (Dict[str, float]): workload and throughput of the case
+
+    Returns:
+        str: one line summary
+    """
+
+    values = [f"{key} {result[key]:,.0f}" for key in THROUGHPUT_KEYS + WORKLOAD_KEYS if key in result]
+
+    return f"{name:<32}" + "  ".join(values)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = THRESHOLD) -> Tuple[List[str], List[str]]:
+
+    """Compares the results of a run with a saved baseline
+
+    Args:
+        baseline (Dict[str, Any]): results of run_suite of the baseline
+        current (Dict[str, Any]): results of run_suite of the run
+        threshold (float): relative drop of a throughput flagged as a regression
+
+    Returns:
+        Tuple[List[str], List[str]]: regressions, and warnings about workloads or settings that differ
+    """
+
+    regressions, warnings = [], []
+    if baseline["settings"] != current["settings"]:
+        warnings.append("settings differ from the baseline, the results are not comparable")
+
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            warnings.append(f"{name}: not in the baseline")
+            continue
+        base = baseline["results"][name]
+
+        for key in WORKLOAD_KEYS:
+            if key in result and result[key] != base.get(key):
+                warnings.append(f"{name}: {key} {base.get(key)} -> {result[key]}, the workload changed")
+
+        for key in THROUGHPUT_KEYS:
+            if key in result and key in base:
+                change = result[key] / base[key] - 1
+                if change < -threshold:
+                    regressions.append(f"{name}: {key} {base[key]:,.0f} -> {result[key]:,.0f} ({change:+.1%})")
+
+    return regressions, warnings
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    """Runs the benchmark suite, saves the results and compares them with a baseline
+
+    Args:
+        argv (Optional[List[str]]): command line arguments, defaults to sys.argv
+
+    Returns:
+        int: exit status, 1 if a regression was found
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmarks the simulation and metrics throughput")
+    parser.add_argument("--output", help="saves the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare with, regressions fail the run")
+    parser.add_argument("--results", help="compares saved JSON results instead of running the suite")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative throughput drop flagged as a regression")
+    parser.add_argument("--engines", nargs="+", default=["object", "vector"], choices=["object", "vector"])
+    parser.add_argument("--groups", nargs="+", choices=["prefilled", "inflow", "mix", "metrics"], help="cases to run, all by default")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads, e.g. to check the suite runs")
+    args = parser.parse_args(argv)
+
+    if args.results is not None:
+        with open(args.results, "r") as file:
+            current = json.load(file)
+    else:
+        current = run_suite(args.engines, quick=args.quick, groups=args.groups)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+    regressions, warnings = compare(baseline, current, threshold=args.threshold)
+
+    for warning in warnings:
+        print(f"WARNING {warning}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
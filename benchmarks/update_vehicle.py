@@ -0,0 +1,93 @@
+import sys
+import time
+import tracemalloc
+
+from src.Road import Road
+from src.SimConfig import SimConfig
+from typing import Callable, Dict, List
+
+# Vehicle inflows (veh/h) to benchmark
+INFLOWS = [1000, 4000, 7000]
+WARMUP_FRAMES = 3000 # frames to fill the road before measuring
+TIMED_FRAMES = 200
+
+
+def traced_blocks(func: Callable[[], None], frames: int) -> Dict[str, float]:
+
+    """Counts the memory blocks allocated by func with tracemalloc snapshots taken before and after
+    the frames. Tracing starts with the first snapshot, so every traced block was allocated by the frames.
+    A block is counted if it is still allocated after the frames, e.g. the new state of a vehicle,
+    blocks allocated and freed again within the frames do not change the snapshots
+
+    Args:
+        func (Callable[[], None]): function to measure, called once per frame
+        frames (int): number of frames
+
+    Returns:
+        Dict[str, float]: allocated blocks and KiB per frame
+    """
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(frames):
+        func()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Excludes the snapshots and this module
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    diffs = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+
+    return {
+        "blocks": sum(diff.count_diff for diff in diffs) / frames,
+        "alloc_kib": sum(diff.size_diff for diff in diffs) / frames / 1024,
+    }
+
+
+def run_inflow(inflow: int) -> Dict[str, float]:
+
+    """Fills a road at the given inflow and measures Road.update_vehicle
+
+    Args:
+        inflow (int): vehicle inflow in veh/h
+
+    Returns:
+        Dict[str, float]: number of vehicles, step time and allocated blocks per frame
+    """
+
+    config = SimConfig.from_params().update(vehicle_inflow=inflow, onramp_inflow=0, road_closed=None, testing=False, seed=0)
+
+    road = Road(config)
+
+    for _ in range(WARMUP_FRAMES):
+        road.update_road(restart=False)
+
+    start = time.perf_counter()
+    for _ in range(TIMED_FRAMES):
+        road.update_vehicle()
+    step_time = (time.perf_counter() - start) / TIMED_FRAMES
+
+    return {
+        "inflow": inflow,
+        "vehicles": len(road.vehicle_list),
+        "step_ms": step_time * 1000,
+        **traced_blocks(road.update_vehicle, TIMED_FRAMES),
+    }
+
+
+def main(inflows: List[int]) -> None:
+
+    """Prints the Road.update_vehicle benchmark for each inflow
+
+    Args:
+        inflows (List[int]): vehicle inflows in veh/h
+    """
+
+    print(f"{'inflow':>8} {'vehicles':>9} {'step ms':>9} {'blocks/frame':>13} {'KiB/frame':>10}")
+    for inflow in inflows:
+        result = run_inflow(inflow)
+        print(f"{result['inflow']:>8} {result['vehicles']:>9} {result['step_ms']:>9.2f} {result['blocks']:>13.1f} {result['alloc_kib']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or INFLOWS)
@@ -76,6 +76,7 @@ road_params = {
     "onramp_inflow": 0,
     "num_convoy_vehicles": 3,
     "road_closed": None,
+    "arrival_process": "deterministic", # toggle deterministic/poisson headways of the spawn arrivals
 }
 
 # Safety threshold = 1.5m
@@ -112,10 +113,47 @@ vehicle_models = [shc_params, acc_params]
 # Min ts = 0.01, playback_speed = 1
 simulation_params = {
     "ts": 0.1,
-    "playback_speed": 2,
+    "seed": 42, # run seed, the random streams of the Road are derived from it
+    "playback_speed": 2, # simulation steps per rendered frame, does not affect the headless Test run
     "folderpath": "data",
     "num_vehicles": 100,
     "filename": f"ACC{driving_params['acc_logic']}_SHC{driving_params['shc_logic']}_RoadNo_RampIn{road_params['onramp_inflow']}_VehIn{road_params['vehicle_inflow']}",
     "record": True, # Default False
-    "testing": True # Default False
-}
\ No newline at end of file
+    "testing": True, # Default False
+    "engine": "object", # toggle object/vector
+    "record_format": "jsonl", # toggle jsonl/json/columnar, json exports the whole recording when saving
+    "flush_frames": 100, # recorded frames held in memory before they are written to disk
+    "record_queue": 64, # recorded frames waiting for the background writer
+    "record_backpressure": "block", # toggle block/drop, drop skips recorded frames when the queue is full
+    "export_uuids": False, # saves a <recording>.uuids.json mapping of the integer vehicle ids to uuid strings
+    # Virtual loop detectors, (start, end) x-coords of each measured section, an empty list disables them
+    # Defaults to 1km sections around the 4 real time metric locations of the Window
+    "detector_sections": [(length_conversion(500), length_conversion(1500)), (length_conversion(2500), length_conversion(3500)),
+                          (length_conversion(7500), length_conversion(8500)), (length_conversion(15498), length_conversion(16498))],
+    "detector_interval": 1.0, # seconds of simulation time aggregated per detector value
+    "profile": False, # records the time of each phase of every frame, summarised at the end of a test
+    "profile_trace": None, # per-frame phase timings file, .csv or ndjson otherwise, None disables the trace
+}
+
+# Test combinations of main.py and the benchmark suite
+# List = [ACC Logic, SHC Logic, Road Closure, On-ramp Flow, Vehicle Inflow]
+TESTING_PARAMS = {
+    0: ['normal', 'normal', None, 0, 4000],
+    1: ['cautious', 'normal', None, 0, 4000],
+    2: ['cautious', 'irrational', None, 0, 4000],
+    3: ['normal', 'normal', None, 0, 4000],
+    4: ['normal', 'irrational', None, 0, 4000],
+    5: ['normal', 'normal', "left", 0, 4000],
+    6: ['normal', 'normal', "middle", 0, 4000],
+    7: ['normal', 'normal', "right", 0, 4000],
+    8: ['normal', 'normal', None, 50, 4000],
+    9: ['normal', 'normal', None, 100, 4000],
+    10: ['normal', 'normal', None, 150, 4000],
+    11: ['normal', 'normal', None, 200, 4000],
+    12: ['normal', 'normal', None, 0, 1000],
+    13: ['normal', 'normal', None, 0, 2000],
+    14: ['normal', 'normal', None, 0, 3000],
+    15: ['normal', 'normal', None, 0, 5000],
+    16: ['normal', 'normal', None, 0, 6000],
+    17: ['normal', 'normal', None, 0, 7000],
+}
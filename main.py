@@ -1,71 +1,30 @@
-import time
-
 from src.Window import Window
-from src.Test import Test
-from common.config import *
-from typing import List, Dict, Union
+from src.Sweep import run_sweep
+from src.SimConfig import SimConfig
+from common.config import TESTING_PARAMS
+from typing import List, Dict, Union, Optional
 
 TESTING_FLAG = False
-
-# List = [ACC Logic, SHC Logic, Road Closure, On-ramp Flow, Vehicle Inflow]
-TESTING_PARAMS = {
-    0: ['normal', 'normal', None, 0, 4000],
-    1: ['cautious', 'normal', None, 0, 4000],
-    2: ['cautious', 'irrational', None, 0, 4000],
-    3: ['normal', 'normal', None, 0, 4000],
-    4: ['normal', 'irrational', None, 0, 4000],
-    5: ['normal', 'normal', "left", 0, 4000],
-    6: ['normal', 'normal', "middle", 0, 4000],
-    7: ['normal', 'normal', "right", 0, 4000],
-    8: ['normal', 'normal', None, 50, 4000],
-    9: ['normal', 'normal', None, 100, 4000],
-    10: ['normal', 'normal', None, 150, 4000],
-    11: ['normal', 'normal', None, 200, 4000],
-    12: ['normal', 'normal', None, 0, 1000],
-    13: ['normal', 'normal', None, 0, 2000],
-    14: ['normal', 'normal', None, 0, 3000],
-    15: ['normal', 'normal', None, 0, 5000],
-    16: ['normal', 'normal', None, 0, 6000],
-    17: ['normal', 'normal', None, 0, 7000],
-}
+NUM_WORKERS = None # Parallel test workers, None uses all CPUs
 
 
-def load_testing(testing_params: Dict[int, List[Union[str, int, None]]]) -> None:
+def load_testing(testing_params: Dict[int, List[Union[str, int, None]]], base_config: Optional[SimConfig] = None,
+                 num_workers: Optional[int] = NUM_WORKERS) -> None:
 
-    """Loads a series of tests with different combinations of parameters
+    """Loads a series of tests with different combinations of parameters.
+    Each combination runs in its own worker process with its own config snapshot and seed,
+    combinations whose recording already exists in the data folder are skipped
 
     Args:
         testing_params (Dict[int, List[Union[str, int, None]]]): contains different
         combinations of parameters for testing.
         The key represents the combination number,
         and the value is a list of parameters for that combination.
+        base_config (Optional[SimConfig]): parameters shared by all combinations, defaults to common/config.py
+        num_workers (Optional[int]): number of worker processes, defaults to the number of CPUs
     """
 
-    start = time.time()
-
-    for combination, testing_list in testing_params.items():
-        print("----------------------")
-        print("Testing Combination:", combination)
-
-        start_time = time.time()
-        road_params["vehicle_inflow"] = testing_list[4]
-        road_params["onramp_inflow"] = testing_list[3]
-        road_params["road_closed"] = testing_list[2]
-        driving_params["shc_logic"] = testing_list[1]
-        driving_params["acc_logic"] = testing_list[0]
-        acc_params["acc_spawnrate"] = 0 if combination == 0 else 0.2
-        simulation_params["filename"] = f"ACC{driving_params['acc_logic']}_SHC{driving_params['shc_logic']}_RoadNo_RampIn{road_params['onramp_inflow']}_VehIn{road_params['vehicle_inflow']}"
-
-        test = Test()
-        test.run_test()
-
-        end_time = time.time()
-        print(f"Combination {combination} took {end_time-start_time}")
-
-    end = time.time()
-    print("============================")
-    print(f"Simulation Ended: {end-start}")
-    print("============================")
+    run_sweep(testing_params=testing_params, base_config=base_config, num_workers=num_workers)
 
 
 def main() -> None:
@@ -76,15 +35,14 @@ def main() -> None:
     otherwise it runs the simulation normally with the user interface.
     """
 
-    simulation_params['record'] = TESTING_FLAG
-    simulation_params['testing'] = TESTING_FLAG
+    config = SimConfig.from_params().update(record=TESTING_FLAG, testing=TESTING_FLAG)
 
     # Run the simulation for the various testing parameters
     if TESTING_FLAG:
-        load_testing(testing_params=TESTING_PARAMS)
+        load_testing(testing_params=TESTING_PARAMS, base_config=config)
     else:
         # Just run the simulation
-        win = Window()
+        win = Window(config)
         win.run_window()
 
 
@@ -1,91 +1,131 @@
+import numpy as np
+
+from bisect import bisect_left
 from src.Vehicle import Vehicle
-from common.config import simulation_params, driving_params, window_params
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 class Convoy:
 
-    """A class instance to represent ACC
+    """A class instance to represent ACC as a rigid block.
+    The lead vehicle is driven by the IDM and the sub-convoy vehicles follow
+    at fixed offsets of convoy_dist behind it
     """
 
-    def __init__(self, logic_dict: Dict[str, float], lead_spawn_loc: List[float], vehicle_type: str, num_subconvoy: int) -> None:
+    def __init__(self, config: Any, logic_dict: Dict[str, float], lead_spawn_loc: List[float], vehicle_type: str, num_subconvoy: int,
+                 rng: Optional[np.random.Generator] = None, v: Optional[float] = None) -> None:
 
         """Creates a Convoy instance with 3 vehicles
 
         Args:
+            config (Any): SimConfig of the simulation run
             logic_dict (Dict[str, float]): the level of driving cautiousness
             lead_spawn_loc (List[float]): x,y coordinates of the spawn location
             vehicle_type (str): a vehicle type descriptor
             num_subconvoy (int): number of sub-convoy in ACC
+            rng (Optional[np.random.Generator]): speed stream of the Road, samples the starting speed of the lead vehicle if v is not given
+            v (Optional[float]): starting speed of the lead vehicle
+        """
+
+        self.ts = config.ts
+
+        # Lead vehicle state
+        self.lead_vehicle = Vehicle(config, logic_dict, lead_spawn_loc, vehicle_type=vehicle_type, rng=rng, v=v)
+        self.driver = self.lead_vehicle.driver
+        self.vehicle_type = vehicle_type
+
+        # Sub-convoy vehicles, from the lead to the tail
+        self.num_subconvoy = num_subconvoy
+        self.convoy_dist = logic_dict.get('safe_headway') + config.safety_threshold + self.lead_vehicle.veh_length
+        self.spacing = [idx * self.convoy_dist for idx in range(num_subconvoy)]
+        self.offsets = [0.] * num_subconvoy # Sub-convoy vehicles share the spawn location until the first update
+        self.sub_ids = [None] * num_subconvoy # integer id of each sub-convoy vehicle, issued by the Road when the convoy spawns
+
+        self.update_extents()
+
+
+    def update_extents(self) -> None:
+
+        """Updates the convoy-level params seen by the surrounding vehicles
         """
 
-        self.ts = simulation_params['ts']
-
-        # Creating the convoy
-        self.convoy_list = [
-            Vehicle(logic_dict, lead_spawn_loc, vehicle_type=vehicle_type)
-            for _ in range(num_subconvoy)
-        ]
-
-        # Initialize convoy-level params
-        self.lead_vehicle = self.convoy_list[0]
-        self.tail_vehicle = self.convoy_list[-1]
-        self.loc_front = self.lead_vehicle.loc_front
-        self.loc_back = self.tail_vehicle.loc_back
-        self.loc = lead_spawn_loc
-        self.v = self.lead_vehicle.v
+        lead = self.lead_vehicle
+        self.v = lead.v
+        self.loc_front = lead.loc_front
+        self.loc_back = lead.loc[0] - self.offsets[-1] - lead.veh_length/2
         self.veh_length = abs(self.loc_front - self.loc_back)
-        self.convoy_dist = logic_dict.get('safe_headway') + driving_params['safety_threshold'] + window_params['vehicle_length']
+        self.loc = [self.loc_front - self.veh_length/2, lead.loc[1]]
 
 
-    def update_convoy_local(self, vehicle_list: List[Any], vehicle_type: str) -> None:
+    def update_convoy_local(self, lane_index: Any, vehicle_type: str) -> None:
 
         """Updates the convoy local parameters
 
         Args:
-            vehicle_list (List[Any]): list of Vehicle and Convoy instances
+            lane_index (Any): LaneIndex of the Vehicle and Convoy instances on the road
             vehicle_type (str): a vehicle type descriptor
         """
 
-        for idx, vehicle in enumerate(self.convoy_list):
-            if idx == 0: # lead vehicle
-                vehicle.update_local(vehicle_list, vehicle_type=vehicle_type)
-            elif len(self.convoy_list) > 1: # update subconvoy
-                # Update position
-                vehicle.local_loc[1] = self.convoy_list[idx-1].local_loc[1]
-                vehicle.local_loc[0] = self.convoy_list[idx-1].local_loc[0] - self.convoy_dist
-
-                # Update driving params
-                vehicle.local_v = self.convoy_list[idx-1].local_v
-                vehicle.local_accel = self.convoy_list[idx-1].local_accel
+        self.lead_vehicle.update_local(lane_index, vehicle_type=vehicle_type, exclude=self)
 
 
     def update_convoy_global(self) -> None:
 
-        """Updates the convoy global parameters and convoy-level parameters
+        """Updates the lead global parameters and convoy-level parameters
         """
 
-        for idx, vehicle in enumerate(self.convoy_list):
-            if idx == 0: # lead vehicle
-                vehicle.update_global()
-                self.v = vehicle.v
-            elif len(self.convoy_list) > 1:
-                # Update driving params
-                vehicle.v = vehicle.local_v
-
-                # Update position
-                new_x = self.convoy_list[idx-1].local_loc[0] - self.convoy_dist
-                new_y = self.convoy_list[idx-1].local_loc[1]
-                vehicle.loc = [new_x, new_y]
-                vehicle.loc_front = vehicle.loc[0] + (vehicle.veh_length/2)
-                vehicle.loc_back = vehicle.loc[0] - (vehicle.veh_length/2)
-
-        # Convoy Level Params
-        self.lead_vehicle = self.convoy_list[0]
-        self.tail_vehicle = self.convoy_list[-1]
-        self.loc_front = self.lead_vehicle.loc_front
-        self.loc_back = self.tail_vehicle.loc_back
-        self.veh_length = abs(self.loc_front - self.loc_back)
-        new_x_convoy = self.loc_front - self.veh_length/2
-        new_y_convoy = self.lead_vehicle.loc[1]
-        self.loc = [new_x_convoy, new_y_convoy]
\ No newline at end of file
+        self.lead_vehicle.update_global()
+        self.offsets = self.spacing
+        self.update_extents()
+
+
+    def count_despawned(self, road_length: float) -> int:
+
+        """Counts the sub-convoy vehicles that reached the end of the road
+
+        Args:
+            road_length (float): x-coord of the end of the road
+
+        Returns:
+            int: number of sub-convoy vehicles past the end, counted from the lead
+        """
+
+        return bisect_left(self.offsets, self.loc_front - road_length)
+
+
+    def despawn_subconvoy(self, num_despawn: int) -> None:
+
+        """Removes sub-convoy vehicles at the front of the convoy,
+        the first remaining sub-convoy vehicle becomes the lead
+
+        Args:
+            num_despawn (int): number of sub-convoy vehicles to remove
+        """
+
+        lead = self.lead_vehicle
+        shift = self.offsets[num_despawn]
+
+        lead.loc = [lead.loc[0] - shift, lead.loc[1]]
+        lead.local_loc = list(lead.loc)
+        lead.loc_front = lead.loc[0] + lead.veh_length/2
+        lead.loc_back = lead.loc[0] - lead.veh_length/2
+
+        self.num_subconvoy -= num_despawn
+        self.spacing = self.spacing[:self.num_subconvoy]
+        self.offsets = self.offsets[:self.num_subconvoy]
+        self.sub_ids = self.sub_ids[num_despawn:]
+
+        self.update_extents()
+
+
+    def subconvoy_x(self) -> List[float]:
+
+        """Gets the x-coords of the sub-convoy vehicles, derived from the lead
+
+        Returns:
+            List[float]: x-coord of every sub-convoy vehicle, from the lead to the tail
+        """
+
+        lead_x = self.lead_vehicle.loc[0]
+
+        return [lead_x - offset for offset in self.offsets]
@@ -0,0 +1,155 @@
+import heapq
+import numpy as np
+
+from typing import List, Tuple
+
+# Spawn sources, due arrivals of the same frame are handled in this order
+MAIN_ROAD = 'main'
+ONRAMP = 'onramp'
+SOURCES = (MAIN_ROAD, ONRAMP)
+
+BATCH_SIZE = 64 # headways generated at a time per source
+EPSILON = 1e-6 # seconds, absorbs the rounding of the summed headways when comparing with the simulated time
+
+
+class ArrivalSchedule:
+
+    """Precomputed arrivals of the spawn sources. The next arrival of every source is held in a
+    small heap, so a frame only touches the arrivals that are due. The headways are deterministic
+    (the spawn interval) or Poisson (exponential with the spawn interval as mean), generated in
+    batches, and the schedule of a source is only rebuilt when its spawn interval changes
+    """
+
+    def __init__(self, rng: np.random.Generator, process: str = "deterministic") -> None:
+
+        """Initializing an empty schedule
+
+        Args:
+            rng (np.random.Generator): arrival stream of the Road, samples the Poisson headways
+            process (str): "deterministic" or "poisson" headways
+        """
+
+        if process not in ("deterministic", "poisson"):
+            raise ValueError(f"Unknown arrival process {process}, expected deterministic or poisson")
+
+        self.rng = rng
+        self.process = process
+        self.heap = [] # (arrival time, source), at most one arrival per source
+        self.intervals = {} # source -> mean headway in seconds
+        self.anchors = {} # source -> time the next headway is counted from
+        self.headways = {} # source -> batch of headways
+        self.positions = {} # source -> next unused headway of the batch
+
+
+    def configure(self, source: str, interval: float, now: float) -> None:
+
+        """Sets the spawn interval of a source, the schedule is only rebuilt if it changed.
+        An active source keeps counting from its last arrival, a new source from now
+
+        Args:
+            source (str): spawn source
+            interval (float): mean headway in seconds, the source is removed if not positive
+            now (float): simulated time
+        """
+
+        if interval == self.intervals.get(source, 0):
+            return
+
+        self.remove(source)
+        if interval <= 0:
+            self.intervals.pop(source, None)
+            self.anchors.pop(source, None)
+            return
+
+        self.intervals[source] = interval
+        self.headways[source], self.positions[source] = self.generate(interval), 0
+        anchor = self.anchors.setdefault(source, now)
+        heapq.heappush(self.heap, (anchor + self.next_headway(source), source))
+
+
+    def generate(self, interval: float) -> np.ndarray:
+
+        """Generates a batch of headways
+
+        Args:
+            interval (float): mean headway in seconds
+
+        Returns:
+            np.ndarray: BATCH_SIZE headways
+        """
+
+        if self.process == "poisson":
+            return self.rng.exponential(interval, BATCH_SIZE)
+
+        return np.full(BATCH_SIZE, interval)
+
+
+    def next_headway(self, source: str) -> float:
+
+        """Takes the next headway of a source, a new batch is generated when the batch is used up
+
+        Args:
+            source (str): spawn source
+
+        Returns:
+            float: headway in seconds
+        """
+
+        if self.positions[source] == BATCH_SIZE:
+            self.headways[source], self.positions[source] = self.generate(self.intervals[source]), 0
+
+        headway = self.headways[source][self.positions[source]]
+        self.positions[source] += 1
+
+        return float(headway)
+
+
+    def remove(self, source: str) -> None:
+
+        """Removes the pending arrival of a source
+
+        Args:
+            source (str): spawn source
+        """
+
+        heap = [entry for entry in self.heap if entry[1] != source]
+        if len(heap) != len(self.heap):
+            heapq.heapify(heap)
+            self.heap = heap
+
+
+    def due(self, now: float) -> List[Tuple[float, str]]:
+
+        """Pops the arrivals that are due, every source must be rescheduled with
+        schedule_next after its arrival is handled
+
+        Args:
+            now (float): simulated time
+
+        Returns:
+            List[Tuple[float, str]]: arrival time and source of the due arrivals, in the order of SOURCES
+        """
+
+        arrivals = []
+        while self.heap and self.heap[0][0] <= now + EPSILON:
+            arrivals.append(heapq.heappop(self.heap))
+
+        return sorted(arrivals, key=lambda arrival: SOURCES.index(arrival[1]))
+
+
+    def schedule_next(self, source: str, now: float, arrivals: int = 1) -> None:
+
+        """Schedules the next arrival of a source after an arrival
+
+        Args:
+            source (str): spawn source
+            now (float): time of the arrival the next headway is counted from
+            arrivals (int): arrivals taken up by the arrival, e.g. a convoy counts as one per vehicle
+        """
+
+        anchor = now
+        for _ in range(arrivals - 1):
+            anchor += self.next_headway(source)
+        self.anchors[source] = anchor
+        heapq.heappush(self.heap, (anchor + self.next_headway(source), source))
+
@@ -0,0 +1,328 @@
+import atexit
+import json
+import os
+import shutil
+import struct
+import tempfile
+import numpy as np
+
+from typing import List, Dict, Any, Iterator, Tuple
+
+MAGIC = b"SIMREC1\n"
+ALIGNMENT = 64 # bytes, start of the column data and of every column
+
+# Per-row columns, one row per vehicle per recorded frame
+COLUMNS = (
+    ("frame", "<i4"),
+    ("vehicle_id", "<i4"), # integer id issued by the Road
+    ("vehicle_type", "u1"), # index into VEHICLE_TYPES
+    ("x", "<f4"), # x-coord of the middle of the vehicle
+    ("lane", "u1"), # 0 = onramp, 1 = left lane, ...
+    ("speed", "<f4"),
+)
+
+# Per-frame columns, the rows of frames[i] are frame_offsets[i]:frame_offsets[i+1]
+FRAME_COLUMNS = (
+    ("frames", "<i4"),
+    ("frame_offsets", "<i8"),
+)
+
+VEHICLE_TYPES = ("shc", "acc")
+
+
+def aligned(offset: int) -> int:
+
+    """Rounds an offset up to the column alignment
+
+    Args:
+        offset (int): byte offset
+
+    Returns:
+        int: aligned byte offset
+    """
+
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class ColumnarRecorder:
+
+    """Streams the recorded frames to one binary file per column while recording,
+    and joins them with a JSON header into a single .rec file when closed.
+    Only the frames since the last flush are held in memory
+    """
+
+    def __init__(self, folderpath: str, flush_frames: int, config: Any) -> None:
+
+        """Opens the column files in a working folder inside the recording folder
+
+        Args:
+            folderpath (str): folder of the recordings
+            flush_frames (int): number of frames buffered before they are written to disk
+            config (Any): SimConfig of the recorded simulation, saved in the header
+        """
+
+        os.makedirs(folderpath, exist_ok=True)
+        self.workdir = tempfile.mkdtemp(suffix=".rec.part", dir=folderpath)
+        self.flush_frames = flush_frames
+        self.config = config
+        self.toplane_y = config.toplane_loc[1]
+        self.lanewidth = config.lanewidth
+
+        self.files = {
+            name: open(os.path.join(self.workdir, name), "wb")
+            for name, _ in COLUMNS + FRAME_COLUMNS
+        }
+        self.buffer = {name: [] for name, _ in COLUMNS + FRAME_COLUMNS} # column name -> chunks since the last flush
+        self.type_codes = {vehicle_type: code for code, vehicle_type in enumerate(VEHICLE_TYPES)}
+        self.num_rows = 0
+        self.num_frames = 0
+        self.buffered_frames = 0
+        self.bytes_written = 0
+
+        self.buffer['frame_offsets'].append(np.zeros(1, dtype="<i8"))
+
+        # Joins the frames written so far into a .rec file if the simulation stops without saving
+        atexit.register(self.recover)
+
+
+    def write(self, frame: int, snapshot: Any) -> None:
+
+        """Appends a frame to the recording
+
+        Args:
+            frame (int): frame index
+            snapshot (Any): FrameSnapshot of the vehicle attributes of the frame
+        """
+
+        buffer = self.buffer
+        num_vehicles = len(snapshot)
+
+        buffer['frame'].append(np.full(num_vehicles, frame, dtype="<i4"))
+        buffer['vehicle_id'].append(snapshot.ids.astype("<i4"))
+        buffer['vehicle_type'].append(np.array([self.type_codes[vehicle_type] for vehicle_type in snapshot.vehicle_types], dtype="u1"))
+        buffer['x'].append(snapshot.x.astype("<f4"))
+        buffer['lane'].append(np.rint((snapshot.y - self.toplane_y) / self.lanewidth).astype("u1"))
+        buffer['speed'].append(snapshot.speed.astype("<f4"))
+
+        self.num_rows += num_vehicles
+        self.num_frames += 1
+        buffer['frames'].append(np.array([frame], dtype="<i4"))
+        buffer['frame_offsets'].append(np.array([self.num_rows], dtype="<i8"))
+
+        self.buffered_frames += 1
+        if self.buffered_frames >= self.flush_frames:
+            self.flush()
+
+
+    def flush(self) -> None:
+
+        """Writes the buffered frames to the column files
+        """
+
+        for name, dtype in COLUMNS + FRAME_COLUMNS:
+            chunks = self.buffer[name]
+            if chunks:
+                values = np.concatenate(chunks).astype(dtype, copy=False)
+                values.tofile(self.files[name])
+                self.bytes_written += values.nbytes
+                chunks.clear()
+            self.files[name].flush()
+
+        self.buffered_frames = 0
+
+
+    def reset(self) -> None:
+
+        """Discards the recorded frames, e.g. when the simulation restarts
+        """
+
+        for name, _ in COLUMNS + FRAME_COLUMNS:
+            self.buffer[name].clear()
+            self.files[name].seek(0)
+            self.files[name].truncate()
+
+        self.num_rows, self.num_frames, self.buffered_frames, self.bytes_written = 0, 0, 0, 0
+        self.buffer['frame_offsets'].append(np.zeros(1, dtype="<i8"))
+
+
+    def header(self) -> Dict[str, Any]:
+
+        """Describes the columns and the recorded simulation
+
+        Returns:
+            Dict[str, Any]: header of the .rec file, column offsets are relative to the column data
+        """
+
+        columns, offset = {}, 0
+        for name, dtype in COLUMNS + FRAME_COLUMNS:
+            length = self.num_frames + 1 if name == 'frame_offsets' else (
+                self.num_frames if name == 'frames' else self.num_rows)
+            columns[name] = {"dtype": dtype, "offset": offset, "length": length}
+            offset = aligned(offset + length * np.dtype(dtype).itemsize)
+
+        return {
+            "version": 1,
+            "num_rows": self.num_rows,
+            "num_frames": self.num_frames,
+            "columns": columns,
+            "vehicle_types": list(VEHICLE_TYPES),
+            "lanes": {"toplane_y": self.toplane_y, "lanewidth": self.lanewidth},
+            "config": self.config.to_dict(),
+        }
+
+
+    def join(self, filepath: str) -> None:
+
+        """Writes the header and the column files into a single .rec file
+
+        Args:
+            filepath (str): destination of the recording
+        """
+
+        self.flush()
+        header = self.header()
+        header_bytes = json.dumps(header).encode()
+        data_start = aligned(len(MAGIC) + 8 + len(header_bytes))
+
+        with open(filepath, "wb") as file:
+            file.write(MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+            for name, _ in COLUMNS + FRAME_COLUMNS:
+                file.seek(data_start + header['columns'][name]['offset'])
+                self.files[name].close()
+                with open(os.path.join(self.workdir, name), "rb") as column_file:
+                    shutil.copyfileobj(column_file, file)
+            file.truncate()
+
+        shutil.rmtree(self.workdir)
+
+
+    def close(self, filepath: str, record_format: str = "columnar") -> None:
+
+        """Finalizes the recording and moves it to its destination
+
+        Args:
+            filepath (str): destination of the recording
+            record_format (str): only "columnar" is written by this recorder
+        """
+
+        atexit.unregister(self.recover)
+        self.join(filepath)
+
+
+    def recover(self) -> None:
+
+        """Joins the frames written so far into a .rec file next to the working folder
+        """
+
+        self.join(self.workdir[:-len(".part")])
+
+
+class Recording:
+
+    """Reads a .rec file, every column is a NumPy memory map so that frames or
+    vehicles can be sliced without loading the whole file
+    """
+
+    def __init__(self, filepath: str) -> None:
+
+        """Maps the columns of a .rec file
+
+        Args:
+            filepath (str): .rec recording
+        """
+
+        with open(filepath, "rb") as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{filepath} is not a columnar recording")
+            header_length, = struct.unpack("<Q", file.read(8))
+            self.header = json.loads(file.read(header_length))
+
+        data_start = aligned(len(MAGIC) + 8 + header_length)
+        self.config = self.header['config']
+        self.vehicle_types = self.header['vehicle_types']
+        self.num_rows = self.header['num_rows']
+        self.num_frames = self.header['num_frames']
+
+        # Getting the columns as attributes, e.g. recording.speed
+        self.columns = {}
+        for name, column in self.header['columns'].items():
+            if column['length'] == 0:
+                values = np.zeros(0, dtype=column['dtype'])
+            else:
+                values = np.memmap(filepath, dtype=column['dtype'], mode="r",
+                                   offset=data_start + column['offset'], shape=(column['length'],))
+            self.columns[name] = values
+            setattr(self, name, values)
+
+
+    def frame_rows(self, frame: int) -> slice:
+
+        """Gets the rows of a recorded frame
+
+        Args:
+            frame (int): frame index
+
+        Returns:
+            slice: rows of the frame, empty if the frame was not recorded
+        """
+
+        idx = int(np.searchsorted(self.frames, frame))
+        if idx == self.num_frames or self.frames[idx] != frame:
+            return slice(0, 0)
+
+        return slice(int(self.frame_offsets[idx]), int(self.frame_offsets[idx + 1]))
+
+
+    def get_frame(self, frame: int) -> Dict[str, np.ndarray]:
+
+        """Gets the columns of a recorded frame
+
+        Args:
+            frame (int): frame index
+
+        Returns:
+            Dict[str, np.ndarray]: column name -> values of the frame
+        """
+
+        rows = self.frame_rows(frame)
+        return {name: self.columns[name][rows] for name, _ in COLUMNS}
+
+
+    def get_vehicle(self, vehicle_id: int) -> Dict[str, np.ndarray]:
+
+        """Gets the columns of a vehicle over all recorded frames
+
+        Args:
+            vehicle_id (int): integer vehicle id
+
+        Returns:
+            Dict[str, np.ndarray]: column name -> values of the vehicle
+        """
+
+        rows = np.flatnonzero(self.vehicle_id == vehicle_id)
+        return {name: self.columns[name][rows] for name, _ in COLUMNS}
+
+
+    def iter_frames(self) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+
+        """Reads the frames as vehicle attribute dictionaries of the JSON recordings,
+        with the integer vehicle id as uuid
+
+        Yields:
+            Iterator[Tuple[int, List[Dict[str, Any]]]]: frame index, vehicle attributes of the frame
+        """
+
+        lanes = self.header['lanes']
+        for idx, frame in enumerate(self.frames.tolist()):
+            rows = slice(int(self.frame_offsets[idx]), int(self.frame_offsets[idx + 1]))
+            yield frame, [
+                {
+                    'uuid': vehicle_id,
+                    'vehicle_type': self.vehicle_types[vehicle_type],
+                    'location': [x, lanes['toplane_y'] + lane * lanes['lanewidth']],
+                    'speed': speed,
+                }
+                for vehicle_id, vehicle_type, x, lane, speed in zip(
+                    self.vehicle_id[rows].tolist(), self.vehicle_type[rows].tolist(), self.x[rows].tolist(),
+                    self.lane[rows].tolist(), self.speed[rows].tolist())
+            ]
@@ -0,0 +1,213 @@
+import csv
+import warnings
+import numpy as np
+
+from common.config import SCALE
+from typing import Dict, Tuple, Optional, Sequence
+
+# Averaged columns of Detectors.summary, in the order of Metrics.average_calculator
+SUMMARY_COLUMNS = ('space_mean_speed', 'density', 'flow')
+
+
+class Detectors:
+
+    """Virtual loop detectors measuring sections of the motorway while the simulation runs.
+    The space mean speed and flow of every section are computed each step like Metrics.flow_metrics
+    computes them per frame, accumulated with the vehicle counts, and the density, space mean speed
+    and flow are emitted once per interval
+    """
+
+    # Emitted columns, units are veh/km, km/h and veh/h
+    COLUMNS = ('time', 'detector', 'density', 'space_mean_speed', 'mean_speed', 'flow')
+
+    def __init__(self, sections: Sequence[Tuple[float, float]], interval: float, ts: float, road_end: float = np.inf) -> None:
+
+        """Creates the detectors
+
+        Args:
+            sections (Sequence[Tuple[float, float]]): start and end x-coord of each detector section in px
+            interval (float): seconds of simulation time aggregated into each emitted value
+            ts (float): simulation timestep
+            road_end (float): x-coord where the vehicles despawn, sections are measured up to it
+        """
+
+        self.starts = np.array([start for start, _ in sections], dtype=np.float64)
+        self.ends = np.array([end for _, end in sections], dtype=np.float64)
+        # Section bounds in order, a vehicle is inside a section when an odd number of bounds are at or before it
+        self.edges = np.column_stack([self.starts, self.ends]).ravel()
+        if np.any(np.diff(self.edges) < 0):
+            raise ValueError("Detector sections must be ordered by x-coord and must not overlap")
+        # Only the part of a section on the road holds vehicles, sections past the road end
+        # are kept so the detector numbers do not change but only emit NaN
+        self.lengths = (np.minimum(self.ends, road_end) - self.starts) / (SCALE*1000) # km
+        unreachable = self.starts >= road_end
+        if unreachable.any():
+            warnings.warn(f"Detector sections {np.flatnonzero(unreachable).tolist()} start past the end of the road "
+                          "and are not measured", stacklevel=2)
+            self.lengths[unreachable] = np.nan
+        self.interval_steps = max(1, int(round(interval / ts)))
+        self.ts = ts
+
+        self.reset()
+
+
+    def reset(self) -> None:
+
+        """Discards the accumulated and emitted values, e.g. when the simulation restarts
+        """
+
+        num_detectors = len(self.starts)
+        self.counts = np.zeros(num_detectors) # vehicle samples
+        self.speed_sums = np.zeros(num_detectors)
+        self.occupied_steps = np.zeros(num_detectors) # steps with vehicles in the section
+        self.space_mean_sums = np.zeros(num_detectors) # space mean speed of each occupied step
+        self.flow_sums = np.zeros(num_detectors) # flow of each step
+        self.steps = 0
+        self.time = 0.
+        self.emitted = {column: [] for column in self.COLUMNS} # column -> value arrays of each interval
+
+
+    def update(self, x: np.ndarray, speed: np.ndarray) -> bool:
+
+        """Accumulates the vehicles of a step, every vehicle is binned into its section with one
+        search of the section bounds and the sections are summed with np.bincount.
+        The space mean speed of a step is 0 if a vehicle in the section is stopped
+
+        Args:
+            x (np.ndarray): x-coord of every vehicle
+            speed (np.ndarray): speed of every vehicle in px/s
+
+        Returns:
+            bool: True if an interval was emitted
+        """
+
+        num_detectors = len(self.starts)
+        bounds = np.searchsorted(self.edges, x, side='right')
+        inside = (bounds & 1) == 1
+        section, speed = bounds[inside] >> 1, speed[inside]
+
+        moving = speed > 0
+        reciprocal = np.divide(1., speed, out=np.zeros_like(speed), where=moving)
+
+        counts = np.bincount(section, minlength=num_detectors)
+        reciprocal_sums = np.bincount(section, weights=reciprocal, minlength=num_detectors)
+        stopped = np.bincount(section, weights=~moving, minlength=num_detectors)
+
+        # Harmonic mean speed of the step, sections without vehicles add nothing
+        occupied = counts > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            space_mean_speed = np.where(occupied & (stopped == 0), counts / reciprocal_sums, 0.)
+
+        self.counts += counts
+        self.speed_sums += np.bincount(section, weights=speed, minlength=num_detectors)
+        self.occupied_steps += occupied
+        self.space_mean_sums += space_mean_speed
+        self.flow_sums += counts / self.lengths * space_mean_speed
+
+        self.steps += 1
+        self.time += self.ts
+        if self.steps < self.interval_steps:
+            return False
+
+        self.emit()
+        return True
+
+
+    def emit(self) -> None:
+
+        """Aggregates the accumulated interval and resets the accumulators
+        """
+
+        counts = self.counts
+        to_kmh = 3600/(SCALE*1000) # px/s -> km/h
+
+        # Space mean speed over the occupied steps, density and flow over all steps
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density = counts / self.steps / self.lengths
+            space_mean_speed = self.space_mean_sums / self.occupied_steps * to_kmh
+            mean_speed = self.speed_sums / counts * to_kmh
+        space_mean_speed[self.occupied_steps == 0] = np.nan
+        flow = self.flow_sums / self.steps * to_kmh
+
+        values = {
+            'time': np.full(len(counts), round(self.time, 6)),
+            'detector': np.arange(len(counts)),
+            'density': density,
+            'space_mean_speed': space_mean_speed,
+            'mean_speed': mean_speed,
+            'flow': flow,
+        }
+        for column in self.COLUMNS:
+            self.emitted[column].append(values[column])
+
+        self.counts, self.speed_sums = np.zeros_like(counts), np.zeros_like(counts)
+        self.occupied_steps, self.space_mean_sums, self.flow_sums = np.zeros_like(counts), np.zeros_like(counts), np.zeros_like(counts)
+        self.steps = 0
+
+
+    def latest(self) -> Optional[Dict[str, np.ndarray]]:
+
+        """Gets the values of the last emitted interval
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: column -> value of each detector, None before the first interval
+        """
+
+        if not self.emitted['time']:
+            return None
+
+        return {column: values[-1] for column, values in self.emitted.items()}
+
+
+    def series(self) -> Dict[str, np.ndarray]:
+
+        """Gets the emitted time series, one row per detector per interval
+
+        Returns:
+            Dict[str, np.ndarray]: column -> values
+        """
+
+        return {
+            column: np.concatenate(values) if values else np.zeros(0)
+            for column, values in self.emitted.items()
+        }
+
+
+    def summary(self) -> np.ndarray:
+
+        """Averages the emitted intervals like Metrics.average_calculator, intervals without vehicles are skipped
+
+        Returns:
+            np.ndarray: average space mean speed, density and flow of each detector,
+            followed by the averages over all detectors
+        """
+
+        series = self.series()
+        num_detectors = len(self.starts)
+        columns = []
+        for column in SUMMARY_COLUMNS:
+            values = series[column].reshape(-1, num_detectors)
+            valid = ~np.isnan(values)
+            with np.errstate(invalid='ignore'):
+                columns.append(np.where(valid, values, 0.).sum(axis=0) / valid.sum(axis=0))
+        averages = np.stack(columns, axis=1)
+
+        with np.errstate(invalid='ignore'):
+            overall = np.where(np.isnan(averages), 0., averages).sum(axis=0) / (~np.isnan(averages)).sum(axis=0)
+
+        return np.vstack([averages, overall])
+
+
+    def save(self, filepath: str) -> None:
+
+        """Saves the emitted time series as a csv file
+
+        Args:
+            filepath (str): destination csv file
+        """
+
+        series = self.series()
+        with open(filepath, mode='w', newline='') as csv_file:
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(self.COLUMNS)
+            csv_writer.writerows(zip(*(series[column].tolist() for column in self.COLUMNS)))
@@ -1,13 +1,19 @@
 import math
-from typing import Dict, Tuple
+from typing import Dict, Tuple, Any
 
 
 class DriverModel:
 
     """Creating the DriverModel specific to the created vehicle based on
-    the Intelligent Driver Model and the MOBIL lane change model
+    the Intelligent Driver Model and the MOBIL lane change model.
+    Instances are shared by all vehicles of the same driving profile, see DriverModel.profile
     """
 
+    __slots__ = ('v_0', 's_0', 'a', 'b', 'delta', 'T', 'left_bias', 'politeness', 'change_threshold', 'sqrt_ab')
+
+    # (vehicle_type, logic params) -> DriverModel
+    profiles: Dict[Tuple[Any, ...], "DriverModel"] = {}
+
     def __init__(self, model_params: Dict[str, float]) -> None:
 
         """Intializing IDM based on level of driving cautiousness
@@ -25,6 +31,41 @@ class DriverModel:
         self.left_bias = model_params['left_bias'] # Keep left bias
         self.politeness = model_params['politeness'] # Change lane politeness
         self.change_threshold = model_params['change_threshold'] # Change lane threshold
+        self.sqrt_ab = math.sqrt(self.a * self.b) # Constant term of the desired gap
+
+
+    @classmethod
+    def profile(cls, vehicle_type: str, logic_dict: Dict[str, float], config: Any) -> "DriverModel":
+
+        """Gets the DriverModel shared by the vehicles of a vehicle type and driving logic
+
+        Args:
+            vehicle_type (str): a vehicle type descriptor
+            logic_dict (Dict[str, float]): the level of driving cautiousness
+            config (Any): SimConfig of the simulation run
+
+        Returns:
+            DriverModel: shared DriverModel instance
+        """
+
+        model_params = {
+            "v_0": config.desired_velocity,
+            "s_0": config.safety_threshold,
+            "a": config.max_acceleration,
+            "b": config.comfortable_deceleration,
+            "delta": config.acceleration_component,
+            "T": logic_dict.get('safe_headway'),
+            "left_bias": config.left_bias,
+            "politeness": logic_dict.get('politeness_factor'),
+            "change_threshold": config.lane_change_threshold,
+        }
+
+        key = (vehicle_type, *model_params.values())
+        driver = cls.profiles.get(key)
+        if driver is None:
+            driver = cls.profiles[key] = cls(model_params=model_params)
+
+        return driver
 
 
     def calc_acceleration(self, v: float, surrounding_v: float, s: float) -> float:
@@ -41,7 +82,7 @@ class DriverModel:
         """
 
         delta_v = v - surrounding_v
-        s_star = self.s_0 + max(0, self.T * v + (v * delta_v) / (2 * math.sqrt(self.a * self.b)))
+        s_star = self.s_0 + max(0, self.T * v + (v * delta_v) / (2 * self.sqrt_ab))
 
         return (self.a * (1 - math.pow(v/self.v_0, self.delta) - math.pow(s_star/s, 2)))
 
@@ -0,0 +1,348 @@
+import os
+import csv
+import math
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from statistics import NormalDist
+from tqdm import tqdm
+from src.Test import Test
+from src.SimConfig import SimConfig
+from src.Sweep import combination_config, init_worker
+from src.Detectors import SUMMARY_COLUMNS
+from common.config import TESTING_PARAMS
+from typing import List, Dict, Union, Optional, Tuple
+
+CONFIDENCE = 0.95
+REL_WIDTH = 0.05 # half-width of the confidence interval relative to the mean at which a scenario stops
+MIN_REPLICATIONS = 5 # replications before the stopping rule is checked, the t quantile is accurate from 4 degrees of freedom
+MAX_REPLICATIONS = 30
+ENSEMBLE_CSV = "ensemble_summary.csv" # inside the data folder
+
+
+def t_quantile(confidence: float, df: int) -> float:
+
+    """Two-sided quantile of the Student t distribution, from the normal quantile with
+    the Cornish-Fisher expansion (Abramowitz and Stegun 26.7.5)
+
+    Args:
+        confidence (float): confidence level, e.g. 0.95
+        df (int): degrees of freedom
+
+    Returns:
+        float: half-width of the confidence interval in standard errors
+    """
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    terms = [
+        (z**3 + z) / 4,
+        (5*z**5 + 16*z**3 + 3*z) / 96,
+        (3*z**7 + 19*z**5 + 17*z**3 - 15*z) / 384,
+        (79*z**9 + 776*z**7 + 1482*z**5 - 1920*z**3 - 945*z) / 92160,
+    ]
+
+    return z + sum(term / df**power for power, term in enumerate(terms, start=1))
+
+
+class RunningStats:
+
+    """Streaming mean and variance of the replication summaries with Welford's algorithm,
+    the summaries are merged one at a time and not stored
+    """
+
+    def __init__(self, shape: Tuple[int, ...]) -> None:
+
+        """Initializing the accumulators
+
+        Args:
+            shape (Tuple[int, ...]): shape of a replication summary
+        """
+
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape) # sum of squared differences from the mean
+
+
+    def update(self, values: np.ndarray) -> None:
+
+        """Merges the summary of a replication
+
+        Args:
+            values (np.ndarray): replication summary
+        """
+
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+
+    @property
+    def std(self) -> np.ndarray:
+
+        """Sample standard deviation, NaN before the second replication
+        """
+
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+
+        return np.sqrt(self.m2 / (self.count - 1))
+
+
+    def half_width(self, confidence: float = CONFIDENCE) -> np.ndarray:
+
+        """Half-width of the confidence interval of the mean
+
+        Args:
+            confidence (float): confidence level
+
+        Returns:
+            np.ndarray: half-width of every summary value, NaN before the second replication
+        """
+
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+
+        return t_quantile(confidence, self.count - 1) * self.std / math.sqrt(self.count)
+
+
+    def converged(self, rel_width: float, confidence: float = CONFIDENCE) -> bool:
+
+        """Checks if the averages over all detectors are within the requested relative width
+
+        Args:
+            rel_width (float): half-width relative to the mean
+            confidence (float): confidence level
+
+        Returns:
+            bool: True if every finite average is precise enough
+        """
+
+        mean, half_width = self.mean[-1], self.half_width(confidence)[-1]
+        finite = np.isfinite(mean) & np.isfinite(half_width)
+        if not finite.any():
+            return False
+
+        return bool(np.all(half_width[finite] <= rel_width * np.abs(mean[finite])))
+
+
+def replication_seed(seed: int, combination: int, replication: int) -> int:
+
+    """Derives the run seed of a replication, independent of the other replications and combinations
+
+    Args:
+        seed (int): base seed
+        combination (int): combination number
+        replication (int): replication number
+
+    Returns:
+        int: run seed
+    """
+
+    return int(np.random.SeedSequence([seed, combination, replication]).generate_state(1)[0])
+
+
+def run_replication(combination: int, replication: int, config: SimConfig) -> Tuple[int, int, np.ndarray]:
+
+    """Runs a replication in a worker process, only the detector summary is returned
+
+    Args:
+        combination (int): combination number
+        replication (int): replication number
+        config (SimConfig): parameters of the replication, seeded with its run seed
+
+    Returns:
+        Tuple[int, int, np.ndarray]: combination number, replication number, Detectors.summary
+    """
+
+    test = Test(config)
+    test.run_test(save=False)
+
+    return combination, replication, test.sim.detectors.summary()
+
+
+class Scenario:
+
+    """Replications of a combination, merged in replication order so that the
+    result and the stopping point only depend on the seeds
+    """
+
+    def __init__(self, combination: int, config: SimConfig, num_detectors: int) -> None:
+
+        """Initializing the scenario
+
+        Args:
+            combination (int): combination number
+            config (SimConfig): parameters of the combination
+            num_detectors (int): number of detector sections
+        """
+
+        self.combination = combination
+        self.config = config
+        self.stats = RunningStats((num_detectors + 1, len(SUMMARY_COLUMNS)))
+        self.submitted = 0 # replications handed to the workers
+        self.finished = {} # replication -> summary, waiting for the previous replications
+        self.done = False
+
+
+    def merge(self, replication: int, summary: np.ndarray, min_replications: int, max_replications: int,
+              rel_width: float, confidence: float) -> int:
+
+        """Merges the finished replications in order and applies the stopping rule
+
+        Args:
+            replication (int): replication number
+            summary (np.ndarray): Detectors.summary of the replication
+            min_replications (int): replications before the stopping rule is checked
+            max_replications (int): replications after which the scenario stops
+            rel_width (float): half-width relative to the mean at which the scenario stops
+            confidence (float): confidence level
+
+        Returns:
+            int: number of merged replications
+        """
+
+        self.finished[replication] = summary
+        merged = 0
+        while not self.done and self.stats.count in self.finished:
+            self.stats.update(self.finished.pop(self.stats.count))
+            merged += 1
+            count = self.stats.count
+            if count >= max_replications or (count >= min_replications and self.stats.converged(rel_width, confidence)):
+                self.done = True
+
+        return merged
+
+
+def run_ensemble(testing_params: Dict[int, List[Union[str, int, None]]], base_config: Optional[SimConfig] = None,
+                 num_workers: Optional[int] = None, seed: Optional[int] = None, min_replications: int = MIN_REPLICATIONS,
+                 max_replications: int = MAX_REPLICATIONS, rel_width: float = REL_WIDTH,
+                 confidence: float = CONFIDENCE) -> Dict[int, RunningStats]:
+
+    """Runs replications of every combination in parallel worker processes until the confidence
+    interval of the averages over all detectors is narrow enough, nothing but the summaries is kept
+
+    Args:
+        testing_params (Dict[int, List[Union[str, int, None]]]): combination number -> list of parameters
+        base_config (Optional[SimConfig]): parameters shared by all combinations, defaults to common/config.py
+        num_workers (Optional[int]): number of worker processes, defaults to the number of CPUs
+        seed (Optional[int]): base seed of the replications, defaults to the seed of base_config
+        min_replications (int): replications before the stopping rule is checked
+        max_replications (int): replications after which a combination stops
+        rel_width (float): half-width of the confidence interval relative to the mean at which a combination stops
+        confidence (float): confidence level
+
+    Returns:
+        Dict[int, RunningStats]: combination number -> mean, variance and count of Detectors.summary
+    """
+
+    num_workers = num_workers or os.cpu_count()
+    base_config = SimConfig.from_params() if base_config is None else base_config
+    seed = base_config.seed if seed is None else seed
+    if not base_config.detector_sections:
+        raise ValueError("The ensemble summarises the detectors, detector_sections must not be empty")
+
+    scenarios = {}
+    for combination, testing_list in testing_params.items():
+        config = combination_config(base_config, combination, testing_list).update(record=False, profile=False)
+        scenarios[combination] = Scenario(combination, config, len(config.detector_sections))
+
+    def next_task() -> Optional[Tuple[int, int, SimConfig]]:
+        # The running scenario with the fewest submitted replications
+        running = [scenario for scenario in scenarios.values() if not scenario.done and scenario.submitted < max_replications]
+        if not running:
+            return None
+        scenario = min(running, key=lambda scenario: scenario.submitted)
+        replication = scenario.submitted
+        scenario.submitted += 1
+        config = scenario.config.update(seed=replication_seed(seed, scenario.combination, replication))
+        return scenario.combination, replication, config
+
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker) as executor, \
+            tqdm(total=len(scenarios) * max_replications, desc="Replications") as progress_bar:
+        pending = set()
+        while True:
+            # Keeps every worker busy
+            while len(pending) < num_workers:
+                task = next_task()
+                if task is None:
+                    break
+                pending.add(executor.submit(run_replication, *task))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                combination, replication, summary = future.result()
+                scenario = scenarios[combination]
+                if scenario.done:
+                    continue
+                progress_bar.update(scenario.merge(replication, summary, min_replications, max_replications, rel_width, confidence))
+                if scenario.done:
+                    # Replications beyond the stopping point are not needed
+                    progress_bar.total -= max_replications - scenario.stats.count
+                    progress_bar.refresh()
+
+    return {combination: scenario.stats for combination, scenario in scenarios.items()}
+
+
+def saving_ensemble(csv_name: str, results: Dict[int, RunningStats], confidence: float = CONFIDENCE) -> None:
+
+    """Saves the mean, standard deviation and confidence interval of every combination, detector and metric
+
+    Args:
+        csv_name (str): path of the csv file
+        results (Dict[int, RunningStats]): result of run_ensemble
+        confidence (float): confidence level
+    """
+
+    with open(csv_name, mode='w', newline='') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(['combination', 'detector', 'metric', 'replications', 'mean', 'std', 'ci_half_width'])
+        for combination, stats in results.items():
+            std, half_width = stats.std, stats.half_width(confidence)
+            for row in range(len(stats.mean)):
+                detector = 'all' if row == len(stats.mean) - 1 else row
+                for col, metric in enumerate(SUMMARY_COLUMNS):
+                    csv_writer.writerow([combination, detector, metric, stats.count,
+                                         stats.mean[row, col], std[row, col], half_width[row, col]])
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    """Runs the ensemble of the TESTING_PARAMS combinations and saves the summary
+
+    Args:
+        argv (Optional[List[str]]): command line arguments, defaults to sys.argv
+    """
+
+    parser = argparse.ArgumentParser(description="Replications of the testing combinations with confidence intervals")
+    parser.add_argument("--combinations", nargs="+", type=int, default=sorted(TESTING_PARAMS), help="TESTING_PARAMS combinations")
+    parser.add_argument("--workers", type=int, help="worker processes, defaults to the number of CPUs")
+    parser.add_argument("--seed", type=int, help="base seed, defaults to the seed of common/config.py")
+    parser.add_argument("--min-replications", type=int, default=MIN_REPLICATIONS)
+    parser.add_argument("--max-replications", type=int, default=MAX_REPLICATIONS)
+    parser.add_argument("--rel-width", type=float, default=REL_WIDTH, help="half-width of the confidence interval relative to the mean")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--csv", help="summary csv, defaults to ensemble_summary.csv in the data folder")
+    args = parser.parse_args(argv)
+
+    base_config = SimConfig.from_params()
+    results = run_ensemble({combination: TESTING_PARAMS[combination] for combination in args.combinations},
+                           base_config=base_config, num_workers=args.workers, seed=args.seed,
+                           min_replications=args.min_replications, max_replications=args.max_replications,
+                           rel_width=args.rel_width, confidence=args.confidence)
+
+    for combination, stats in results.items():
+        flow, half_width = stats.mean[-1, -1], stats.half_width(args.confidence)[-1, -1]
+        print(f"Combination {combination}: {stats.count} replications, flow {flow:.1f} +/- {half_width:.1f} veh/h")
+
+    os.makedirs(base_config.folderpath, exist_ok=True)
+    csv_name = args.csv or os.path.join(base_config.folderpath, ENSEMBLE_CSV)
+    saving_ensemble(csv_name, results, confidence=args.confidence)
+    print(f"Ensemble Saved: {csv_name}")
+
+
+if __name__ == "__main__":
+    main()
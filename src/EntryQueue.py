@@ -0,0 +1,111 @@
+from collections import deque
+from typing import Dict, Any
+
+
+class PendingArrival:
+
+    """Lightweight record of a vehicle waiting upstream of the road, the Vehicle
+    or Convoy is only built once the arrival is admitted
+    """
+
+    __slots__ = ('arrival_time', 'vehicle_type', 'logic_dict', 'driver', 'v', 'num_vehicles')
+
+    def __init__(self, arrival_time: float, vehicle_type: str, logic_dict: Dict[str, float], driver: Any, v: float,
+                 num_vehicles: int) -> None:
+
+        """Initializing the record
+
+        Args:
+            arrival_time (float): scheduled time of the arrival
+            vehicle_type (str): a vehicle type descriptor
+            logic_dict (Dict[str, float]): the level of driving cautiousness
+            driver (Any): shared DriverModel of the vehicle, or of the lead vehicle of a convoy
+            v (float): starting speed
+            num_vehicles (int): 1, or the number of sub-convoy vehicles of a convoy
+        """
+
+        self.arrival_time = arrival_time
+        self.vehicle_type = vehicle_type
+        self.logic_dict = logic_dict
+        self.driver = driver
+        self.v = v
+        self.num_vehicles = num_vehicles
+
+
+class EntryQueue:
+
+    """Upstream vertical queue of an entry lane. Arrivals that cannot enter the road safely
+    wait here in arrival order, taking up no road space, so that the vehicles that arrived
+    still enter the road once there is space
+    """
+
+    def __init__(self, source: str, x: float, y: float) -> None:
+
+        """Initializing an empty queue
+
+        Args:
+            source (str): spawn source of the arrivals, see ArrivalSchedule
+            x (float): x-coord of the entry point
+            y (float): y-coord of the entry lane
+        """
+
+        self.source = source
+        self.x = x
+        self.y = y
+
+        self.clear()
+
+
+    def clear(self) -> None:
+
+        """Discards the waiting arrivals and the counters, e.g. when the simulation restarts
+        """
+
+        self.pending = deque()
+        self.arrived = 0 # vehicles, including the sub-convoy vehicles
+        self.entered = 0
+        self.max_waiting = 0 # longest queue in vehicles
+
+
+    def __len__(self) -> int:
+
+        """Number of waiting arrivals
+        """
+
+        return len(self.pending)
+
+
+    @property
+    def waiting(self) -> int:
+
+        """Number of waiting vehicles, including the sub-convoy vehicles
+        """
+
+        return self.arrived - self.entered
+
+
+    def push(self, arrival: PendingArrival) -> None:
+
+        """Adds an arrival to the back of the queue
+
+        Args:
+            arrival (PendingArrival): arrived vehicle
+        """
+
+        self.pending.append(arrival)
+        self.arrived += arrival.num_vehicles
+        self.max_waiting = max(self.max_waiting, self.waiting)
+
+
+    def pop(self) -> PendingArrival:
+
+        """Removes the admitted arrival at the front of the queue
+
+        Returns:
+            PendingArrival: admitted vehicle
+        """
+
+        arrival = self.pending.popleft()
+        self.entered += arrival.num_vehicles
+
+        return arrival
@@ -0,0 +1,69 @@
+import time
+import numpy as np
+
+from typing import List, Dict, Any, Optional
+
+
+class FrameSnapshot:
+
+    """Per-frame state of the vehicles on the road, consumed by the recorder and the renderer.
+    The attributes are copied into arrays so the vehicles can keep moving while the frame
+    is being written, and the frame is timestamped once instead of once per vehicle
+    """
+
+    __slots__ = ('ids', 'vehicle_types', 'x', 'y', 'speed', 'timestamp')
+
+    def __init__(self, ids: List[int], vehicle_types: List[str], x: List[float], y: List[float], speed: List[float]) -> None:
+
+        """Copies the vehicle attributes of a frame
+
+        Args:
+            ids (List[int]): integer id of each vehicle, issued by the Road
+            vehicle_types (List[str]): vehicle type descriptor of each vehicle
+            x (List[float]): x-coord of each vehicle
+            y (List[float]): y-coord of each vehicle
+            speed (List[float]): speed of each vehicle
+        """
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.vehicle_types = vehicle_types
+        self.x = np.array(x, dtype=np.float64)
+        self.y = np.array(y, dtype=np.float64)
+        self.speed = np.array(speed, dtype=np.float64)
+        self.timestamp = time.perf_counter() # higher precision
+
+
+    def __len__(self) -> int:
+
+        """Number of vehicles in the frame
+        """
+
+        return len(self.vehicle_types)
+
+
+    def vehicles(self, uuids: Optional[Dict[int, str]] = None) -> List[Dict[str, Any]]:
+
+        """Gets the vehicle attributes in the schema of the JSON recordings
+
+        Args:
+            uuids (Optional[Dict[int, str]]): integer id -> uuid string, the integer id is used as uuid if not given
+
+        Returns:
+            List[Dict[str, Any]]: uuid, vehicle type, location, speed and timestamp of every vehicle
+        """
+
+        ids = self.ids.tolist()
+        if uuids is not None:
+            ids = [uuids[vehicle_id] for vehicle_id in ids]
+
+        return [
+            {
+                'uuid': vehicle_id,
+                'vehicle_type': vehicle_type,
+                'location': [x, y],
+                'speed': speed,
+                'timestamp': self.timestamp,
+            }
+            for vehicle_id, vehicle_type, x, y, speed in zip(
+                ids, self.vehicle_types, self.x.tolist(), self.y.tolist(), self.speed.tolist())
+        ]
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+
+from dataclasses import dataclass, field
+from src.Simulation import SimulationManager
+from src.SimConfig import SimConfig
+from src.Sweep import combination_config
+from common.config import TESTING_PARAMS, length_conversion
+from typing import Dict, List, Any, Optional
+
+GOLDEN_FOLDER = os.path.join("common", "golden")
+GOLDEN_ENGINE = "object" # reference engine the golden traces are recorded with
+GOLDEN_FRAMES = 1500 # simulated frames of each trace
+GOLDEN_STRIDE = 10 # every GOLDEN_STRIDE-th frame is stored
+# Shorter road so that the onramp merge, the road closure and the despawning are reached within the trace
+GOLDEN_ROAD_LENGTH = length_conversion(4000)
+SEED = 42 # combination i is seeded with SEED + i, like the sweep
+
+# Per-vehicle tolerances, the traces store float32 so the x-coordinate is exact to ~0.004px
+TOLERANCES = {"x": 1e-2, "speed": 1e-2} # px, px/s
+MAX_REPORTED = 10 # vehicles listed in a divergence
+
+
+class Trace:
+
+    """Compact per-frame trajectory of a simulation run, the sampled frames are
+    concatenated into columns and frame k holds the rows offsets[k]:offsets[k+1]
+    """
+
+    COLUMNS = {"ids": np.int32, "x": np.float32, "speed": np.float32, "lane": np.int8}
+
+    def __init__(self, frames: np.ndarray, offsets: np.ndarray, columns: Dict[str, np.ndarray], meta: Dict[str, Any]) -> None:
+
+        """Initializing the trace
+
+        Args:
+            frames (np.ndarray): sampled frame indices
+            offsets (np.ndarray): first row of each sampled frame, followed by the number of rows
+            columns (Dict[str, np.ndarray]): ids, x, speed and lane of every row
+            meta (Dict[str, Any]): engine, seed and parameters of the run
+        """
+
+        self.frames = frames
+        self.offsets = offsets
+        self.columns = columns
+        self.meta = meta
+
+
+    def __len__(self) -> int:
+
+        """Number of sampled frames
+        """
+
+        return len(self.frames)
+
+
+    def frame(self, idx: int) -> Dict[str, np.ndarray]:
+
+        """Gets the vehicles of a sampled frame, sorted by id
+
+        Args:
+            idx (int): index of the sampled frame
+
+        Returns:
+            Dict[str, np.ndarray]: column -> values
+        """
+
+        rows = slice(self.offsets[idx], self.offsets[idx + 1])
+        values = {column: values[rows] for column, values in self.columns.items()}
+        order = np.argsort(values["ids"], kind="stable")
+
+        return {column: values[order] for column, values in values.items()}
+
+
+    def save(self, filepath: str) -> None:
+
+        """Saves the trace as a compressed .npz file
+
+        Args:
+            filepath (str): destination
+        """
+
+        np.savez_compressed(filepath, frames=self.frames, offsets=self.offsets, meta=np.array(json.dumps(self.meta)), **self.columns)
+
+
+    @classmethod
+    def load(cls, filepath: str) -> "Trace":
+
+        """Loads a trace saved by Trace.save
+
+        Args:
+            filepath (str): .npz file
+
+        Returns:
+            Trace: the saved trace
+        """
+
+        with np.load(filepath, allow_pickle=False) as trace:
+            columns = {column: trace[column] for column in cls.COLUMNS}
+            return cls(trace["frames"], trace["offsets"], columns, json.loads(str(trace["meta"])))
+
+
+@dataclass(frozen=True)
+class Divergence:
+
+    """First difference between a reference and a candidate trace
+    """
+
+    frame: int
+    reason: str
+    vehicles: List[Dict[str, Any]] = field(default_factory=list) # id and the reference and candidate values
+
+
+    def __str__(self) -> str:
+
+        """Formats the divergence and the vehicles involved
+        """
+
+        lines = [f"frame {self.frame}: {self.reason}"]
+        lines.extend(f"  {vehicle}" for vehicle in self.vehicles)
+
+        return "\n".join(lines)
+
+
+def golden_config(combination: int, engine: str = GOLDEN_ENGINE, base_config: Optional[SimConfig] = None) -> SimConfig:
+
+    """Builds the SimConfig of a TESTING_PARAMS combination for a trace
+
+    Args:
+        combination (int): combination number
+        engine (str): simulation engine
+        base_config (Optional[SimConfig]): parameters shared by all combinations, defaults to common/config.py
+
+    Returns:
+        SimConfig: parameters of the trace seeded with SEED + combination, without recording, detectors or profiling
+    """
+
+    base_config = SimConfig.from_params() if base_config is None else base_config
+    config = combination_config(base_config, combination, TESTING_PARAMS[combination])
+
+    return config.update(engine=engine, seed=SEED + combination, testing=False, record=False,
+                         road_length=GOLDEN_ROAD_LENGTH, detector_sections=(), profile=False)
+
+
+def record_trace(config: SimConfig, frames: int = GOLDEN_FRAMES, stride: int = GOLDEN_STRIDE) -> Trace:
+
+    """Runs a simulation and samples the vehicles of every stride-th frame
+
+    Args:
+        config (SimConfig): parameters of the run, the engine is config.engine and the run seed config.seed
+        frames (int): number of simulated frames
+        stride (int): frames between the samples
+
+    Returns:
+        Trace: sampled trajectory of the run
+    """
+
+    road = SimulationManager(config).road
+    lane_y = config.toplane_loc[1]
+
+    sampled, offsets, rows = [], [0], {column: [] for column in Trace.COLUMNS}
+    for frame in range(frames):
+        road.update_road(restart=False)
+        if frame % stride != 0:
+            continue
+
+        snapshot = road.frame_snapshot()
+        sampled.append(frame)
+        offsets.append(offsets[-1] + len(snapshot))
+        rows["ids"].append(snapshot.ids)
+        rows["x"].append(snapshot.x)
+        rows["speed"].append(snapshot.speed)
+        rows["lane"].append(np.rint((snapshot.y - lane_y) / config.lanewidth))
+
+    columns = {column: np.concatenate(rows[column]).astype(dtype) for column, dtype in Trace.COLUMNS.items()}
+    meta = {"engine": config.engine, "seed": config.seed, "frames": frames, "stride": stride,
+            "vehicle_inflow": config.vehicle_inflow, "onramp_inflow": config.onramp_inflow,
+            "road_closed": config.road_closed, "acc_logic": config.acc_logic, "shc_logic": config.shc_logic}
+
+    return Trace(np.array(sampled, dtype=np.int32), np.array(offsets, dtype=np.int64), columns, meta)
+
+
+def compare_traces(reference: Trace, candidate: Trace, tolerances: Dict[str, float] = TOLERANCES) -> Optional[Divergence]:
+
+    """Finds the first sampled frame where the candidate differs from the reference
+
+    Args:
+        reference (Trace): trace of the reference engine
+        candidate (Trace): trace of the engine under test
+        tolerances (Dict[str, float]): absolute tolerance of the x-coordinate and speed
+
+    Returns:
+        Optional[Divergence]: first divergence, None if the traces are equivalent
+    """
+
+    if not np.array_equal(reference.frames, candidate.frames):
+        return Divergence(frame=0, reason="the traces sample different frames")
+
+    for idx, frame in enumerate(reference.frames.tolist()):
+        ref, cand = reference.frame(idx), candidate.frame(idx)
+
+        # Spawned and despawned vehicles
+        if not np.array_equal(ref["ids"], cand["ids"]):
+            missing = np.setdiff1d(ref["ids"], cand["ids"]).tolist()
+            extra = np.setdiff1d(cand["ids"], ref["ids"]).tolist()
+            vehicles = [{"id": vehicle_id, "in": "reference"} for vehicle_id in missing]
+            vehicles += [{"id": vehicle_id, "in": "candidate"} for vehicle_id in extra]
+            return Divergence(frame=frame, reason="different vehicles on the road", vehicles=vehicles[:MAX_REPORTED])
+
+        # Lanes must match exactly, positions and speeds within the tolerances
+        wrong = ref["lane"] != cand["lane"]
+        for column, tolerance in tolerances.items():
+            wrong |= np.abs(ref[column].astype(np.float64) - cand[column]) > tolerance
+        if wrong.any():
+            vehicles = [
+                {"id": int(ref["ids"][row]),
+                 **{column: (ref[column][row].item(), cand[column][row].item()) for column in ("x", "speed", "lane")}}
+                for row in np.flatnonzero(wrong)[:MAX_REPORTED]
+            ]
+            return Divergence(frame=frame, reason=f"{int(wrong.sum())} vehicles differ (reference, candidate)", vehicles=vehicles)
+
+    return None
+
+
+def golden_path(combination: int, folderpath: str = GOLDEN_FOLDER) -> str:
+
+    """Gets the golden trace file of a combination
+
+    Args:
+        combination (int): combination number
+        folderpath (str): folder of the golden traces
+
+    Returns:
+        str: .npz file
+    """
+
+    return os.path.join(folderpath, f"comb{combination}.npz")
+
+
+def record_golden(combinations: List[int], folderpath: str = GOLDEN_FOLDER) -> None:
+
+    """Records the golden traces of the reference engine
+
+    Args:
+        combinations (List[int]): combination numbers
+        folderpath (str): folder of the golden traces
+    """
+
+    os.makedirs(folderpath, exist_ok=True)
+    for combination in combinations:
+        trace = record_trace(golden_config(combination))
+        trace.save(golden_path(combination, folderpath))
+        print(f"comb{combination}: {len(trace)} frames, {len(trace.columns['ids'])} rows")
+
+
+def check_engine(engine: str, combinations: List[int], live: bool = False, folderpath: str = GOLDEN_FOLDER) -> bool:
+
+    """Checks an engine against the reference engine for every combination
+
+    Args:
+        engine (str): simulation engine under test
+        combinations (List[int]): combination numbers
+        live (bool): runs the reference engine instead of loading the golden traces
+        folderpath (str): folder of the golden traces
+
+    Returns:
+        bool: True if every combination is equivalent
+    """
+
+    equivalent = True
+    for combination in combinations:
+        if live:
+            reference = record_trace(golden_config(combination))
+        else:
+            reference = Trace.load(golden_path(combination, folderpath))
+        candidate = record_trace(golden_config(combination, engine=engine),
+                                 frames=reference.meta["frames"], stride=reference.meta["stride"])
+
+        divergence = compare_traces(reference, candidate)
+        if divergence is None:
+            print(f"comb{combination}: equivalent over {len(reference)} frames")
+        else:
+            equivalent = False
+            print(f"comb{combination}: diverged at {divergence}")
+
+    return equivalent
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    """Records the golden traces or checks an engine against them
+
+    Args:
+        argv (Optional[List[str]]): command line arguments, defaults to sys.argv
+
+    Returns:
+        int: exit status, 1 if an engine diverged
+    """
+
+    parser = argparse.ArgumentParser(description="Golden-trajectory equivalence of the simulation engines")
+    parser.add_argument("command", choices=["record", "check"], help="record the golden traces or check an engine")
+    parser.add_argument("--engine", default="vector", help="engine checked against the golden traces")
+    parser.add_argument("--combinations", nargs="+", type=int, default=sorted(TESTING_PARAMS), help="TESTING_PARAMS combinations")
+    parser.add_argument("--live", action="store_true", help="runs the reference engine instead of loading the golden traces")
+    parser.add_argument("--folder", default=GOLDEN_FOLDER, help="folder of the golden traces")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record_golden(args.combinations, folderpath=args.folder)
+        return 0
+
+    return 0 if check_engine(args.engine, args.combinations, live=args.live, folderpath=args.folder) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+from bisect import bisect_left, bisect_right
+from src.Vehicle import Vehicle
+from typing import List, Dict, Any, Optional
+
+
+class LaneIndex:
+
+    """Road-level index that keeps the vehicles of each lane sorted by x-coordinate.
+    The surrounding vehicles are found with binary searches instead of a scan of the whole
+    vehicle list, ties are resolved in spawn order like the scan.
+    A Convoy is one entry at the middle of its rigid block
+    """
+
+    def __init__(self) -> None:
+
+        """Initializing an empty index
+        """
+
+        self.keys = {} # lane y-coord -> sorted x-coords
+        self.entries = {} # lane y-coord -> Vehicles and Convoy in the same order as keys
+        self.slots = {} # Vehicle or Convoy -> [lane, x-coord, spawn sequence]
+        self.counter = 0 # spawn sequence, mirrors the order of Road.vehicle_list
+        self.max_length = 0 # longest vehicle or convoy in the index
+
+        # Reused by get_fov so that the per-vehicle search does not allocate
+        self.surrounding = {}
+
+
+    def clear(self) -> None:
+
+        """Removes all vehicles from the index
+        """
+
+        self.keys, self.entries, self.slots = {}, {}, {}
+        self.max_length = 0
+
+
+    def insert(self, vehicle: Any) -> None:
+
+        """Adds a newly spawned vehicle to the index
+
+        Args:
+            vehicle (Any): either a Vehicle or Convoy instance
+        """
+
+        lane, x = vehicle.loc[1], vehicle.loc[0]
+
+        self.slots[vehicle] = [lane, x, self.counter]
+        self.counter += 1
+        self.max_length = max(self.max_length, vehicle.veh_length)
+        self._insert_sorted(vehicle, lane, x)
+
+
+    def remove(self, vehicle: Any) -> None:
+
+        """Removes a despawned vehicle from the index
+
+        Args:
+            vehicle (Any): either a Vehicle or Convoy instance
+        """
+
+        lane, x, _ = self.slots.pop(vehicle)
+        self._remove_sorted(vehicle, lane, x)
+
+
+    def update(self) -> None:
+
+        """Re-sorts the index after the global update of all vehicles.
+        Vehicles rarely overtake within a lane, so the lanes are nearly sorted
+        and only lane changes need to be moved between lanes.
+        The lanes are updated in place to keep the allocations per frame constant
+        """
+
+        changed = []
+        self.max_length = 0
+
+        for lane, keys in self.keys.items():
+            entries = self.entries[lane]
+            kept = 0
+            for idx in range(len(entries)):
+                vehicle = entries[idx]
+                if vehicle.veh_length > self.max_length:
+                    self.max_length = vehicle.veh_length
+                if vehicle.loc[1] == lane:
+                    slot = self.slots[vehicle]
+                    slot[1] = vehicle.loc[0]
+                    keys[kept], entries[kept] = slot[1], vehicle
+                    kept += 1
+                else:
+                    changed.append(vehicle)
+
+            del keys[kept:]
+            del entries[kept:]
+            self._sort_lane(keys, entries)
+
+        for vehicle in changed:
+            slot = self.slots[vehicle]
+            slot[0], slot[1] = vehicle.loc[1], vehicle.loc[0]
+            self._insert_sorted(vehicle, slot[0], slot[1])
+
+
+    def _sort_lane(self, keys: List[float], entries: List[Any]) -> None:
+
+        """Insertion sort of a nearly sorted lane by x-coordinate, ties keep the spawn order
+
+        Args:
+            keys (List[float]): x-coords of the lane
+            entries (List[Any]): Vehicles and Convoy in the same order as keys
+        """
+
+        for idx in range(1, len(keys)):
+            x, vehicle = keys[idx], entries[idx]
+            if keys[idx - 1] < x:
+                continue
+
+            seq = self.slots[vehicle][2]
+            pos = idx - 1
+            while pos >= 0 and (keys[pos] > x or (keys[pos] == x and self.slots[entries[pos]][2] > seq)):
+                keys[pos + 1], entries[pos + 1] = keys[pos], entries[pos]
+                pos -= 1
+            keys[pos + 1], entries[pos + 1] = x, vehicle
+
+
+    def _insert_sorted(self, vehicle: Any, lane: float, x: float) -> None:
+
+        """Inserts a vehicle into its lane, after vehicles with the same x-coordinate
+
+        Args:
+            vehicle (Any): either a Vehicle or Convoy instance
+            lane (float): y-coord of the lane
+            x (float): x-coord of the vehicle
+        """
+
+        keys = self.keys.setdefault(lane, [])
+        entries = self.entries.setdefault(lane, [])
+        idx = bisect_right(keys, x)
+        keys.insert(idx, x)
+        entries.insert(idx, vehicle)
+
+
+    def _remove_sorted(self, vehicle: Any, lane: float, x: float) -> None:
+
+        """Removes a vehicle from its lane
+
+        Args:
+            vehicle (Any): either a Vehicle or Convoy instance
+            lane (float): y-coord of the lane
+            x (float): x-coord of the vehicle when it was last indexed
+        """
+
+        keys, entries = self.keys[lane], self.entries[lane]
+        idx = bisect_left(keys, x)
+        while entries[idx] is not vehicle:
+            idx += 1
+        del keys[idx]
+        del entries[idx]
+
+
+    def _closest(self, lane: float, start: int, stop: int, step: int, exclude: Any) -> Any:
+
+        """Gets the earliest spawned vehicle among the vehicles sharing the first x-coordinate
+        from start towards stop
+
+        Args:
+            lane (float): y-coord of the lane
+            start (int): first index to look at
+            stop (int): index to stop at
+            step (int): search direction
+            exclude (Any): vehicle to ignore
+
+        Returns:
+            Any: closest vehicle or None
+        """
+
+        keys, entries = self.keys[lane], self.entries[lane]
+        closest, closest_x, closest_seq = None, None, None
+
+        for idx in range(start, stop, step):
+            vehicle = entries[idx]
+            if vehicle is exclude:
+                continue
+            if closest is not None and keys[idx] != closest_x:
+                break
+            seq = self.slots[vehicle][2]
+            if closest is None or seq < closest_seq:
+                closest, closest_x, closest_seq = vehicle, keys[idx], seq
+
+        return closest
+
+
+    def get_front(self, vehicle: Vehicle, lane: Optional[float] = None, exclude: Any = None) -> Any:
+
+        """Gets the closest vehicle in front of the investigated vehicle
+
+        Args:
+            vehicle (Vehicle): currently investigated vehicle
+            lane (Optional[float]): y-coord of the lane to search, defaults to the vehicle lane
+            exclude (Any): vehicle to ignore
+
+        Returns:
+            Any: front vehicle or None
+        """
+
+        lane = vehicle.loc[1] if lane is None else lane
+        if lane not in self.keys:
+            return None
+
+        keys = self.keys[lane]
+        return self._closest(lane, bisect_right(keys, vehicle.loc[0]), len(keys), 1, exclude)
+
+
+    def get_front_at(self, lane: float, x: float) -> Any:
+
+        """Gets the closest vehicle in front of an x-coord, e.g. for a vehicle that is not built yet
+
+        Args:
+            lane (float): y-coord of the lane to search
+            x (float): x-coord of the middle of the vehicle
+
+        Returns:
+            Any: front vehicle or None
+        """
+
+        if lane not in self.keys:
+            return None
+
+        keys = self.keys[lane]
+        return self._closest(lane, bisect_right(keys, x), len(keys), 1, None)
+
+
+    def get_back(self, vehicle: Vehicle, lane: Optional[float] = None, exclude: Any = None) -> Any:
+
+        """Gets the closest vehicle behind the investigated vehicle
+
+        Args:
+            vehicle (Vehicle): currently investigated vehicle
+            lane (Optional[float]): y-coord of the lane to search, defaults to the vehicle lane
+            exclude (Any): vehicle to ignore
+
+        Returns:
+            Any: back vehicle or None
+        """
+
+        lane = vehicle.loc[1] if lane is None else lane
+        if lane not in self.keys:
+            return None
+
+        keys = self.keys[lane]
+        return self._closest(lane, bisect_left(keys, vehicle.loc[0]) - 1, -1, -1, exclude)
+
+
+    def get_side(self, vehicle: Vehicle, lane: float, side_blocked: bool) -> Any:
+
+        """Gets the adjacent vehicle, the vehicles close enough to pass Vehicle.get_side_params
+        are visited in spawn order and folded with _fold_side
+
+        Args:
+            vehicle (Vehicle): currently investigated vehicle
+            lane (float): y-coord of the adjacent lane
+            side_blocked (bool): if the investigated vehicle is on the outermost lane of that side
+
+        Returns:
+            Any: adjacent vehicle or None
+        """
+
+        if lane not in self.keys:
+            return None
+
+        keys, entries = self.keys[lane], self.entries[lane]
+        x = vehicle.loc[0]
+        reach = vehicle.veh_length + 4 * self.max_length
+        first, candidates = None, None
+
+        # Usually at most one candidate, the list is only built for more
+        for idx in range(bisect_left(keys, x - reach), bisect_right(keys, x + reach)):
+            target = entries[idx]
+            if vehicle.get_side_params(vehicle=target, front_check=target.loc[0] > x, back_check=target.loc[0] < x):
+                if first is None:
+                    first = target
+                elif candidates is None:
+                    candidates = [first, target]
+                else:
+                    candidates.append(target)
+
+        if candidates is None:
+            return self._fold_side(vehicle, None, first, lane, x, side_blocked) if first is not None else None
+
+        side = None
+        candidates.sort(key=lambda target: self.slots[target][2])
+        for target in candidates:
+            side = self._fold_side(vehicle, side, target, lane, x, side_blocked)
+
+        return side
+
+
+    def _fold_side(self, vehicle: Vehicle, side: Any, target: Any, lane: float, x: float, side_blocked: bool) -> Any:
+
+        """Applies the adjacent vehicle rules to one candidate visited in spawn order. The candidate
+        replaces the adjacent vehicle found so far if it is closer to the front or back of the
+        investigated vehicle. The adjacent vehicle is dropped if it is more than 2 vehicle lengths away
+        while no front/back vehicle of the adjacent lane has been visited yet
+
+        Args:
+            vehicle (Vehicle): currently investigated vehicle
+            side (Any): adjacent vehicle found so far or None
+            target (Any): Vehicle or Convoy candidate on the adjacent lane
+            lane (float): y-coord of the adjacent lane
+            x (float): x-coord of the investigated vehicle
+            side_blocked (bool): if the investigated vehicle is on the outermost lane of that side
+
+        Returns:
+            Any: updated adjacent vehicle or None
+        """
+
+        if side is None:
+            return target
+        if (
+            (abs(vehicle.loc_back - target.loc_front) <= abs(vehicle.loc_back - side.loc_front))
+            or (abs(vehicle.loc_front - target.loc_back) <= abs(vehicle.loc_front - side.loc_front))
+            ):
+            return target
+        if (
+            self._no_front_back(lane, x, self.slots[target][2], target.loc[0], side_blocked)
+            and (
+                (side.loc_back - vehicle.loc_front > 2 * vehicle.veh_length)
+                or (vehicle.loc_back - side.loc_front > 2 * vehicle.veh_length)
+                )
+            ):
+            return None
+
+        return side
+
+
+    def _no_front_back(self, lane: float, x: float, seq: int, target_x: float, side_blocked: bool) -> bool:
+
+        """Checks if no front/back vehicle of the adjacent lane has been found yet
+        when the vehicles are visited in spawn order
+
+        Args:
+            lane (float): y-coord of the adjacent lane
+            x (float): x-coord of the investigated vehicle
+            seq (int): spawn sequence of the visited vehicle
+            target_x (float): x-coord of the visited vehicle
+            side_blocked (bool): if the front/back vehicles of that side are never searched
+
+        Returns:
+            bool: True if both the front and back vehicles are still None
+        """
+
+        if side_blocked:
+            return True
+        if target_x != x:
+            return False
+
+        keys, entries = self.keys[lane], self.entries[lane]
+        for idx in range(len(keys)):
+            if keys[idx] != x and self.slots[entries[idx]][2] < seq:
+                return False
+
+        return True
+
+
+    def get_fov(self, vehicle: Vehicle, exclude: Any = None) -> Dict[str, Any]:
+
+        """Getting the immediate surrounding vehicles around the investigated vehicle
+        among every other vehicle on the road
+
+        Args:
+            vehicle (Vehicle): currently investigated vehicle
+            exclude (Any): the Vehicle or Convoy entry of the investigated vehicle
+
+        Returns:
+            Dict[str, Any]: dictionary of surrounding vehicles around the currently
+            investigated vehicle, overwritten by the next call
+        """
+
+        y = vehicle.loc[1]
+        left_lane, right_lane = y - vehicle.geometry.lanewidth, y + vehicle.geometry.lanewidth
+        not_left_lane = y != vehicle.geometry.leftlane
+        not_right_lane = y != vehicle.geometry.rightlane
+
+        surrounding = self.surrounding
+        surrounding["front"] = self.get_front(vehicle, exclude=exclude)
+        surrounding["front_left"] = self.get_front(vehicle, lane=left_lane) if not_left_lane else None
+        surrounding["front_right"] = self.get_front(vehicle, lane=right_lane) if not_right_lane else None
+        surrounding["back_left"] = self.get_back(vehicle, lane=left_lane) if not_left_lane else None
+        surrounding["back_right"] = self.get_back(vehicle, lane=right_lane) if not_right_lane else None
+        surrounding["right"] = self.get_side(vehicle, lane=right_lane, side_blocked=not not_right_lane)
+        surrounding["left"] = self.get_side(vehicle, lane=left_lane, side_blocked=not not_left_lane)
+
+        return surrounding
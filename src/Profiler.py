@@ -0,0 +1,207 @@
+import json
+import time
+
+from contextlib import nullcontext
+from typing import Dict, List, Tuple, Optional, ContextManager, TextIO
+
+# Returned by a disabled Profiler, entering it does not time anything
+NULL_PHASE = nullcontext()
+
+
+class Phase:
+
+    """Times a named phase of a frame, reused for every call of the phase
+    """
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+
+        """Initializing the phase
+
+        Args:
+            profiler (Profiler): profiler collecting the timings
+            name (str): phase name
+        """
+
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.
+
+
+    def __enter__(self) -> None:
+
+        """Starts timing the phase
+        """
+
+        self.start = time.perf_counter()
+
+
+    def __exit__(self, *exc_info) -> None:
+
+        """Adds the elapsed time and the call to the current frame
+        """
+
+        timing = self.profiler.frame_timings.setdefault(self.name, [0., 0])
+        timing[0] += time.perf_counter() - self.start
+        timing[1] += 1
+
+
+class Profiler:
+
+    """Records the wall time and call count of the phases of every frame.
+    Nested phases are named parent.child and their time is included in the parent.
+    When disabled, phase returns a shared no-op context manager
+    """
+
+    def __init__(self, enabled: bool = False, trace_path: Optional[str] = None) -> None:
+
+        """Initializing the profiler
+
+        Args:
+            enabled (bool): records the phases
+            trace_path (Optional[str]): per-frame trace file, .csv or ndjson otherwise, no trace if None
+        """
+
+        self.enabled = enabled
+        self.phases = {} # phase name -> Phase
+        self.frame_timings = {} # phase name -> [seconds, calls] of the current frame
+        self.totals = {} # phase name -> [seconds, calls] of all frames
+        self.last_frame = {} # phase name -> (seconds, calls) of the last completed frame
+        self.num_frames = 0
+
+        self.trace_path = trace_path
+        self.trace_file = None
+        if enabled and trace_path is not None:
+            self.trace_file = open(trace_path, "w")
+            if self.trace_csv:
+                self.trace_file.write("frame,phase,seconds,calls\n")
+
+
+    @property
+    def trace_csv(self) -> bool:
+
+        """Checks if the trace is written as csv
+        """
+
+        return self.trace_path is not None and self.trace_path.endswith(".csv")
+
+
+    def phase(self, name: str) -> ContextManager:
+
+        """Gets the context manager timing a phase
+
+        Args:
+            name (str): phase name
+
+        Returns:
+            ContextManager: Phase of the name, or NULL_PHASE if disabled
+        """
+
+        if not self.enabled:
+            return NULL_PHASE
+
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self, name)
+
+        return phase
+
+
+    def end_frame(self, frame: int) -> None:
+
+        """Completes the timings of a frame
+
+        Args:
+            frame (int): frame index
+        """
+
+        if not self.enabled:
+            return
+
+        for name, (seconds, calls) in self.frame_timings.items():
+            total = self.totals.setdefault(name, [0., 0])
+            total[0] += seconds
+            total[1] += calls
+
+        if self.trace_file is not None:
+            self.write_trace(self.trace_file, frame)
+
+        self.last_frame = {name: tuple(timing) for name, timing in self.frame_timings.items()}
+        self.frame_timings = {}
+        self.num_frames += 1
+
+
+    def write_trace(self, file: TextIO, frame: int) -> None:
+
+        """Appends the timings of the current frame to the trace
+
+        Args:
+            file (TextIO): trace file
+            frame (int): frame index
+        """
+
+        if self.trace_csv:
+            file.writelines(f"{frame},{name},{seconds:.9f},{calls}\n" for name, (seconds, calls) in self.frame_timings.items())
+        else:
+            file.write(json.dumps({"frame": frame, "phases": self.frame_timings}) + "\n")
+
+
+    def latest(self) -> Dict[str, Tuple[float, int]]:
+
+        """Gets the timings of the last completed frame, e.g. for the Window
+
+        Returns:
+            Dict[str, Tuple[float, int]]: phase name -> (seconds, calls)
+        """
+
+        return self.last_frame
+
+
+    def summary(self) -> List[Tuple[str, int, float, float, float]]:
+
+        """Summarises the timings of all frames
+
+        Returns:
+            List[Tuple[str, int, float, float, float]]: phase name, calls, total seconds,
+            milliseconds per frame and share of the frame phase, in order of first call
+            with nested phases following their parent
+        """
+
+        order = {name: idx for idx, name in enumerate(self.phases)}
+        names = sorted(self.totals, key=lambda name: (order.get(name.split('.')[0], -1), order[name]))
+
+        frame_total = self.totals.get('frame', [0.])[0]
+        rows = []
+        for name in names:
+            seconds, calls = self.totals[name]
+            per_frame = seconds / self.num_frames * 1000 if self.num_frames else 0.
+            share = seconds / frame_total if frame_total else 0.
+            rows.append((name, calls, seconds, per_frame, share))
+
+        return rows
+
+
+    def report(self) -> str:
+
+        """Formats the summary as a table
+
+        Returns:
+            str: timing table of the phases
+        """
+
+        lines = [f"{'Phase':<32}{'Calls':>10}{'Total (s)':>12}{'Per frame (ms)':>16}{'Share':>9}"]
+        for name, calls, seconds, per_frame, share in self.summary():
+            lines.append(f"{name:<32}{calls:>10}{seconds:>12.3f}{per_frame:>16.4f}{share:>9.1%}")
+
+        return "\n".join(lines)
+
+
+    def close(self) -> None:
+
+        """Closes the trace file
+        """
+
+        if self.trace_file is not None:
+            self.trace_file.close()
+            self.trace_file = None
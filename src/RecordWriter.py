@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+
+from typing import Dict, Any
+
+
+class RecordWriter:
+
+    """Runs a recorder on a background thread. The simulation hands the FrameSnapshot
+    of each recorded frame to a bounded queue, and the writer thread encodes and writes it.
+    When the queue is full the simulation either blocks or the frame is dropped and counted
+    """
+
+    # Commands of the writer thread besides frames
+    RESET = "reset"
+    STOP = "stop"
+
+    def __init__(self, recorder: Any, queue_size: int, backpressure: str = "block") -> None:
+
+        """Starts the writer thread
+
+        Args:
+            recorder (Any): Recorder or ColumnarRecorder, only used by the writer thread
+            queue_size (int): maximum number of frames waiting to be written
+            backpressure (str): "block" waits for space in the queue, "drop" skips the frame
+        """
+
+        if backpressure not in ("block", "drop"):
+            raise ValueError(f"Unknown backpressure {backpressure}, expected block or drop")
+
+        self.recorder = recorder
+        self.backpressure = backpressure
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None # exception raised by the writer thread
+
+        # Statistics
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.max_queue_depth = 0
+        self.stall_time = 0. # seconds the simulation waited for space in the queue
+
+        self.thread = threading.Thread(target=self.run, name="RecordWriter", daemon=True)
+        self.thread.start()
+
+
+    def run(self) -> None:
+
+        """Writer thread, writes the queued frames until it is stopped
+        """
+
+        while True:
+            item = self.queue.get()
+            if item is self.STOP:
+                break
+            # After a failed write the queued frames are discarded, the recording is not continued with a hole
+            if self.error is not None:
+                continue
+
+            try:
+                if item is self.RESET:
+                    self.recorder.reset()
+                    self.frames_written = 0
+                else:
+                    self.recorder.write(*item)
+                    self.frames_written += 1
+            except Exception as error:
+                # Kept for the simulation thread, re-raised by check_error
+                self.error = error
+
+
+    def check_error(self) -> None:
+
+        """Re-raises an exception of the writer thread in the simulation thread
+        """
+
+        if self.error is not None:
+            raise RuntimeError("Recording writer failed") from self.error
+
+
+    def write(self, frame: int, snapshot: Any) -> None:
+
+        """Queues a frame for writing
+
+        Args:
+            frame (int): frame index
+            snapshot (Any): FrameSnapshot of the vehicle attributes of the frame
+        """
+
+        self.check_error()
+        self.frames_submitted += 1
+
+        if self.backpressure == "drop":
+            try:
+                self.queue.put_nowait((frame, snapshot))
+            except queue.Full:
+                self.frames_dropped += 1
+        else:
+            if self.queue.full():
+                start = time.perf_counter()
+                self.queue.put((frame, snapshot))
+                self.stall_time += time.perf_counter() - start
+            else:
+                self.queue.put((frame, snapshot))
+
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+
+    def reset(self) -> None:
+
+        """Discards the recorded frames, e.g. when the simulation restarts
+        """
+
+        self.check_error()
+        self.frames_submitted, self.frames_dropped = 0, 0
+        self.queue.put(self.RESET)
+
+
+    def close(self, filepath: str, record_format: str) -> None:
+
+        """Writes the remaining queued frames, stops the writer thread and finalizes the recording
+
+        Args:
+            filepath (str): destination of the recording
+            record_format (str): record_format of the SimConfig
+        """
+
+        self.queue.put(self.STOP)
+        self.thread.join()
+        self.check_error()
+        self.recorder.close(filepath, record_format=record_format)
+
+
+    def stats(self) -> Dict[str, float]:
+
+        """Gets the statistics used to size the queue
+
+        Returns:
+            Dict[str, float]: statistic name -> value
+        """
+
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "frames_submitted": self.frames_submitted,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "bytes_written": self.recorder.bytes_written,
+            "stall_time": self.stall_time,
+        }
@@ -0,0 +1,204 @@
+import json
+import os
+import tempfile
+import weakref
+
+from src.Columnar import ColumnarRecorder, Recording
+from src.FrameSnapshot import FrameSnapshot
+from typing import List, Dict, Any, Iterator, Tuple, TextIO, Union
+
+# Recording format -> file extension
+EXTENSIONS = {
+    "jsonl": ".jsonl", # one frame per line, streamed while recording
+    "json": ".json", # the frame dictionary of the original recordings, exported when saving
+    "columnar": ".rec", # fixed-dtype columns with a JSON header, see src/Columnar.py
+}
+UUIDS_SUFFIX = ".uuids.json" # id -> uuid mapping saved next to a recording with export_uuids, not a recording
+
+
+def uuids_path(record_path: str) -> str:
+
+    """Gets the path of the uuid mapping saved next to a recording with export_uuids
+
+    Args:
+        record_path (str): path of the recording
+
+    Returns:
+        str: <recording>.uuids.json
+    """
+
+    return os.path.splitext(record_path)[0] + UUIDS_SUFFIX
+
+
+def create_recorder(config: Any) -> Union["Recorder", ColumnarRecorder]:
+
+    """Creates the recorder of the record_format of a SimConfig
+
+    Args:
+        config (Any): SimConfig of the recorded simulation
+
+    Returns:
+        Union[Recorder, ColumnarRecorder]: recorder streaming to the recording folder
+    """
+
+    if config.record_format == "columnar":
+        return ColumnarRecorder(folderpath=config.folderpath, flush_frames=config.flush_frames, config=config)
+
+    return Recorder(folderpath=config.folderpath, flush_frames=config.flush_frames)
+
+
+class Recorder:
+
+    """Streams the recorded frames to a JSON Lines file, one frame per line.
+    Only the frames since the last flush are held in memory, and a file of
+    complete frames is left behind if the simulation stops without saving
+    """
+
+    def __init__(self, folderpath: str, flush_frames: int) -> None:
+
+        """Opens a working file in the recording folder
+
+        Args:
+            folderpath (str): folder of the recordings
+            flush_frames (int): number of frames buffered before they are written to disk
+        """
+
+        os.makedirs(folderpath, exist_ok=True)
+        handle, self.filepath = tempfile.mkstemp(suffix=".jsonl.part", dir=folderpath)
+        self.file = os.fdopen(handle, "w")
+        self.flush_frames = flush_frames
+        self.buffer = [] # serialised frames since the last flush
+        self.num_frames = 0
+        self.bytes_written = 0
+
+        # Writes the buffered frames when the Recorder is never closed, e.g. the simulation crashed
+        self.finalizer = weakref.finalize(self, Recorder.write_buffer, self.file, self.buffer)
+
+
+    @staticmethod
+    def write_buffer(file: TextIO, buffer: List[str]) -> int:
+
+        """Writes the buffered frames to the file
+
+        Args:
+            file (TextIO): working file
+            buffer (List[str]): serialised frames, emptied afterwards
+
+        Returns:
+            int: number of characters written
+        """
+
+        if file.closed:
+            return 0
+
+        written = 0
+        if buffer:
+            written = file.write("\n".join(buffer) + "\n")
+            buffer.clear()
+        file.flush()
+
+        return written
+
+
+    def write(self, frame: int, snapshot: FrameSnapshot) -> None:
+
+        """Appends a frame to the recording
+
+        Args:
+            frame (int): frame index
+            snapshot (FrameSnapshot): vehicle attributes of the frame
+        """
+
+        self.buffer.append(json.dumps({"frame": frame, "vehicles": snapshot.vehicles()}))
+        self.num_frames += 1
+
+        if len(self.buffer) >= self.flush_frames:
+            self.flush()
+
+
+    def flush(self) -> None:
+
+        """Writes the buffered frames to disk
+        """
+
+        self.bytes_written += Recorder.write_buffer(self.file, self.buffer)
+
+
+    def reset(self) -> None:
+
+        """Discards the recorded frames, e.g. when the simulation restarts
+        """
+
+        self.buffer.clear()
+        self.file.seek(0)
+        self.file.truncate()
+        self.num_frames = 0
+        self.bytes_written = 0
+
+
+    def close(self, filepath: str, record_format: str = "jsonl") -> None:
+
+        """Finalizes the recording and moves it to its destination
+
+        Args:
+            filepath (str): destination of the recording
+            record_format (str): "jsonl" keeps the streamed file, "json" exports the original frame dictionary
+        """
+
+        self.flush()
+        self.file.close()
+        self.finalizer.detach()
+
+        if record_format == "json":
+            export_json(self.filepath, filepath)
+            os.remove(self.filepath)
+        else:
+            os.replace(self.filepath, filepath)
+
+
+def read_frames(filepath: str) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+
+    """Reads the frames of a recording in any format
+
+    Args:
+        filepath (str): .jsonl, .json or .rec recording
+
+    Yields:
+        Iterator[Tuple[int, List[Dict[str, Any]]]]: frame index, vehicle attributes of the frame
+    """
+
+    if filepath.endswith(EXTENSIONS["columnar"]):
+        yield from Recording(filepath).iter_frames()
+        return
+
+    if filepath.endswith(EXTENSIONS["json"]):
+        with open(filepath, "r") as file:
+            for frame, vehicles in json.load(file).items():
+                yield int(frame), vehicles
+        return
+
+    with open(filepath, "r") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record["frame"], record["vehicles"]
+
+
+def export_json(frames_path: str, json_path: str) -> None:
+
+    """Exports a .jsonl recording to the frame dictionary of the original recordings,
+    the same output as json.dump(record_dict, indent=4) written one frame at a time
+
+    Args:
+        frames_path (str): .jsonl recording
+        json_path (str): destination .json file
+    """
+
+    with open(json_path, "w") as file:
+        file.write("{")
+        separator = "\n"
+        for frame, vehicles in read_frames(frames_path):
+            # Strips the braces of the single frame dictionary
+            file.write(separator + json.dumps({frame: vehicles}, indent=4)[2:-2])
+            separator = ",\n"
+        file.write("\n}" if separator != "\n" else "}")
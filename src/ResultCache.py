@@ -0,0 +1,181 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+
+from typing import Dict, List, Optional
+
+CHUNK_SIZE = 1 << 20 # bytes read at a time when hashing a file
+
+
+class ResultCache:
+
+    """On-disk cache of per-file results, keyed by the content hash of the input file
+    and the version of the code that derived them. Entries are NumPy .npz files, the
+    least recently used entries are evicted once the cache exceeds its size or entry limit
+    """
+
+    def __init__(self, folderpath: str, version: str, max_bytes: int = 1 << 30, max_entries: Optional[int] = None) -> None:
+
+        """Opens the cache folder and the index of the hashed files
+
+        Args:
+            folderpath (str): cache folder
+            version (str): version of the code deriving the results, part of every key
+            max_bytes (int): total size of the entries kept after evict
+            max_entries (Optional[int]): number of entries kept after evict, unlimited if None
+        """
+
+        os.makedirs(folderpath, exist_ok=True)
+        self.folderpath = folderpath
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        # Input file path -> [size, mtime_ns, content hash], unchanged files are not hashed again
+        self.index_path = os.path.join(folderpath, "index.json")
+        try:
+            with open(self.index_path, "r") as file:
+                self.index = json.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+
+    def file_key(self, filepath: str) -> str:
+
+        """Gets the cache key of an input file
+
+        Args:
+            filepath (str): input file
+
+        Returns:
+            str: content hash and code version
+        """
+
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        entry = self.index.get(filepath)
+
+        if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+            digest = hashlib.sha256()
+            with open(filepath, "rb") as file:
+                for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            entry = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+            self.index[filepath] = entry
+
+        return f"{entry[2]}-{self.version}"
+
+
+    def save_index(self) -> None:
+
+        """Writes the index of the hashed files, dropping the files that no longer exist
+        """
+
+        self.index = {filepath: entry for filepath, entry in self.index.items() if os.path.exists(filepath)}
+        self.write_atomic(self.index_path, json.dumps(self.index).encode())
+
+
+    def entry_path(self, key: str) -> str:
+
+        """Gets the path of a cache entry
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            str: .npz file of the entry
+        """
+
+        return os.path.join(self.folderpath, f"{key}.npz")
+
+
+    def __contains__(self, key: str) -> bool:
+
+        """Checks if a key is cached
+        """
+
+        return os.path.exists(self.entry_path(key))
+
+
+    def load(self, key: str, names: Optional[List[str]] = None) -> Optional[Dict[str, np.ndarray]]:
+
+        """Loads a cache entry and marks it as recently used
+
+        Args:
+            key (str): cache key
+            names (Optional[List[str]]): arrays to load, all arrays if None
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: array name -> values, None if the key is not cached
+        """
+
+        path = self.entry_path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                arrays = {name: entry[name] for name in (entry.files if names is None else names)}
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            return None
+
+        return arrays
+
+
+    def store(self, key: str, arrays: Dict[str, np.ndarray]) -> None:
+
+        """Stores a cache entry, safe to call from several processes
+
+        Args:
+            key (str): cache key
+            arrays (Dict[str, np.ndarray]): array name -> values
+        """
+
+        handle, tmp_path = tempfile.mkstemp(suffix=".npz.part", dir=self.folderpath)
+        with os.fdopen(handle, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, self.entry_path(key))
+
+
+    def write_atomic(self, path: str, data: bytes) -> None:
+
+        """Writes a file in the cache folder through a temporary file
+
+        Args:
+            path (str): destination
+            data (bytes): file contents
+        """
+
+        handle, tmp_path = tempfile.mkstemp(suffix=".part", dir=self.folderpath)
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+
+    def evict(self) -> int:
+
+        """Removes the least recently used entries until the cache is within its limits
+
+        Returns:
+            int: number of removed entries
+        """
+
+        entries = []
+        for filename in os.listdir(self.folderpath):
+            if filename.endswith(".npz"):
+                stat = os.stat(os.path.join(self.folderpath, filename))
+                entries.append((stat.st_mtime, stat.st_size, filename))
+
+        # Oldest first
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        max_entries = len(entries) if self.max_entries is None else self.max_entries
+        removed = 0
+
+        while entries and (total_bytes > self.max_bytes or len(entries) > max_entries):
+            _, size, filename = entries.pop(0)
+            os.remove(os.path.join(self.folderpath, filename))
+            total_bytes -= size
+            removed += 1
+
+        return removed
@@ -1,14 +1,17 @@
-import random
+import uuid
 import numpy as np
 
 from src.ACC import Convoy
 from src.Vehicle import Vehicle
-from common.config import road_params, driving_params, vehicle_models, simulation_params
+from src.LaneIndex import LaneIndex
+from src.SimConfig import SimConfig
+from src.FrameSnapshot import FrameSnapshot
+from src.Profiler import Profiler
+from src.ArrivalSchedule import ArrivalSchedule, MAIN_ROAD, ONRAMP
+from src.EntryQueue import EntryQueue, PendingArrival
+from src.DriverModel import DriverModel as DM
 from tqdm import tqdm
-from typing import List, Type, Any, Tuple
-
-# For repeatabiity
-random.seed(42)
+from typing import List, Dict, Any, Tuple
 
 
 class Road:
@@ -16,263 +19,338 @@ class Road:
     """Creates a road instance that managers all vehicles on the motorway
     """
 
-    def __init__(self) -> None:
+    def __init__(self, config: SimConfig) -> None:
 
         """Initializing the Road parameters
+
+        Args:
+            config (SimConfig): parameters of the simulation run
         """
 
         # Getting road params
-        self.num_lanes = road_params['num_lanes']
-        self.toplane_loc = road_params['toplane_loc']
-        self.onramp_x = self.toplane_loc[0] + road_params['onramp_offset']
-        self.lanewidth = road_params['lanewidth']
-        self.road_length = road_params['road_length']
-        self.onramp_length = road_params['onramp_length']
+        self.config = config
+        geometry = config.geometry
+        self.num_lanes = geometry.num_lanes
+        self.toplane_loc = geometry.toplane_loc
+        self.onramp_x = config.onramp_x
+        self.lanewidth = geometry.lanewidth
+        self.road_length = geometry.road_length
+        self.onramp_length = geometry.onramp_length
 
         # Getting y-coord of lanes
-        self.onramp = self.toplane_loc[1]
-        self.leftlane = self.toplane_loc[1] + self.lanewidth
-        self.middlelane = self.toplane_loc[1] + (self.lanewidth * 2)
-        self.rightlane = self.toplane_loc[1] + self.lanewidth * (self.num_lanes - 1)
+        self.onramp = geometry.onramp
+        self.leftlane = geometry.leftlane
+        self.middlelane = geometry.middlelane
+        self.rightlane = geometry.rightlane
 
         # Getting road closure locations
-        if road_params["road_closed"] == "left":
-            self.road_closed = self.leftlane
-        elif road_params["road_closed"] == "middle":
-            self.road_closed = self.middlelane
-        elif road_params["road_closed"] == "right":
-            self.road_closed = self.rightlane
-        else:
-            self.road_closed = None
+        self.road_closed = geometry.road_closed
 
         # Driving params
-        self.safety_distance = driving_params['safety_threshold']
+        self.safety_distance = config.safety_threshold
         self.vehicle_list = []
-
-        # Road spawning
-        if road_params['vehicle_inflow'] > 0:
-            self.vehicle_frequency = road_params['vehicle_inflow'] / 3600 # per/hour -> per second
-            self.spawn_interval = round(1.0/self.vehicle_frequency, 1) # Round to 1dp since ts is 1dp
-            self.timer = 0.0
-            self.last_spawn_time = 0
-        else:
-            self.vehicle_frequency, self.spawn_interval, self.timer, self.last_spawn_time = 0, 0, 0, 0
-
-        # Onramp frequency
-        if road_params['onramp_inflow'] > 0:
-            self.onramp_frequency = road_params['onramp_inflow'] / 3600
-            self.onramp_spawn_interval = round(1.0/self.onramp_frequency, 1)
-            self.onramp_timer = 0.0
-            self.onramp_last_spawn_time = 0
-        else:
-            self.onramp_frequency, self.onramp_spawn_interval, self.onramp_timer, self.onramp_last_spawn_time = 0, 0, 0, 0
+        self.lane_index = LaneIndex() # Vehicles sorted by x-coord in each lane
+        self.next_id = 0 # integer id of the next spawned vehicle, kept across restarts
 
         # Convoy params
-        self.num_convoy_vehicles = road_params['num_convoy_vehicles']  # Queue counter of 3 acc vehicles to form a convoy
+        self.num_convoy_vehicles = config.num_convoy_vehicles  # Queue counter of 3 acc vehicles to form a convoy
         self.acc_spawn_loc = [self.toplane_loc[0], self.leftlane] # acc vehicle always spawns in left lane
-        self.convoy_spawned = False
 
         # Testing and simulation controls
         self.vehicle_despawn = 0
         self.run_flag = True
-        self.ts = simulation_params['ts']
-        self.total_vehicles = simulation_params['num_vehicles']
-        if simulation_params['testing']:
+        self.ts = config.ts
+        self.testing = config.testing
+        self.total_vehicles = config.num_vehicles
+
+        # Independent random streams of the run, derived from the run seed so that a run
+        # does not depend on the import order or on the runs before it in the process
+        type_seq, lane_seq, speed_seq, arrival_seq = np.random.SeedSequence(config.seed).spawn(4)
+        self.type_rng = np.random.default_rng(type_seq) # SHC or ACC
+        self.lane_rng = np.random.default_rng(lane_seq) # spawn lane
+        self.speed_rng = np.random.default_rng(speed_seq) # starting speed of the vehicles
+        self.arrival_rng = np.random.default_rng(arrival_seq) # arrival headways
+
+        # Arrivals of the road and onramp spawning, simulated time advances by ts per step
+        self.steps = 0
+        self.arrivals = ArrivalSchedule(rng=self.arrival_rng, process=config.arrival_process)
+        self.arrivals.configure(MAIN_ROAD, config.spawn_interval, now=0.)
+        self.arrivals.configure(ONRAMP, config.onramp_spawn_interval, now=0.)
+
+        # Upstream vertical queues of the entry lanes, rejected arrivals wait here instead of being lost
+        self.entry_start_step = 0 # step of the last restart, the entry statistics count from it
+        self.entry_queues = {}
+        for lane in range(1, self.num_lanes):
+            lane_y = self.toplane_loc[1] + int(lane * self.lanewidth)
+            self.entry_queues[(MAIN_ROAD, lane_y)] = EntryQueue(MAIN_ROAD, self.toplane_loc[0], lane_y)
+        self.entry_queues[(ONRAMP, self.onramp)] = EntryQueue(ONRAMP, self.onramp_x, self.onramp)
+
+        self.profiler = Profiler() # disabled, replaced by the profiler of the SimulationManager
+        if self.testing:
             self.progress_bar = tqdm(total=self.total_vehicles, desc="Despawning Vehicles")
 
 
-    def spawn_helper(self, tmp_vehicle: Type[Vehicle], vehicle_type: str) -> Tuple[bool]:
+    def admission_check(self, entry: EntryQueue, arrival: PendingArrival) -> bool:
 
-        """Checks if tmp_vehicle can spawn into the motorway safely
+        """Checks if the arrival at the front of an entry queue can spawn into the motorway safely.
+        Only the front vehicle in the entry lane is looked up, the arrival is not built yet.
+        The lead vehicle of a convoy is checked like a SHC vehicle at the entry point
 
         Args:
-            tmp_vehicle (Type[Vehicle]): The temporary vehicle to be spawned
-            vehicle_type (str): a vehicle type descriptor
+            entry (EntryQueue): entry lane of the arrival
+            arrival (PendingArrival): arrival to admit
 
         Returns:
-            headway_flag (bool): Determine if tmp_vehicle have enough headway to the front vehicle
-            overlap_flag (bool): Determine if tmp_vehicle will overlap front vehicle
+            bool: True if the arrival has enough headway to and does not overlap the front vehicle
         """
 
-        if vehicle_type == 'shc':
-            # Check vehicle surrounding
-            tmp_front = tmp_vehicle.get_fov(vehicle_list=self.vehicle_list)['front']
+        front = self.lane_index.get_front_at(entry.y, entry.x)
 
-            # If there is a vehicle infront
-            if tmp_front is not None:
-                if tmp_vehicle.v != 0:
-                    headway = (tmp_front.loc_back - tmp_vehicle.loc_front) / tmp_vehicle.v
-                else:
-                    headway = tmp_vehicle.T
-                # Check the size of the car
-                overlap_flag = (tmp_front.loc_back - tmp_vehicle.loc_front - self.safety_distance) < 0
-            else:
-                # If no vehicles infront
-                headway = tmp_vehicle.T
-                overlap_flag = False
+        # If no vehicles infront
+        if front is None:
+            return True
+
+        T = arrival.driver.T
+        gap = front.loc_back - (entry.x + Vehicle.veh_length / 2)
+        headway = gap / arrival.v if arrival.v != 0 else T
+        # Check the size of the car
+        overlap_flag = (gap - self.safety_distance) < 0
+
+        return headway >= T and not overlap_flag
+
+
+    def add_vehicle(self, vehicle: Any) -> None:
 
-            headway_flag = headway >= tmp_vehicle.T
+        """Adds a spawned vehicle to the road
+
+        Args:
+            vehicle (Any): Either a Vehicle or Convoy instance
+        """
+
+        # Issuing integer ids, one per sub-convoy vehicle of a Convoy
+        if isinstance(vehicle, Convoy):
+            vehicle.sub_ids = list(range(self.next_id, self.next_id + vehicle.num_subconvoy))
+            self.next_id += vehicle.num_subconvoy
         else:
-             # Lead ACC vehicle
-            tmp_lead = tmp_vehicle.convoy_list[0]
-            tmp_front = tmp_lead.get_fov(vehicle_list=self.vehicle_list)['front']
-
-            # If there is a vehicle infront
-            if tmp_front is not None:
-                if tmp_lead.v != 0:
-                    headway = (tmp_front.loc_back - tmp_lead.loc_front) / tmp_lead.v
-                else:
-                    headway = tmp_lead.T
+            vehicle.id = self.next_id
+            self.next_id += 1
+
+        self.vehicle_list.append(vehicle)
+        self.lane_index.insert(vehicle)
+
+
+    def clear_vehicles(self) -> None:
+
+        """Removes all vehicles from the road and the arrivals waiting in the entry queues
+        """
 
-                # Check the size of the car
-                overlap_flag = (tmp_front.loc_back - tmp_lead.loc_front  - self.safety_distance) < 0
+        self.vehicle_list = []
+        self.lane_index.clear()
+        for entry in self.entry_queues.values():
+            entry.clear()
+        self.entry_start_step = self.steps
+
+
+    def frame_snapshot(self) -> FrameSnapshot:
+
+        """Exports the state of the vehicles on the road, including the sub-convoy vehicles of ACC
+
+        Returns:
+            FrameSnapshot: vehicle attributes of the frame
+        """
+
+        ids, vehicle_types, x, y, speed = [], [], [], [], []
+
+        for vehicle in self.vehicle_list:
+            if isinstance(vehicle, Convoy):
+                lead = vehicle.lead_vehicle
+                num_subconvoy = vehicle.num_subconvoy
+                ids.extend(vehicle.sub_ids)
+                vehicle_types.extend([vehicle.vehicle_type] * num_subconvoy)
+                x.extend(vehicle.subconvoy_x())
+                y.extend([lead.loc[1]] * num_subconvoy)
+                speed.extend([lead.v] * num_subconvoy)
             else:
-                # If no vehicles infront
-                headway = tmp_lead.T
-                overlap_flag = False
-            headway_flag = headway >= tmp_lead.T
+                ids.append(vehicle.id)
+                vehicle_types.append(vehicle.vehicle_type)
+                x.append(vehicle.loc[0])
+                y.append(vehicle.loc[1])
+                speed.append(vehicle.v)
+
+        return FrameSnapshot(ids, vehicle_types, x, y, speed)
 
-        return headway_flag, overlap_flag
 
+    def detector_state(self) -> Tuple[np.ndarray, np.ndarray]:
 
-    def spawn_vehicle(self) -> None:
+        """Exports only the x-coords and speeds of the vehicles on the road, including the sub-convoy
+        vehicles of ACC, e.g. for the detectors of a frame that is not recorded
 
-        """Spawns a car when internval is met with additional checks
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: x-coord and speed of every vehicle
+        """
+
+        x, speed = [], []
+
+        for vehicle in self.vehicle_list:
+            if isinstance(vehicle, Convoy):
+                x.extend(vehicle.subconvoy_x())
+                speed.extend([vehicle.lead_vehicle.v] * vehicle.num_subconvoy)
+            else:
+                x.append(vehicle.loc[0])
+                speed.append(vehicle.v)
+
+        return np.array(x, dtype=np.float64), np.array(speed, dtype=np.float64)
+
+
+    def uuid_mapping(self) -> Dict[int, str]:
+
+        """Maps the integer ids issued so far to uuid4 strings, e.g. to export a recording
+        with the uuids of the original recordings
+
+        Returns:
+            Dict[int, str]: integer id -> uuid4 string
+        """
+
+        return {vehicle_id: str(uuid.uuid4()) for vehicle_id in range(self.next_id)}
+
+
+    def arrive_vehicle(self, arrival_time: float) -> None:
+
+        """Queues a due main road arrival in its entry lane
+
+        Args:
+            arrival_time (float): scheduled time of the arrival
         """
 
         # Choosing spawned vehicle type
-        random_vehicle = random.random()
-        acc_spawnrate = vehicle_models[1].get("acc_spawnrate")
+        random_vehicle = self.type_rng.random()
 
-        if random_vehicle <= acc_spawnrate:
+        if random_vehicle <= self.config.acc_spawnrate:
             # Spawn ACC, get acc_params from config
             vehicle_type = 'acc'
-            logic_level = driving_params["acc_logic"]
-            logic_dict = vehicle_models[1][logic_level]
+            logic_dict = self.config.acc_logic_dict
+            num_vehicles = self.num_convoy_vehicles
         else:
             # Spawn SHC, get shc_params from config
             vehicle_type = 'shc'
-            logic_level = driving_params["shc_logic"]
-            logic_dict = vehicle_models[0][logic_level]
-
-        # Choosing a spawn lane from the 3 motorway lanes
-        lane = int(np.random.choice(range(1,self.num_lanes)) * self.lanewidth)
-
-        # Spawn location
-        if vehicle_type == 'acc':
-            # Create a tmp convoy
-            tmp_convoy = Convoy(logic_dict=logic_dict, lead_spawn_loc=self.acc_spawn_loc, vehicle_type=vehicle_type,
-                                num_subconvoy=self.num_convoy_vehicles)
-            headway_flag, overlap_flag = self.spawn_helper(tmp_vehicle=tmp_convoy,vehicle_type=vehicle_type)
-        else:
-            spawn_loc = [self.toplane_loc[0], self.toplane_loc[1] + lane]
-            # Create a tmp Vehicle Object
-            tmp_vehicle = Vehicle(logic_dict=logic_dict, spawn_loc=spawn_loc, vehicle_type=vehicle_type)
-            headway_flag, overlap_flag = self.spawn_helper(tmp_vehicle=tmp_vehicle, vehicle_type=vehicle_type)
-
-        # Spawn safety check
-        if (headway_flag and not overlap_flag):
-            if vehicle_type == 'shc':
-                self.convoy_spawned = False
-                self.vehicle_list.append(tmp_vehicle)
-            else:
-                self.convoy_spawned = True
-                self.vehicle_list.append(tmp_convoy)
+            logic_dict = self.config.shc_logic_dict
+            num_vehicles = 1
 
-            if self.convoy_spawned:
-                # ACC spawned equivalent to waiting for 2 more SHC vehicles added
-                self.last_spawn_time = self.timer + (2*self.spawn_interval)
-            else:
-                # SHC spawned
-                self.last_spawn_time = self.timer
+        # Choosing a spawn lane from the 3 motorway lanes, acc vehicle always spawns in left lane
+        lane = int(self.lane_rng.integers(1, self.num_lanes) * self.lanewidth)
+        lane_y = self.acc_spawn_loc[1] if vehicle_type == 'acc' else self.toplane_loc[1] + lane
 
+        driver = DM.profile(vehicle_type=vehicle_type, logic_dict=logic_dict, config=self.config)
+        v = Vehicle.sample_speed(driver, logic_dict, self.speed_rng)
+        self.entry_queues[(MAIN_ROAD, lane_y)].push(PendingArrival(arrival_time, vehicle_type, logic_dict, driver, v, num_vehicles))
 
-    def spawn_onramp(self) -> None:
+        # ACC arrival equivalent to waiting for 2 more SHC vehicles added
+        self.arrivals.schedule_next(MAIN_ROAD, arrival_time, arrivals=num_vehicles if vehicle_type == 'acc' else 1)
 
-        """Handles the vehicle spawn into the onramp
-        """
 
-        # Spawn SHC, get shc_params from config
-        vehicle_type = 'shc'
-        logic_level = driving_params["shc_logic"]
-        logic_dict = vehicle_models[0][logic_level]
-        spawn_loc = [self.onramp_x, self.toplane_loc[1]]
+    def arrive_onramp(self, arrival_time: float) -> None:
 
-        # Create a tmp Vehicle Object
-        tmp_vehicle = Vehicle(logic_dict=logic_dict, spawn_loc=spawn_loc, vehicle_type=vehicle_type)
-        headway_flag, overlap_flag = self.spawn_helper(tmp_vehicle=tmp_vehicle, vehicle_type=vehicle_type)
+        """Queues a due onramp arrival, onramp vehicles are SHC
 
-        # Spawn safety check
-        if (headway_flag and not overlap_flag):
-            self.vehicle_list.append(tmp_vehicle)
+        Args:
+            arrival_time (float): scheduled time of the arrival
+        """
+
+        logic_dict = self.config.shc_logic_dict
+        driver = DM.profile(vehicle_type='shc', logic_dict=logic_dict, config=self.config)
+        v = Vehicle.sample_speed(driver, logic_dict, self.speed_rng)
+        self.entry_queues[(ONRAMP, self.onramp)].push(PendingArrival(arrival_time, 'shc', logic_dict, driver, v, 1))
 
-        # Reset onramp spawn timer if vehicle is not spawn to prevent upstream overcrowding
-        self.onramp_last_spawn_time = self.onramp_timer
+        self.arrivals.schedule_next(ONRAMP, arrival_time)
 
 
-    def check_road_closed(self) -> None:
+    def admit(self, entry: EntryQueue) -> None:
 
-        """Check for updated road closure location from user interaction
+        """Spawns the arrival at the front of an entry queue if it passes the admission check
+
+        Args:
+            entry (EntryQueue): entry lane with waiting arrivals
         """
 
-        if road_params["road_closed"] == "left":
-            self.road_closed = self.leftlane
-        elif road_params["road_closed"] == "middle":
-            self.road_closed = self.middlelane
-        elif road_params["road_closed"] == "right":
-            self.road_closed = self.rightlane
+        arrival = entry.pending[0]
+        if not self.admission_check(entry, arrival):
+            return
+
+        entry.pop()
+        spawn_loc = [entry.x, entry.y]
+        if arrival.vehicle_type == 'acc':
+            self.add_vehicle(Convoy(config=self.config, logic_dict=arrival.logic_dict, lead_spawn_loc=spawn_loc,
+                                    vehicle_type=arrival.vehicle_type, num_subconvoy=self.num_convoy_vehicles, v=arrival.v))
         else:
-            self.road_closed = None
+            self.add_vehicle(Vehicle(config=self.config, logic_dict=arrival.logic_dict, spawn_loc=spawn_loc,
+                                     vehicle_type=arrival.vehicle_type, v=arrival.v))
+
+
+    def entry_stats(self) -> Dict[str, float]:
+
+        """Gets the entry queues and the requested, arrived and actual inflows of the road and the onramp
+        since the last restart. The queue lengths are in vehicles, the max queue length is of the longest entry lane
+
+        Returns:
+            Dict[str, float]: statistic name -> value, inflows in veh/h
+        """
 
+        hours = (self.steps - self.entry_start_step) * self.ts / 3600
+        stats = {}
+        for source, requested in ((MAIN_ROAD, self.config.vehicle_inflow), (ONRAMP, self.config.onramp_inflow)):
+            entries = [entry for entry in self.entry_queues.values() if entry.source == source]
+            stats[f"{source}_queue_length"] = sum(entry.waiting for entry in entries)
+            stats[f"{source}_max_queue_length"] = max(entry.max_waiting for entry in entries)
+            stats[f"{source}_requested_inflow"] = requested
+            stats[f"{source}_arrival_inflow"] = sum(entry.arrived for entry in entries) / hours if hours else 0.
+            stats[f"{source}_actual_inflow"] = sum(entry.entered for entry in entries) / hours if hours else 0.
 
-    def check_inflow(self, timer: float, last_spawn_time: float, onramp_timer: float, onramp_last_spawn_time: float) -> None:
+        return stats
 
-        """Checks for new inflow update from user interaction
+
+    def update_config(self, config: SimConfig) -> None:
+
+        """Applies an updated SimConfig from user interaction.
+        The vehicles on the road keep the config they were spawned with
 
         Args:
-            timer (float): motorway timer for vehicle spawns
-            last_spawn_time (float): time at which the vehicle was last spawned
-            onramp_timer (float): onramp timer for onramp vehicle spawns
-            onramp_last_spawn_time (float): time at which onramp vehicle was last spawned
+            config (SimConfig): updated parameters of the simulation run
         """
 
-        # Road spawning
-        if road_params['vehicle_inflow'] > 0:
-            self.vehicle_frequency = road_params['vehicle_inflow'] / 3600
-            self.spawn_interval = round(1.0/self.vehicle_frequency, 1)
-            self.timer = timer
-            self.last_spawn_time = last_spawn_time
-        else:
-            self.vehicle_frequency, self.spawn_interval, self.timer, self.last_spawn_time = 0, 0, 0, 0
-
-        # Onramp frequency
-        if road_params['onramp_inflow'] > 0:
-            self.onramp_frequency = road_params['onramp_inflow'] / 3600
-            self.onramp_spawn_interval = round(1.0/self.onramp_frequency, 1)
-            self.onramp_timer = onramp_timer
-            self.onramp_last_spawn_time = onramp_last_spawn_time
-        else:
-            self.onramp_frequency, self.onramp_spawn_interval, self.onramp_timer, self.onramp_last_spawn_time = 0, 0, 0, 0
+        self.config = config
+
+        # Road closure location
+        self.road_closed = config.geometry.road_closed
+
+        # Road and onramp spawning, the arrivals are only rescheduled if the inflow changed.
+        # The arrivals keep counting from the last spawn unless the inflow is turned off
+        now = self.steps * self.ts
+        self.arrivals.configure(MAIN_ROAD, config.spawn_interval, now=now)
+        self.arrivals.configure(ONRAMP, config.onramp_spawn_interval, now=now)
 
 
-    def despawn_stop_vehicles(self, vehicle: Any) -> None:
+    def despawn_stop_vehicles(self, vehicle: Any) -> bool:
 
-        """Remove the vehicle when reach the end of the road.
-        Stps vehicle if road closed
+        """Remove the vehicle from the lane index when reach the end of the road.
+        Stps vehicle if road closed.
+        The vehicle_list is compacted by update_vehicle once per frame
 
         Args:
             vehicle (Any): Either a Vehicle or Convoy instance
+
+        Returns:
+            bool: if the vehicle despawned
         """
 
         # If vehicle reached the end of the road
         # Remove vehicle from road
         if isinstance(vehicle, Convoy):
-            for convoy in vehicle.convoy_list:
-                if convoy.loc_front > self.road_length:
-                    if len(vehicle.convoy_list) == 1: # If last convoy in the convoy_list
-                        self.vehicle_list.remove(vehicle)
-                    else: # Remove one vehicle from the convoy
-                        vehicle.convoy_list.remove(convoy)
+            num_despawn = vehicle.count_despawned(self.road_length)
+            if num_despawn == vehicle.num_subconvoy: # If last convoy in the convoy
+                self.lane_index.remove(vehicle)
+                return True
+            if num_despawn > 0: # Remove the sub-convoy vehicles from the front of the convoy
+                vehicle.despawn_subconvoy(num_despawn)
 
         # Simulate roadblock by setting a SHC vehicle to 0m/s
         if self.road_closed is not None:
@@ -283,10 +361,13 @@ class Road:
                     vehicle.local_accel = 0
 
         if isinstance(vehicle, Vehicle) and vehicle.loc_front > self.road_length:
-            self.vehicle_list.remove(vehicle)
+            self.lane_index.remove(vehicle)
             self.vehicle_despawn += 1
-            if simulation_params['testing']:
+            if self.testing:
                 self.progress_bar.update(1)
+            return True
+
+        return False
 
 
     def update_vehicle(self) -> None:
@@ -294,42 +375,59 @@ class Road:
         """Updates the vehicle local and global parameters
         """
 
-        # Update vehicle local state
-        for idx, vehicle in enumerate(self.vehicle_list):
-            tmp_list = self.vehicle_list.copy()
-            tmp_list.pop(idx)
-            if isinstance(vehicle, Convoy):
-                vehicle.update_convoy_local(self.vehicle_list, vehicle_type='acc')
-            else:
-                vehicle.update_local(tmp_list, vehicle_type='shc')
+        profiler = self.profiler
 
-        for vehicle in self.vehicle_list:
-            if isinstance(vehicle, Convoy):
-                vehicle.update_convoy_global()
-            else:
-                vehicle.update_global()
+        # Update vehicle local state, surrounding vehicles, lane change and IDM
+        with profiler.phase('update_vehicle.local'):
+            for vehicle in self.vehicle_list:
+                if isinstance(vehicle, Convoy):
+                    vehicle.update_convoy_local(self.lane_index, vehicle_type='acc')
+                else:
+                    vehicle.update_local(self.lane_index, vehicle_type='shc', exclude=vehicle)
+
+        # Despawned vehicles are dropped in a single pass, vehicle_list is not modified while iterating
+        with profiler.phase('update_vehicle.global_despawn'):
+            remaining = []
+            for vehicle in self.vehicle_list:
+                if isinstance(vehicle, Convoy):
+                    vehicle.update_convoy_global()
+                else:
+                    vehicle.update_global()
+
+                if not self.despawn_stop_vehicles(vehicle=vehicle):
+                    remaining.append(vehicle)
+
+            self.vehicle_list = remaining
 
-            self.despawn_stop_vehicles(vehicle=vehicle)
+        # Re-sort the lanes after the vehicles moved
+        with profiler.phase('update_vehicle.lane_index'):
+            self.lane_index.update()
 
 
     def spawning(self) -> None:
 
-        """Initiate a vehicle spawn
+        """Queues the due arrivals and spawns the waiting arrivals that can enter the road.
+        Frames without a due or waiting arrival only peek at the schedule
         """
 
-        # Update spawn_timer
-        if road_params['vehicle_inflow'] > 0:
-            self.timer += (self.ts * simulation_params['playback_speed'])
-            if self.timer - self.last_spawn_time >= self.spawn_interval:
-                self.spawn_vehicle()
-
-        if road_params['onramp_inflow'] > 0:
-            # Update onramp_spawn_timer
-            self.onramp_timer += (self.ts * simulation_params['playback_speed'])
-            if self.onramp_timer - self.onramp_last_spawn_time >= self.onramp_spawn_interval:
-                self.spawn_onramp()
-        else:
-            self.onramp_timer, self.onramp_last_spawn_time, self.onramp_spawn_interval = 0,0,0
+        # Simulated time advances by ts per step regardless of playback speed
+        self.steps += 1
+        now = self.steps * self.ts
+
+        # Arrivals join the entry queues, Poisson headways can bring several arrivals in a frame
+        arrivals = self.arrivals.due(now)
+        while arrivals:
+            for arrival_time, source in arrivals:
+                if source == MAIN_ROAD:
+                    self.arrive_vehicle(arrival_time)
+                else:
+                    self.arrive_onramp(arrival_time)
+            arrivals = self.arrivals.due(now)
+
+        # The front arrival of every waiting entry lane tries to enter the road
+        for entry in self.entry_queues.values():
+            if entry.pending:
+                self.admit(entry)
 
 
     def update_road(self, restart: bool) -> Tuple[List[Any], bool]:
@@ -345,20 +443,16 @@ class Road:
         """
 
         if restart:
-            self.vehicle_list = []
-
-        # Checking for road close updates
-        self.check_road_closed()
-
-        # Checking for flow updates
-        self.check_inflow(self.timer, self.last_spawn_time, self.onramp_timer, self.onramp_last_spawn_time)
+            self.clear_vehicles()
 
-        self.update_vehicle()
+        with self.profiler.phase('update_vehicle'):
+            self.update_vehicle()
 
-        self.spawning()
+        with self.profiler.phase('spawning'):
+            self.spawning()
 
         # Terminates simulation when testing is completed
-        if simulation_params['testing'] and self.vehicle_despawn > self.total_vehicles:
+        if self.testing and self.vehicle_despawn > self.total_vehicles:
             self.run_flag = False
 
         return self.vehicle_list, self.run_flag # return vehicle list of this frame
@@ -0,0 +1,46 @@
+from typing import Any
+
+
+class RoadGeometry:
+
+    """Road parameters and lane y-coordinates of a SimConfig, shared by all vehicles
+    spawned under the same configuration
+    """
+
+    __slots__ = (
+        'num_lanes', 'toplane_loc', 'lanewidth', 'road_length', 'onramp_length', 'onramp_offset',
+        'onramp', 'leftlane', 'middlelane', 'rightlane', 'road_closed',
+    )
+
+
+    def __init__(self, config: Any) -> None:
+
+        """Initializing the road geometry from the road params of a SimConfig
+
+        Args:
+            config (Any): SimConfig of the simulation run
+        """
+
+        # Road params
+        self.num_lanes = config.num_lanes
+        self.toplane_loc = config.toplane_loc
+        self.lanewidth = config.lanewidth
+        self.road_length = config.road_length
+        self.onramp_length = config.onramp_length
+        self.onramp_offset = config.onramp_offset
+
+        # Getting y-coord of lanes
+        self.onramp = self.toplane_loc[1]
+        self.leftlane = self.toplane_loc[1] + self.lanewidth
+        self.middlelane = self.toplane_loc[1] + (self.lanewidth * 2)
+        self.rightlane = self.toplane_loc[1] + self.lanewidth * (self.num_lanes - 1)
+
+        # Getting road closure locations
+        if config.road_closed == "left":
+            self.road_closed = self.leftlane
+        elif config.road_closed == "middle":
+            self.road_closed = self.middlelane
+        elif config.road_closed == "right":
+            self.road_closed = self.rightlane
+        else:
+            self.road_closed = None
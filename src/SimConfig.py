@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field, fields, replace
+from functools import partial
+from types import MappingProxyType
+from src.RoadGeometry import RoadGeometry
+from common.config import road_params, driving_params, shc_params, acc_params, simulation_params
+from typing import Dict, Any, Tuple, Optional, Mapping
+
+
+def freeze_params(params: Mapping[str, Mapping[str, float]]) -> Mapping[str, Mapping[str, float]]:
+
+    """Copies a logic level table into read-only mappings, so that the tables of a SimConfig
+    are not shared with the dicts it was created from
+
+    Args:
+        params (Mapping[str, Mapping[str, float]]): logic level -> logic dict
+
+    Returns:
+        Mapping[str, Mapping[str, float]]: read-only copy
+    """
+
+    return MappingProxyType({level: MappingProxyType(dict(logic)) for level, logic in params.items()})
+
+
+@dataclass(frozen=True)
+class SimConfig:
+
+    """Immutable parameters of a simulation run, passed from the SimulationManager
+    to the Road and its vehicles. The derived values are computed once on creation,
+    a changed configuration is a new SimConfig created by SimConfig.update
+    """
+
+    # Road params
+    toplane_loc: Tuple[float, float]
+    road_length: float
+    onramp_length: float
+    onramp_offset: float
+    num_lanes: int
+    lanewidth: float
+    vehicle_inflow: int
+    onramp_inflow: int
+    num_convoy_vehicles: int
+    road_closed: Optional[str]
+    arrival_process: str
+
+    # Driving params
+    desired_velocity: float
+    safety_threshold: float
+    max_acceleration: float
+    comfortable_deceleration: float
+    acceleration_component: float
+    left_bias: float
+    lane_change_threshold: float
+    acc_logic: str
+    shc_logic: str
+    acc_spawnrate: float
+    shc_params: Mapping[str, Mapping[str, float]] # logic level -> logic dict, read-only
+    acc_params: Mapping[str, Mapping[str, float]] # logic level -> logic dict, read-only
+
+    # Simulation params
+    ts: float
+    seed: int
+    num_vehicles: int
+    testing: bool
+    record: bool
+    engine: str
+    folderpath: str
+    filename: str
+    record_format: str
+    flush_frames: int
+    record_queue: int
+    record_backpressure: str
+    export_uuids: bool
+    detector_sections: Tuple[Tuple[float, float], ...]
+    detector_interval: float
+    profile: bool
+    profile_trace: Optional[str]
+
+    # Derived values
+    geometry: RoadGeometry = field(init=False, repr=False, compare=False)
+    onramp_x: float = field(init=False)
+    spawn_interval: float = field(init=False)
+    onramp_spawn_interval: float = field(init=False)
+    shc_logic_dict: Mapping[str, float] = field(init=False, repr=False)
+    acc_logic_dict: Mapping[str, float] = field(init=False, repr=False)
+
+
+    def __post_init__(self) -> None:
+
+        """Computes the derived values, the dataclass is frozen so they are set with object.__setattr__.
+        The logic level tables are copied into read-only mappings
+        """
+
+        object.__setattr__(self, "shc_params", freeze_params(self.shc_params))
+        object.__setattr__(self, "acc_params", freeze_params(self.acc_params))
+
+        derived = {
+            "geometry": RoadGeometry(self), # lane y-coords and road closure lane
+            "onramp_x": self.toplane_loc[0] + self.onramp_offset,
+            # per/hour -> per second, round to 1dp since ts is 1dp
+            "spawn_interval": round(1.0/(self.vehicle_inflow / 3600), 1) if self.vehicle_inflow > 0 else 0,
+            "onramp_spawn_interval": round(1.0/(self.onramp_inflow / 3600), 1) if self.onramp_inflow > 0 else 0,
+            "shc_logic_dict": self.shc_params[self.shc_logic],
+            "acc_logic_dict": self.acc_params[self.acc_logic],
+        }
+
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+
+    @classmethod
+    def from_params(cls) -> "SimConfig":
+
+        """Creates a SimConfig from the parameter dicts of common/config.py
+
+        Returns:
+            SimConfig: default configuration
+        """
+
+        return cls(
+            toplane_loc=tuple(road_params['toplane_loc']),
+            road_length=road_params['road_length'],
+            onramp_length=road_params['onramp_length'],
+            onramp_offset=road_params['onramp_offset'],
+            num_lanes=road_params['num_lanes'],
+            lanewidth=road_params['lanewidth'],
+            vehicle_inflow=road_params['vehicle_inflow'],
+            onramp_inflow=road_params['onramp_inflow'],
+            num_convoy_vehicles=road_params['num_convoy_vehicles'],
+            road_closed=road_params['road_closed'],
+            arrival_process=road_params['arrival_process'],
+            desired_velocity=driving_params['desired_velocity'],
+            safety_threshold=driving_params['safety_threshold'],
+            max_acceleration=driving_params['max_acceleration'],
+            comfortable_deceleration=driving_params['comfortable_deceleration'],
+            acceleration_component=driving_params['acceleration_component'],
+            left_bias=driving_params['left_bias'],
+            lane_change_threshold=driving_params['lane_change_threshold'],
+            acc_logic=driving_params['acc_logic'],
+            shc_logic=driving_params['shc_logic'],
+            acc_spawnrate=acc_params['acc_spawnrate'],
+            shc_params=shc_params,
+            acc_params={level: logic for level, logic in acc_params.items() if isinstance(logic, dict)},
+            ts=simulation_params['ts'],
+            seed=simulation_params['seed'],
+            num_vehicles=simulation_params['num_vehicles'],
+            testing=simulation_params['testing'],
+            record=simulation_params['record'],
+            engine=simulation_params['engine'],
+            folderpath=simulation_params['folderpath'],
+            filename=simulation_params['filename'],
+            record_format=simulation_params['record_format'],
+            flush_frames=simulation_params['flush_frames'],
+            record_queue=simulation_params['record_queue'],
+            record_backpressure=simulation_params['record_backpressure'],
+            export_uuids=simulation_params['export_uuids'],
+            detector_sections=tuple(tuple(section) for section in simulation_params['detector_sections']),
+            detector_interval=simulation_params['detector_interval'],
+            profile=simulation_params['profile'],
+            profile_trace=simulation_params['profile_trace'],
+        )
+
+
+    def update(self, **changes: Any) -> "SimConfig":
+
+        """Creates a SimConfig with updated parameters, e.g. from user interaction
+
+        Args:
+            **changes (Any): parameter name -> new value
+
+        Returns:
+            SimConfig: updated configuration, or this SimConfig if nothing changed
+        """
+
+        if all(getattr(self, name) == value for name, value in changes.items()):
+            return self
+
+        return replace(self, **changes)
+
+
+    def to_dict(self) -> Dict[str, Any]:
+
+        """Gets the parameters of the run without the derived values, e.g. for recording headers
+
+        Returns:
+            Dict[str, Any]: parameter name -> value, the logic level tables as dicts
+        """
+
+        params = {param.name: getattr(self, param.name) for param in fields(self) if param.init}
+        for name in ("shc_params", "acc_params"):
+            params[name] = {level: dict(logic) for level, logic in params[name].items()}
+
+        return params
+
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+
+        """Pickles the SimConfig by its parameters, e.g. for the worker processes of Sweep,
+        the read-only tables cannot be pickled directly
+
+        Returns:
+            Tuple[Any, ...]: constructor with the parameters and no arguments
+        """
+
+        return partial(type(self), **self.to_dict()), ()
@@ -1,10 +1,18 @@
-import json
 import os
+import json
 
 from src.Road import Road
-from src.Vehicle import Vehicle
-from common.config import simulation_params
-from typing import Dict, List, Any, Tuple
+from src.VectorRoad import VectorRoad
+from src.SimConfig import SimConfig
+from src.FrameSnapshot import FrameSnapshot
+from src.Recorder import create_recorder, uuids_path, EXTENSIONS
+from src.RecordWriter import RecordWriter
+from src.Detectors import Detectors
+from src.Profiler import Profiler
+from typing import Dict, List, Any, Tuple, Optional
+
+DETECTOR_SUFFIX = "_detectors.csv" # appended to the recording filename
+
 
 class SimulationManager:
 
@@ -12,37 +20,108 @@ class SimulationManager:
     This class links the Window class to the Road class via `update_frame`
     """
 
-    def __init__(self) -> None:
+    def __init__(self, config: Optional[SimConfig] = None) -> None:
 
         """Initializes the class by creating instances of the Road class, and initializing
         dictionaries for displaying vehicles and recording data.
+
+        Args:
+            config (Optional[SimConfig]): parameters of the simulation run, defaults to common/config.py
+        """
+
+        self.config = SimConfig.from_params() if config is None else config
+
+        # Create Road class, vector engine steps all vehicles with array operations
+        self.road = VectorRoad(self.config) if self.config.engine == 'vector' else Road(self.config)
+        self.recorder = None # background writer of the recorded frames, started on the first recorded frame
+        self.snapshot = None # vehicle state of the current frame, exported when first requested
+        self.detectors = self.create_detectors()
+
+        # Per-phase timings of every frame, shared with the Road
+        self.profiler = Profiler(enabled=self.config.profile, trace_path=self.config.profile_trace)
+        self.road.profiler = self.profiler
+
+
+    def frame_snapshot(self) -> FrameSnapshot:
+
+        """Exports the vehicle state of the current frame once, shared by the recorder and the renderer
+
+        Returns:
+            FrameSnapshot: vehicle attributes of the frame
         """
 
-        self.road = Road() # Create Road class
-        self.record_dict = {} # Dict of vehicle_list, key = iteration, value = vehicle_list
+        if self.snapshot is None:
+            with self.profiler.phase('snapshot'):
+                self.snapshot = self.road.frame_snapshot()
 
+        return self.snapshot
 
-    def converting_objects(self, vehicle_list: List[Any]) -> List[Dict[str, float]]:
 
-        """The function "converting_objects" takes a list of vehicles
-        and returns a list of their vehicle IDs, including ACC vehicles.
+    def create_detectors(self) -> Optional[Detectors]:
+
+        """Creates the virtual loop detectors of the SimConfig
+
+        Returns:
+            Optional[Detectors]: detectors measured every step, None if no sections are configured
+        """
+
+        if not self.config.detector_sections:
+            return None
+
+        return Detectors(self.config.detector_sections, interval=self.config.detector_interval, ts=self.config.ts,
+                         road_end=self.config.road_length)
+
+
+    def update_config(self, **changes: Any) -> None:
+
+        """Applies parameter changes from user interaction to the simulation
 
         Args:
-            vehicle_list (List[Any]): list of Vehicles and Convoy
+            **changes (Any): SimConfig parameter name -> new value
+        """
+
+        config = self.config.update(**changes)
+        if config is not self.config:
+            detector_params = ('detector_sections', 'detector_interval', 'road_length')
+            rebuild_detectors = any(getattr(config, name) != getattr(self.config, name) for name in detector_params)
+            self.config = config
+            self.road.update_config(config)
+            if rebuild_detectors:
+                self.detectors = self.create_detectors()
+
+
+    def create_writer(self) -> RecordWriter:
+
+        """Starts the background writer of the recorder of the SimConfig record_format
 
         Returns:
-            List[Dict[str, float]]: list of dictionary vehicle attributes
+            RecordWriter: writer receiving the recorded frames
         """
 
-        vehicle_stats = []
+        return RecordWriter(create_recorder(self.config), queue_size=self.config.record_queue,
+                            backpressure=self.config.record_backpressure)
 
-        for vehicle in vehicle_list:
-            if isinstance(vehicle, Vehicle):
-                vehicle_stats.append(vehicle.vehicle_id())
-            else:
-                vehicle_stats.extend(convoy.vehicle_id() for convoy in vehicle.convoy_list)
 
-        return vehicle_stats
+    def record_stats(self) -> Dict[str, float]:
+
+        """Gets the queue depth, bytes written and stall time of the recording
+
+        Returns:
+            Dict[str, float]: statistic name -> value, empty if nothing is being recorded
+        """
+
+        return {} if self.recorder is None else self.recorder.stats()
+
+
+    def entry_stats(self) -> Dict[str, float]:
+
+        """Gets the entry queue lengths and the requested, arrived and actual inflows of the road
+
+        Returns:
+            Dict[str, float]: statistic name -> value, see Road.entry_stats
+        """
+
+        return self.road.entry_stats()
 
 
     def update_frame(self, is_recording: bool, frame: int, restart: bool) -> Tuple[List[Any], bool]:
@@ -58,36 +137,104 @@ class SimulationManager:
             Tuple[List[Any], bool]: list of Vehicles and Convoy, simulation running flag
         """
 
-        vehicle_list, run_flag = self.road.update_road(restart=restart)
-
-        # Records the simulation
-        if is_recording:
-            self.record_dict[frame] = self.converting_objects(vehicle_list=vehicle_list)
-
-        # Resets the recorded dictionary
-        if restart:
-            self.record_dict = {}
+        profiler = self.profiler
+
+        with profiler.phase('frame'):
+            with profiler.phase('road'):
+                vehicle_list, run_flag = self.road.update_road(restart=restart)
+            self.snapshot = None
+
+            # Measures the detector sections every step, the snapshot is only built if the frame is recorded
+            if self.detectors is not None:
+                if restart:
+                    self.detectors.reset()
+                if is_recording:
+                    snapshot = self.frame_snapshot()
+                    x, speed = snapshot.x, snapshot.speed
+                else:
+                    x, speed = self.road.detector_state()
+                with profiler.phase('detectors'):
+                    self.detectors.update(x, speed)
+
+            # Records the simulation, the frame is written by the background writer
+            if is_recording:
+                if self.recorder is None:
+                    self.recorder = self.create_writer()
+                snapshot = self.frame_snapshot()
+                with profiler.phase('record'):
+                    self.recorder.write(frame, snapshot)
+
+            # Resets the recorded frames
+            if restart and self.recorder is not None:
+                self.recorder.reset()
+
+        profiler.end_frame(frame)
 
         return vehicle_list, run_flag
 
 
-    def saving_record(self) -> None:
+    def saving_record(self, filepath: Optional[str] = None) -> None:
+
+        """Finalizes the recorded vehicle attributes, in the record_format of the SimConfig
 
-        """Saves the recorded vehicle attributes
+        Args:
+            filepath (Optional[str]): file to save to, defaults to a new file in the data folder
         """
 
         idx = 0
-        filepath = os.path.join(simulation_params['folderpath'], simulation_params['filename'] + ".json")
+        extension = EXTENSIONS[self.config.record_format]
+        explicit = filepath is not None
+        if not explicit:
+            filepath = os.path.join(self.config.folderpath, self.config.filename + extension)
 
         print("Saving data ...")
 
         # If file exist in folder, append an index to the back of the filename
-        while os.path.exists(filepath):
-            filename = f"{simulation_params['filename']}_{idx}"
-            filepath = os.path.join(simulation_params['folderpath'], f"{filename}.json")
+        while not explicit and os.path.exists(filepath):
+            filename = f"{self.config.filename}_{idx}"
+            filepath = os.path.join(self.config.folderpath, f"{filename}{extension}")
             idx += 1
 
-        with open(filepath, "w") as file:
-            json.dump(self.record_dict, file, indent=4)
+        if self.recorder is None:
+            self.recorder = self.create_writer()
+        self.recorder.close(filepath, record_format=self.config.record_format)
+        stats = self.recorder.stats()
+        self.recorder = None
+
+        # Optional mapping of the integer vehicle ids to uuid strings
+        if self.config.export_uuids:
+            with open(uuids_path(filepath), "w") as file:
+                json.dump(self.road.uuid_mapping(), file)
+
+        print("Data Saved!")
+        print(
+            f"Frames written: {stats['frames_written']}, dropped: {stats['frames_dropped']}, "
+            f"bytes: {stats['bytes_written']}, max queue depth: {stats['max_queue_depth']}, "
+            f"stall time: {stats['stall_time']:.3f}s"
+        )
+
+
+    def saving_detectors(self, filepath: Optional[str] = None) -> None:
+
+        """Saves the time series of the virtual loop detectors as a csv file
+
+        Args:
+            filepath (Optional[str]): file to save to, defaults to a new file in the data folder
+        """
+
+        if self.detectors is None:
+            return
+
+        idx = 0
+        explicit = filepath is not None
+        if not explicit:
+            filepath = os.path.join(self.config.folderpath, f"{self.config.filename}{DETECTOR_SUFFIX}")
+
+        # If file exist in folder, append an index to the back of the filename
+        while not explicit and os.path.exists(filepath):
+            filepath = os.path.join(self.config.folderpath, f"{self.config.filename}_{idx}{DETECTOR_SUFFIX}")
+            idx += 1
 
-        print("Data Saved!")
\ No newline at end of file
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        self.detectors.save(filepath)
+        print(f"Detectors Saved: {filepath}")
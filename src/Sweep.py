@@ -0,0 +1,209 @@
+import os
+import queue
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import Manager
+from tqdm import tqdm
+from src.Test import Test
+from src.SimConfig import SimConfig
+from src.Recorder import EXTENSIONS, uuids_path
+from src.Simulation import DETECTOR_SUFFIX
+from typing import List, Dict, Any, Union, Optional, Tuple
+
+
+class ProgressRelay:
+
+    """Stands in for the tqdm progress bar of the Road in a worker process,
+    the despawned vehicles are sent to the progress bar of the main process
+    """
+
+    def __init__(self, progress_queue: Any) -> None:
+
+        """Initializing the relay
+
+        Args:
+            progress_queue (Any): queue shared with the main process
+        """
+
+        self.progress_queue = progress_queue
+
+
+    def update(self, n: int = 1) -> None:
+
+        """Sends the number of newly despawned vehicles
+
+        Args:
+            n (int): number of despawned vehicles
+        """
+
+        self.progress_queue.put(n)
+
+
+    def close(self) -> None:
+
+        """Nothing to close, the progress bar is owned by the main process
+        """
+
+
+def combination_config(base_config: SimConfig, combination: int, testing_list: List[Union[str, int, None]]) -> SimConfig:
+
+    """Builds the SimConfig of a combination
+
+    Args:
+        base_config (SimConfig): parameters shared by all combinations
+        combination (int): combination number
+        testing_list (List[Union[str, int, None]]): [ACC Logic, SHC Logic, Road Closure, On-ramp Flow, Vehicle Inflow]
+
+    Returns:
+        SimConfig: parameters of the combination
+    """
+
+    return base_config.update(
+        vehicle_inflow=testing_list[4],
+        onramp_inflow=testing_list[3],
+        road_closed=testing_list[2],
+        shc_logic=testing_list[1],
+        acc_logic=testing_list[0],
+        acc_spawnrate=0 if combination == 0 else 0.2,
+        testing=True,
+        # Combinations can share the same parameters, the combination number keeps the files distinct
+        filename=f"ACC{testing_list[0]}_SHC{testing_list[1]}_RoadNo_RampIn{testing_list[3]}_VehIn{testing_list[4]}_Comb{combination}",
+    )
+
+
+def output_path(config: SimConfig) -> str:
+
+    """Gets the file the recording of a combination is saved to,
+    or the detector time series if the trajectories are not recorded
+
+    Args:
+        config (SimConfig): parameters of the combination
+
+    Returns:
+        str: filepath of the recording
+    """
+
+    if not config.record:
+        return detector_path(config)
+
+    return os.path.join(config.folderpath, config.filename + EXTENSIONS[config.record_format])
+
+
+def detector_path(config: SimConfig) -> str:
+
+    """Gets the file the detector time series of a combination is saved to
+
+    Args:
+        config (SimConfig): parameters of the combination
+
+    Returns:
+        str: filepath of the detector time series
+    """
+
+    return os.path.join(config.folderpath, config.filename + DETECTOR_SUFFIX)
+
+
+def init_worker() -> None:
+
+    """Silences the worker prints, the progress is displayed by the main process
+    """
+
+    sys.stdout = open(os.devnull, "w")
+    sys.stderr = open(os.devnull, "w")
+
+
+def run_combination(combination: int, config: SimConfig, progress_queue: Any) -> Tuple[int, float]:
+
+    """Runs a single combination in a worker process
+
+    Args:
+        combination (int): combination number
+        config (SimConfig): parameters of the combination, seeded with its run seed
+        progress_queue (Any): queue shared with the main process
+
+    Returns:
+        Tuple[int, float]: combination number, run time in seconds
+    """
+
+    start_time = time.time()
+
+    test = Test(config)
+    test.sim.road.progress_bar = ProgressRelay(progress_queue)
+
+    # Saved under temporary names so that an interrupted run is not skipped on resume,
+    # the recording is renamed last since its name marks the combination as done
+    renames = [(detector_path(config) + ".tmp", detector_path(config))]
+    record_path = output_path(config)
+    if config.record:
+        # The uuid mapping is named after the temporary recording
+        renames.append((uuids_path(record_path + ".tmp"), uuids_path(record_path)))
+        renames.append((record_path + ".tmp", record_path))
+    test.run_test(filepath=record_path + ".tmp", detector_filepath=renames[0][0])
+    for tmp_path, filepath in renames:
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, filepath)
+
+    return combination, time.time() - start_time
+
+
+def run_sweep(testing_params: Dict[int, List[Union[str, int, None]]], base_config: Optional[SimConfig] = None,
+              num_workers: Optional[int] = None, seed: Optional[int] = None, resume: bool = True) -> None:
+
+    """Runs the combinations in parallel worker processes
+
+    Args:
+        testing_params (Dict[int, List[Union[str, int, None]]]): combination number -> list of parameters
+        base_config (Optional[SimConfig]): parameters shared by all combinations, defaults to common/config.py
+        num_workers (Optional[int]): number of worker processes, defaults to the number of CPUs
+        seed (Optional[int]): base seed, combination i is seeded with seed + i, defaults to the seed of base_config
+        resume (bool): skips the combinations whose recording already exists
+    """
+
+    start = time.time()
+    num_workers = num_workers or os.cpu_count()
+    base_config = SimConfig.from_params() if base_config is None else base_config
+    seed = base_config.seed if seed is None else seed
+
+    configs = {}
+    for combination, testing_list in testing_params.items():
+        config = combination_config(base_config, combination, testing_list).update(seed=seed + combination)
+        if resume and os.path.exists(output_path(config)):
+            print(f"Combination {combination} already recorded, skipping")
+            continue
+        configs[combination] = config
+
+    if not configs:
+        print("All combinations recorded")
+        return
+
+    os.makedirs(base_config.folderpath, exist_ok=True)
+    # A test ends once one more than num_vehicles vehicles despawned
+    total_vehicles = sum(config.num_vehicles + 1 for config in configs.values())
+
+    with Manager() as manager, ProcessPoolExecutor(max_workers=min(num_workers, len(configs)), initializer=init_worker) as executor:
+        progress_queue = manager.Queue()
+        pending = {
+            executor.submit(run_combination, combination, config, progress_queue)
+            for combination, config in configs.items()
+        }
+
+        with tqdm(total=total_vehicles, desc=f"Despawning Vehicles ({len(configs)} combinations)") as progress_bar:
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+
+                while True:
+                    try:
+                        progress_bar.update(progress_queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for future in done:
+                    combination, run_time = future.result()
+                    progress_bar.write(f"Combination {combination} took {run_time}")
+
+    end = time.time()
+    print("============================")
+    print(f"Simulation Ended: {end-start}")
+    print("============================")
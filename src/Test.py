@@ -1,4 +1,6 @@
 from src.Simulation import SimulationManager
+from src.SimConfig import SimConfig
+from typing import Optional
 
 
 class Test:
@@ -6,19 +8,27 @@ class Test:
     """class to manage testing
     """
 
-    def __init__(self):
+    def __init__(self, config: Optional[SimConfig] = None):
 
         """Initializing variables for testing class
+
+        Args:
+            config (Optional[SimConfig]): parameters of the test, defaults to common/config.py
         """
 
-        self.sim = SimulationManager()
-        self.is_recording = True
+        self.sim = SimulationManager(config)
+        self.is_recording = self.sim.config.record # detector-only runs skip the trajectory recording
         self.is_running = True
 
 
-    def run_test(self):
+    def run_test(self, filepath: Optional[str] = None, detector_filepath: Optional[str] = None, save: bool = True):
+
+        """Runs the test headless, the simulation is stepped by ts as fast as possible
 
-        """Runs the test
+        Args:
+            filepath (Optional[str]): file to save the recording to, defaults to a new file in the data folder
+            detector_filepath (Optional[str]): file to save the detector time series to, defaults to a new file in the data folder
+            save (bool): saves the recording and the detector time series, e.g. False when only the summaries are kept
         """
 
         frame = 0
@@ -29,4 +39,19 @@ class Test:
                 frame += 1
 
         # Saves Data
-        self.sim.saving_record()
+        if save:
+            if self.is_recording:
+                self.sim.saving_record(filepath=filepath)
+            self.sim.saving_detectors(filepath=detector_filepath)
+
+            # Arrivals still waiting upstream did not enter the road
+            stats = self.sim.entry_stats()
+            print(
+                f"Inflow requested: {stats['main_requested_inflow']}, actual: {stats['main_actual_inflow']:.0f} veh/h, "
+                f"queued: {stats['main_queue_length']}, max queue length: {stats['main_max_queue_length']}"
+            )
+
+        # Prints where the time of the frames went
+        if self.sim.profiler.enabled:
+            self.sim.profiler.close()
+            print(self.sim.profiler.report())
@@ -0,0 +1,553 @@
+import math
+import numpy as np
+
+from src.ACC import Convoy
+from src.Road import Road
+from src.SimConfig import SimConfig
+from typing import Any
+
+
+class VectorRoad(Road):
+
+    """Creates a road instance that steps the IDM of all vehicles at once.
+    The vehicle states and IDM parameters are held in NumPy arrays, one row per
+    SHC vehicle or convoy (driven by its lead vehicle), in the order of vehicle_list
+    """
+
+    # Per-row state, the IDM and MOBIL parameters of the driving vehicle and convoy geometry
+    FIELDS = ('x', 'y', 'v', 'accel', 'key', 'back',
+              'v_0', 's_0', 'a', 'b', 'delta', 'T', 'sqrt_ab', 'veh_length',
+              'left_bias', 'politeness', 'change_threshold', 'road_closed_lane',
+              'convoy_dist', 'num_sub')
+    FLAGS = ('is_convoy',)
+
+    def __init__(self, config: SimConfig) -> None:
+
+        """Initializing the Road and the empty vehicle arrays
+
+        Args:
+            config (SimConfig): parameters of the simulation run
+        """
+
+        super().__init__(config)
+
+        self.onramp_offset = config.onramp_offset
+        self.ts_squared = math.pow(self.ts, 2)
+
+        self.capacity = 64
+        self.size = 0
+        self.drivers = [] # lead Vehicle of each row
+        for field in self.FIELDS:
+            setattr(self, field, np.zeros(self.capacity))
+        for flag in self.FLAGS:
+            setattr(self, flag, np.zeros(self.capacity, dtype=bool))
+
+
+    def add_vehicle(self, vehicle: Any) -> None:
+
+        """Adds a spawned vehicle to the road and appends its row to the arrays
+
+        Args:
+            vehicle (Any): Either a Vehicle or Convoy instance
+        """
+
+        super().add_vehicle(vehicle)
+
+        if self.size == self.capacity:
+            self.capacity *= 2
+            for field in self.FIELDS + self.FLAGS:
+                setattr(self, field, np.resize(getattr(self, field), self.capacity))
+
+        is_convoy = isinstance(vehicle, Convoy)
+        driver = vehicle.lead_vehicle if is_convoy else vehicle
+        row = self.size
+
+        self.x[row], self.y[row] = driver.loc
+        self.v[row] = driver.v
+        self.accel[row] = driver.local_accel
+        self.key[row] = vehicle.loc[0]
+        self.back[row] = vehicle.loc_back
+        model, road_closed = driver.driver, driver.geometry.road_closed
+        self.v_0[row] = model.v_0
+        self.s_0[row] = model.s_0
+        self.a[row] = model.a
+        self.b[row] = model.b
+        self.delta[row] = model.delta
+        self.T[row] = model.T
+        self.sqrt_ab[row] = model.sqrt_ab
+        self.veh_length[row] = driver.veh_length
+        self.left_bias[row] = model.left_bias
+        self.politeness[row] = model.politeness
+        self.change_threshold[row] = model.change_threshold
+        self.road_closed_lane[row] = np.nan if road_closed is None else road_closed
+        self.convoy_dist[row] = vehicle.convoy_dist if is_convoy else 0
+        self.num_sub[row] = vehicle.num_subconvoy if is_convoy else 1
+        self.is_convoy[row] = is_convoy
+
+        self.drivers.append(driver)
+        self.size += 1
+
+
+    def clear_vehicles(self) -> None:
+
+        """Removes all vehicles from the road and the arrays
+        """
+
+        super().clear_vehicles()
+        self.drivers = []
+        self.size = 0
+
+
+    def sort_lanes(self) -> None:
+
+        """Sorts the rows of each lane by the x-coord seen by the other vehicles,
+        vehicles at the same x-coord stay in spawn order
+        """
+
+        n = self.size
+        y, key = self.y[:n], self.key[:n]
+        order = np.lexsort((np.arange(n), key, y))
+        lanes, starts = np.unique(y[order], return_index=True)
+        stops = np.append(starts[1:], n)
+
+        self.lanes = {
+            lane: (order[start:stop], key[order[start:stop]])
+            for lane, start, stop in zip(lanes.tolist(), starts, stops)
+        }
+
+
+    def get_front_rows(self, rows: np.ndarray, lane_offset: float) -> np.ndarray:
+
+        """Gets the closest vehicle in front of every row in the lane at lane_offset,
+        the same vehicle as LaneIndex.get_front
+
+        Args:
+            rows (np.ndarray): investigated rows
+            lane_offset (float): y-offset of the searched lane from the row lane
+
+        Returns:
+            np.ndarray: row index of the front vehicle, -1 if there is none
+        """
+
+        front = np.full(rows.shape[0], -1)
+        target_y = self.y[rows] + lane_offset
+
+        for lane, (order, keys) in self.lanes.items():
+            in_lane = np.flatnonzero(target_y == lane)
+            pos = np.searchsorted(keys, self.x[rows[in_lane]], side='right')
+            found = pos < order.shape[0]
+            front[in_lane[found]] = order[pos[found]]
+
+        return front
+
+
+    def get_back_rows(self, rows: np.ndarray, lane_offset: float) -> np.ndarray:
+
+        """Gets the closest vehicle behind every row in the lane at lane_offset,
+        the same vehicle as LaneIndex.get_back
+
+        Args:
+            rows (np.ndarray): investigated rows
+            lane_offset (float): y-offset of the searched lane from the row lane
+
+        Returns:
+            np.ndarray: row index of the back vehicle, -1 if there is none
+        """
+
+        back = np.full(rows.shape[0], -1)
+        target_y = self.y[rows] + lane_offset
+
+        for lane, (order, keys) in self.lanes.items():
+            in_lane = np.flatnonzero(target_y == lane)
+            pos = np.searchsorted(keys, self.x[rows[in_lane]], side='left') - 1
+            found = pos >= 0
+            # Earliest spawned of the vehicles at the same x-coord
+            first = np.searchsorted(keys, keys[pos[found]], side='left')
+            back[in_lane[found]] = order[first]
+
+        return back
+
+
+    def get_side_rows(self, rows: np.ndarray, lane_offset: float) -> np.ndarray:
+
+        """Checks if there is an adjacent vehicle next to every row in the lane at lane_offset,
+        using the Vehicle.get_side_params conditions on every nearby vehicle pair.
+        A convoy is checked as one rigid block from its lead front to its tail back
+
+        Args:
+            rows (np.ndarray): investigated rows
+            lane_offset (float): y-offset of the adjacent lane from the row lane
+
+        Returns:
+            np.ndarray: adjacent vehicle flag of every row
+        """
+
+        n = self.size
+        has_side = np.zeros(rows.shape[0], dtype=bool)
+        target_y = self.y[rows] + lane_offset
+        extent = np.max(self.x[:n] + self.veh_length[:n] / 2 - self.back[:n])
+
+        for lane, (order, keys) in self.lanes.items():
+            in_lane = np.flatnonzero(target_y == lane)
+            observer = rows[in_lane]
+            x = self.x[observer]
+            reach = self.veh_length[observer] + 4 * extent
+
+            # Every (observer, nearby vehicle) pair
+            lo = np.searchsorted(keys, x - reach, side='left')
+            counts = np.searchsorted(keys, x + reach, side='right') - lo
+            pair = np.repeat(np.arange(in_lane.shape[0]), counts)
+            offset = np.arange(pair.shape[0]) - np.repeat(np.cumsum(counts) - counts, counts)
+            target = order[lo[pair] + offset]
+
+            obs_x = x[pair]
+            length = self.veh_length[observer][pair]
+            obs_front, obs_back = obs_x + length / 2, obs_x - length / 2
+            front_check = self.key[target] > obs_x
+            back_check = self.key[target] < obs_x
+            target_front = self.x[target] + self.veh_length[target] / 2
+            target_back = self.back[target]
+
+            in_between = (
+                (back_check & (obs_back - target_front <= 3 * length) & (obs_front > target_front))
+                | ((obs_back >= target_back) & (obs_front <= target_front))
+                | (front_check & (target_back - obs_front <= 3 * length) & (obs_front > target_back))
+            )
+
+            has_side[in_lane] = np.bincount(pair[in_between], minlength=in_lane.shape[0]) > 0
+
+            # A vehicle at the exact same x-coord can reset the adjacent vehicle, use the sequential rules
+            for idx in np.unique(pair[in_between & ~front_check & ~back_check]):
+                driver = self.drivers[observer[idx]]
+                has_side[in_lane[idx]] = self.lane_index.get_side(driver, lane=lane, side_blocked=False) is not None
+
+        return has_side
+
+
+    def calc_acceleration(self, rows: Any, v: np.ndarray, surrounding_v: np.ndarray, s: np.ndarray) -> np.ndarray:
+
+        """Calculates the IDM acceleration of the rows, as DriverModel.calc_acceleration
+
+        Args:
+            rows (Any): row indices or slice of the driving vehicles
+            v (np.ndarray): current vehicle velocities
+            surrounding_v (np.ndarray): velocities of the other vehicles
+            s (np.ndarray): current actual distances
+
+        Returns:
+            np.ndarray: vehicle accelerations
+        """
+
+        delta_v = v - surrounding_v
+        s_star = self.s_0[rows] + np.maximum(0, self.T[rows] * v + (v * delta_v) / (2 * self.sqrt_ab[rows]))
+
+        return self.a[rows] * (1 - np.power(v / self.v_0[rows], self.delta[rows]) - np.power(s_star / s, 2))
+
+
+    def calc_lane_change(self, rows: np.ndarray, change_dir: str, current_front: np.ndarray) -> np.ndarray:
+
+        """Determines if the rows should change lane, as Vehicle.calc_lane_change.
+        Computes the MOBIL incentive, the politeness-weighted disadvantage to the new back
+        vehicle and the safety criterion for all rows at once
+
+        Args:
+            rows (np.ndarray): investigated rows
+            change_dir (str): the direction of the lane change
+            current_front (np.ndarray): row index of the current front vehicle
+
+        Returns:
+            np.ndarray: change lane flag of every row
+        """
+
+        lane_offset = -self.lanewidth if change_dir == 'left' else self.lanewidth
+        new_front = self.get_front_rows(rows, lane_offset)
+        new_back = self.get_back_rows(rows, lane_offset)
+        has_side = self.get_side_rows(rows, lane_offset)
+
+        x, v = self.x[rows], self.v[rows]
+        veh_length = self.veh_length[rows]
+        loc_front, loc_back = x + veh_length / 2, x - veh_length / 2
+        onramp_flag = self.y[rows] == self.onramp
+        free_dist = np.where(onramp_flag, self.onramp_length, self.road_length)
+
+        has_current_front = current_front >= 0
+        has_new_front = new_front >= 0
+        has_new_back = new_back >= 0
+
+        # Distance and velocity of the current and new front vehicles
+        current_front_dist = np.where(has_current_front, self.back[current_front] - loc_front, free_dist)
+        current_front_v = np.where(has_current_front, self.v[current_front], v)
+        onramp_end = onramp_flag & ~has_current_front
+        current_front_dist = np.where(onramp_end, self.onramp_length - loc_front, current_front_dist)
+        current_front_v = np.where(onramp_end, 0, current_front_v)
+
+        new_front_dist = np.where(has_new_front, self.back[new_front] - loc_front, free_dist)
+        new_front_v = np.where(has_new_front, self.v[new_front], v)
+
+        # Disadvantage and new acceleration of the new back vehicle
+        back_rows = np.where(has_new_back, new_back, rows)
+        new_back_front = self.x[back_rows] + self.veh_length[back_rows] / 2
+        new_back_v = self.v[back_rows]
+        current_back_dist = np.where(has_new_front, self.back[new_front] - new_back_front, free_dist)
+        current_back_v = np.where(has_new_front, self.v[new_front], v)
+        current_back_dist = np.where(onramp_end, self.onramp_length - loc_back, current_back_dist)
+        current_back_v = np.where(onramp_end, v, current_back_v)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new_back_accel = self.calc_acceleration(back_rows, new_back_v, v, loc_back - new_back_front)
+            disadvantage = self.calc_acceleration(back_rows, new_back_v, current_back_v, current_back_dist) - new_back_accel
+        new_back_accel = np.where(has_new_back, new_back_accel, 0)
+        disadvantage = np.where(has_new_back, disadvantage, 0)
+
+        # Positional safety
+        safe_front = ~has_new_front | (self.back[new_front] > loc_front)
+        safe_back = ~has_new_back | (self.x[back_rows] - self.veh_length[back_rows] / 2 < loc_back)
+        is_safe = safe_front & safe_back & ~has_side
+
+        # MOBIL incentive with keep left bias and kinematic-based safety criterion
+        new_front_accel = self.calc_acceleration(rows, v, new_front_v, new_front_dist)
+        current_accel = self.calc_acceleration(rows, v, current_front_v, current_front_dist)
+        a_bias = -self.left_bias[rows] if change_dir == 'left' else self.left_bias[rows]
+        change_incentive = (
+            (new_front_accel - current_accel - (self.politeness[rows] * disadvantage) > self.change_threshold[rows] + a_bias)
+            & (new_back_accel >= -self.b[rows])
+        )
+
+        # For front vehicle stopped at onramp
+        stopped_front = (
+            is_safe
+            & ~has_current_front
+            & (x >= self.onramp_length - loc_front - veh_length - self.s_0[rows])
+            & (v >= 0)
+        )
+
+        return stopped_front | (change_incentive & is_safe)
+
+
+    def check_lane_change(self, front: np.ndarray) -> np.ndarray:
+
+        """Batched lane change stage following the rules of Vehicle.shc_check_lane_change
+        and Vehicle.acc_check_lane_change
+
+        Args:
+            front (np.ndarray): row index of the front vehicle of every row
+
+        Returns:
+            np.ndarray: y-coord of every row after the lane changes
+        """
+
+        n = self.size
+        x, y = self.x[:n], self.y[:n]
+        is_convoy = self.is_convoy[:n]
+        loc_front = x + self.veh_length[:n] / 2
+
+        has_front = front >= 0
+        front_v = np.where(has_front, self.v[front], np.inf)
+        front_gap = np.where(has_front, self.back[front], np.inf) - loc_front
+
+        # SHC: left change if the front vehicle stopped on the right lane, keep right otherwise.
+        # Onramp vehicles merge from the middle of the onramp
+        shc_left = ~is_convoy & has_front & (front_v == 0) & (y == self.rightlane)
+        shc_right = ~is_convoy & has_front & (front_v < self.v_0[:n]) & ((y == self.leftlane) | (y == self.middlelane))
+        shc_onramp = ~is_convoy & (y == self.onramp) & (loc_front > self.onramp_length/2 + self.onramp_offset)
+        # ACC: keep left, right change only if the front vehicle stopped close ahead on the left lane
+        acc_right = is_convoy & has_front & (front_v == 0) & (y == self.leftlane) & (front_gap <= 2 * self.veh_length[:n])
+        acc_left = is_convoy & ((y == self.middlelane) | (y == self.rightlane))
+
+        new_y = y.copy()
+
+        rows = np.flatnonzero(shc_left | acc_left)
+        change = self.calc_lane_change(rows, 'left', front[rows])
+        # ACC do not change into the road closure lane
+        closed = self.road_closed_lane[rows]
+        change &= ~is_convoy[rows] | np.isnan(closed) | (y[rows] - self.lanewidth != closed)
+        new_y[rows[change]] -= self.lanewidth
+
+        rows = np.flatnonzero(shc_right | shc_onramp | acc_right)
+        change = self.calc_lane_change(rows, 'right', front[rows])
+        new_y[rows[change]] += self.lanewidth
+
+        return self.resolve_conflicts(new_y)
+
+
+    def resolve_conflicts(self, new_y: np.ndarray) -> np.ndarray:
+
+        """Cancels lane changes of vehicles merging side by side into the same lane
+        from opposite lanes. The vehicle further ahead keeps its lane change
+
+        Args:
+            new_y (np.ndarray): y-coord of every row after the lane changes
+
+        Returns:
+            np.ndarray: y-coord of every row after resolving the conflicts
+        """
+
+        n = self.size
+        changed = np.flatnonzero(new_y != self.y[:n])
+        if changed.shape[0] < 2:
+            return new_y
+
+        loc_front = self.x[:n] + self.veh_length[:n] / 2
+
+        # Front to back, earlier spawned vehicle first
+        changed = changed[np.lexsort((changed, -loc_front[changed], new_y[changed]))]
+        last_lane, last_origin, last_back = None, None, None
+        for row in changed.tolist():
+            if new_y[row] == last_lane and self.y[row] != last_origin and loc_front[row] > last_back:
+                new_y[row] = self.y[row]
+            else:
+                last_lane, last_origin, last_back = new_y[row], self.y[row], self.back[row]
+
+        return new_y
+
+
+    def update_vehicle(self) -> None:
+
+        """Updates all vehicle states with one batch of array operations,
+        following Vehicle.update_driving_params
+        """
+
+        n = self.size
+        if n == 0:
+            return
+
+        ts = self.ts
+        profiler = self.profiler
+        x, v, accel = self.x[:n], self.v[:n], self.accel[:n]
+        half_length = self.veh_length[:n] / 2
+
+        # Front vehicles from the global state
+        with profiler.phase('update_vehicle.lane_change'):
+            self.sort_lanes()
+            front = self.get_front_rows(np.arange(n), 0)
+            new_y = self.check_lane_change(front)
+
+        with profiler.phase('update_vehicle.idm'):
+            # Integration, negative velocity is not allowed
+            stopping = v + accel * ts < 0
+            safe_accel = np.where(stopping, accel, 1)
+            new_v = np.where(stopping, 0, v + accel * ts)
+            new_x = np.where(stopping,
+                             x - (1/2) * (v / safe_accel),
+                             x + ((new_v * ts) + accel * self.ts_squared/2))
+
+            # Gap to the front vehicle, the end of the onramp or the end of the road
+            has_front = front >= 0
+            on_onramp = (new_y == self.onramp) & ~has_front
+            dist = np.full(n, float(self.road_length))
+            dist[has_front] = np.maximum(self.back[front[has_front]] - (x + half_length)[has_front] - self.s_0[:n][has_front], 1e-9)
+            dist[on_onramp] = np.maximum(self.onramp_length + self.onramp_offset - (x + half_length)[on_onramp]
+                                         - self.s_0[:n][on_onramp] - self.veh_length[:n][on_onramp], 1e-9)
+            front_v = np.where(has_front, self.v[front], new_v)
+
+            new_accel = self.calc_acceleration(slice(0, n), new_v, front_v, dist) * ts
+
+            # Global update
+            self.x[:n], self.y[:n], self.v[:n], self.accel[:n] = new_x, new_y, new_v, new_accel
+
+        with profiler.phase('update_vehicle.global_despawn'):
+            self.stop_vehicles()
+            self.despawn_vehicles()
+            self.update_geometry()
+            self.sync_vehicles()
+
+        # Re-sort the lanes after the vehicles moved
+        with profiler.phase('update_vehicle.lane_index'):
+            self.lane_index.update()
+
+
+    def stop_vehicles(self) -> None:
+
+        """Simulate roadblock by setting the SHC vehicles at the road closure to 0m/s
+        """
+
+        if self.road_closed is None:
+            return
+
+        n = self.size
+        loc_front = self.x[:n] + self.veh_length[:n] / 2
+        stopped = (
+            ~self.is_convoy[:n]
+            & (self.y[:n] == self.road_closed)
+            & (loc_front >= self.road_length/2)
+            & (loc_front <= self.road_length/2 + 20)
+        )
+        self.v[:n][stopped] = 0
+        self.accel[:n][stopped] = 0
+
+
+    def despawn_vehicles(self) -> None:
+
+        """Removes the vehicles and sub-convoy vehicles that reached the end of the road
+        """
+
+        n = self.size
+        x, num_sub, convoy_dist = self.x[:n], self.num_sub[:n], self.convoy_dist[:n]
+        half_length = self.veh_length[:n] / 2
+
+        # Number of sub-convoy vehicles past the end of the road, counted from the lead
+        passed = np.ceil((x + half_length - self.road_length) / np.where(self.is_convoy[:n], convoy_dist, 1))
+        passed = np.where(x + half_length > self.road_length, np.clip(passed, 1, num_sub), 0)
+        remaining = num_sub - passed
+
+        for row in np.flatnonzero((passed > 0) & (remaining > 0)):
+            # Sub-convoy vehicle behind becomes the lead
+            self.vehicle_list[row].despawn_subconvoy(int(passed[row]))
+            x[row] -= passed[row] * convoy_dist[row]
+            num_sub[row] = remaining[row]
+
+        keep = remaining > 0
+        if keep.all():
+            return
+
+        despawned = int(np.count_nonzero(~keep & ~self.is_convoy[:n]))
+        self.vehicle_despawn += despawned
+        if self.testing:
+            self.progress_bar.update(despawned)
+
+        for row in np.flatnonzero(~keep):
+            self.lane_index.remove(self.vehicle_list[row])
+
+        self.vehicle_list = [vehicle for vehicle, kept in zip(self.vehicle_list, keep) if kept]
+        self.drivers = [driver for driver, kept in zip(self.drivers, keep) if kept]
+        self.size = len(self.vehicle_list)
+        for field in self.FIELDS + self.FLAGS:
+            array = getattr(self, field)
+            array[:self.size] = array[:n][keep]
+
+
+    def update_geometry(self) -> None:
+
+        """Updates the x-coord and back of every row as seen by the other vehicles
+        """
+
+        n = self.size
+        x, num_sub, convoy_dist = self.x[:n], self.num_sub[:n], self.convoy_dist[:n]
+        half_length = self.veh_length[:n] / 2
+
+        # Sub-convoy vehicles follow the lead at fixed offsets of convoy_dist
+        tail_x = x - (num_sub - 1) * convoy_dist
+
+        loc_front = x + half_length
+        self.back[:n] = tail_x - half_length
+        self.key[:n] = np.where(self.is_convoy[:n], loc_front - np.abs(loc_front - self.back[:n]) / 2, x)
+
+
+    def sync_vehicles(self) -> None:
+
+        """Writes the array states back to the Vehicle and Convoy instances
+        for rendering and recording
+        """
+
+        n = self.size
+        x, y, v, accel = self.x[:n].tolist(), self.y[:n].tolist(), self.v[:n].tolist(), self.accel[:n].tolist()
+
+        for row, (vehicle, driver) in enumerate(zip(self.vehicle_list, self.drivers)):
+            driver.local_loc = [x[row], y[row]]
+            driver.local_v = v[row]
+            driver.local_accel = accel[row]
+
+            if isinstance(vehicle, Convoy):
+                vehicle.update_convoy_global()
+            else:
+                driver.update_global()
@@ -1,7 +1,7 @@
 import pygame
 
-from common.config import window_params, road_params, driving_params, acc_params, simulation_params
-from typing import Any, Tuple, List
+from common.config import window_params, road_params
+from typing import Any, Tuple, List, Dict
 
 
 class Objects:
@@ -111,41 +111,50 @@ class UserButton(pygame.sprite.Sprite):
 
     def update(self) -> None:
 
-        """Updating user-interactable parameters
+        """Updating the button border
         """
 
         if self.is_selected:
             pygame.draw.rect(self.image, window_params['black'], self.image.get_rect(), 4)
-
-            # Road closure update
-            if self.button_name == "road_closed_off":
-                road_params["road_closed"] = None
-            elif self.button_name == "road_closed_left":
-                road_params["road_closed"] = "left"
-            elif self.button_name == "road_closed_middle":
-                road_params["road_closed"] = "middle"
-            elif self.button_name == "road_closed_right":
-                road_params["road_closed"] = "right"
-
-            # ACC driving logic update
-            if self.button_name == "acc_logic_normal":
-                driving_params["acc_logic"] = "normal"
-                acc_params["acc_spawnrate"] = 0.2
-            elif self.button_name == "acc_logic_cautious":
-                driving_params["acc_logic"] = "cautious"
-                acc_params["acc_spawnrate"] = 0.2
-            elif self.button_name == "acc_off":
-                acc_params["acc_spawnrate"] = 0
-
-            # SHC driving logic update
-            if self.button_name == "shc_logic_normal":
-                driving_params["shc_logic"] = "normal"
-            elif self.button_name == "shc_logic_irrational":
-                driving_params["shc_logic"] = "irrational"
         else:
             pygame.draw.rect(self.image, window_params['green'], self.image.get_rect(), 4)
 
 
+    def settings(self) -> Dict[str, Any]:
+
+        """Gets the user-interactable parameters set by the button when selected
+
+        Returns:
+            Dict[str, Any]: SimConfig parameter name -> value
+        """
+
+        # Road closure update
+        if self.button_name == "road_closed_off":
+            return {"road_closed": None}
+        if self.button_name == "road_closed_left":
+            return {"road_closed": "left"}
+        if self.button_name == "road_closed_middle":
+            return {"road_closed": "middle"}
+        if self.button_name == "road_closed_right":
+            return {"road_closed": "right"}
+
+        # ACC driving logic update
+        if self.button_name == "acc_logic_normal":
+            return {"acc_logic": "normal", "acc_spawnrate": 0.2}
+        if self.button_name == "acc_logic_cautious":
+            return {"acc_logic": "cautious", "acc_spawnrate": 0.2}
+        if self.button_name == "acc_off":
+            return {"acc_spawnrate": 0}
+
+        # SHC driving logic update
+        if self.button_name == "shc_logic_normal":
+            return {"shc_logic": "normal"}
+        if self.button_name == "shc_logic_irrational":
+            return {"shc_logic": "irrational"}
+
+        return {}
+
+
 class Slider():
 
     """Creating a Slider class
@@ -215,13 +224,6 @@ class Slider():
 
         value = int((value/value_range) * (self.max-self.min) + self.min)
 
-        if self.slider_name == "vehicle_inflow":
-            road_params["vehicle_inflow"] = value
-        if self.slider_name == "onramp_inflow":
-            road_params["onramp_inflow"] = value
-        if self.slider_name == "playback_speed":
-            simulation_params["playback_speed"] = value
-
         return value
 
 
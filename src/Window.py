@@ -1,36 +1,43 @@
 import sys
 import time
 import pygame
+import numpy as np
 
 from src.Visual import *
-from src.ACC import Convoy
+from src.FrameSnapshot import FrameSnapshot
 from src.Simulation import SimulationManager
-from statistics import harmonic_mean
-from common.config import window_params, road_params, simulation_params
+from src.SimConfig import SimConfig
+from common.config import window_params, simulation_params
+from typing import Optional
 
-SCALE = 10
 
 class Window:
 
     """Creating a WIndow class display
     """
 
-    def __init__(self) -> None:
+    def __init__(self, config: Optional[SimConfig] = None) -> None:
 
         """Initializing the Window parameters
+
+        Args:
+            config (Optional[SimConfig]): parameters of the simulation run, defaults to common/config.py
         """
 
+        config = SimConfig.from_params() if config is None else config
+
         # Creating the window
         self.width = window_params["window_width"]
         self.height = window_params["window_height"]
-        self.ts = simulation_params["ts"]
+        self.ts = config.ts
+        self.playback_speed = simulation_params["playback_speed"] # simulation steps per rendered frame
 
         self.vehicle_length = window_params["vehicle_length"]
         self.vehicle_width = window_params["vehicle_width"]
-        self.road_length = road_params["road_length"]
-        self.lanewidth = road_params["lanewidth"]
-        self.onramp_length = road_params['onramp_length']
-        self.num_lanes = road_params['num_lanes']
+        self.road_length = config.road_length
+        self.lanewidth = config.lanewidth
+        self.onramp_length = config.onramp_length
+        self.num_lanes = config.num_lanes
 
         # Creating window parameters
         pygame.init()
@@ -38,12 +45,12 @@ class Window:
         self.start = time.time()
 
         # Getting road y-coordinates
-        self.toplane_loc = road_params['toplane_loc']
-        self.onramp_x = self.toplane_loc[0] + road_params['onramp_offset']
-        self.onramp = self.toplane_loc[1]
-        self.leftlane = self.toplane_loc[1] + self.lanewidth
-        self.middlelane = self.toplane_loc[1] + (self.lanewidth * 2)
-        self.rightlane = self.toplane_loc[1] + self.lanewidth * (self.num_lanes - 1)
+        self.toplane_loc = config.toplane_loc
+        self.onramp_x = config.onramp_x
+        self.onramp = config.geometry.onramp
+        self.leftlane = config.geometry.leftlane
+        self.middlelane = config.geometry.middlelane
+        self.rightlane = config.geometry.rightlane
         self.road_width = self.lanewidth * (self.num_lanes - 1) + self.vehicle_width
 
         # Loading vehicle images
@@ -82,7 +89,7 @@ class Window:
         self.minimap.load_map()
 
         # Recording params
-        self.is_recording = simulation_params['record']
+        self.is_recording = config.record
         self.has_recorded = False
 
         # Pause/Unpause params
@@ -90,15 +97,14 @@ class Window:
         self.paused_time = 0
         self.start_time = pygame.time.get_ticks()  # Record the start time of the simulation
 
-        # Creating Real Time Metric Display
-        self.realtime_flow = [[], [], [], []]
+        # Creating Real Time Metric Display, the flows are measured by the first 4 detectors of the SimConfig
         self.mean_flow = []
         self.metric_list = [(10000,390), (30000,390), (80000,390), (159980, 390)] # 1st, 2nd, middle, last
         self.miniloc_list = [(128,75), (306,75), (745,75), (1438, 75)] # 1st, 2nd, middle, last
 
         # Setting up the Simulation
         self.is_running = True
-        self.sim = SimulationManager() # Create the simulation
+        self.sim = SimulationManager(config) # Create the simulation
 
 
     def create_buttons(self) -> None:
@@ -155,8 +161,8 @@ class Window:
         self.inflow_slider = Slider((self.traffic_datumn_x+934,self.traffic_datumn_y-25), (258,15), 4/7, 0, 7000, 10, "vehicle_inflow")
         self.onramp_slider = Slider((self.traffic_datumn_x+934,self.traffic_datumn_y), (258,15), 0, 0, 200, 10, "onramp_inflow")
         self.speed_slider = Slider((158, 43), (80,10), 2/7, 1, 7, 5, "playback_speed")
-        self.inflow_value = road_params['vehicle_inflow']
-        self.onramp_value = road_params['onramp_inflow']
+        self.inflow_value = self.sim.config.vehicle_inflow
+        self.onramp_value = self.sim.config.onramp_inflow
 
 
     def draw_timer(self, restart: bool) -> None:
@@ -229,7 +235,7 @@ class Window:
             (f"{self.inflow_value} veh/h", (self.traffic_datumn_x+1110, self.traffic_datumn_y-13), 20),
             (f"{self.onramp_value} veh/h", (self.traffic_datumn_x+1110, self.traffic_datumn_y+13), 20),
             ("Playback Speed", (60,52), 20),
-            (f"{simulation_params['playback_speed']} times", (230,52), 20),
+            (f"{self.playback_speed} times", (230,52), 20),
         ]
 
         text_font = pygame.font.Font(None, 20)
@@ -241,142 +247,25 @@ class Window:
             self.win.blit(text_surface, text_rect)
 
 
-    def speed_conversion(self, value: float) -> float:
-
-        """Converts pixel/s to km/h
-
-        Args:
-            value (float): pixel/s  speed
-
-        Returns:
-            float: km/h speed
-        """
-
-        # 1m = 10px
-        return float(value * (3600/(SCALE*1000)))
-
-
-    def density_conversion(self, value: float, dist: float) -> float:
-
-        """Computes vehicle density
-
-        Args:
-            value (float): pixel length
-            dist (float): km conversion
-
-        Returns:
-            float: number of vehicles/km
-        """
-
-        # Interval of 400 px
-        # 1m = 10px
-        return float(value * ((SCALE*1000)/dist))
-
-
-    def length_conversion(self, value: float) -> float:
-
-        """convert pixel to metres
-
-        Args:
-            value (float): pixel length
-
-        Returns:
-            float: scaled length in metres
-        """
-
-        return value * SCALE
-
-
-    def assign_section(self, loc: Tuple[float, float], speed: float, vehicle_metrics: List[List[float]]) -> None:
-
-        """Assigning vehicles to the 4 measured section and get their speed
-
-        Args:
-            loc (Tuple[float, float]): vehicle position
-            speed (float): vehicle speed
-            vehicle_metrics (List[List[float]]): collated vehicle speeds in the sections
-        """
-
-        for idx, metric_loc in enumerate(self.metric_list):
-            # Vehicles within 1km of the measured location
-            if loc[0] >= metric_loc[0] - self.length_conversion(500) and loc[0] <= metric_loc[0] + self.length_conversion(500):
-                vehicle_metrics[idx].append((speed, self.length_conversion(1000)))
-
-
-    def compute_metrics(self, vehicle_metric: List[List[float]], realtime_metrics: List[List[float]]) -> List[List[float]]:
-        """Computing the realtime metrics
-
-        Args:
-            vehicle_metric (List[List[float]]): collated vehicle speeds in the sections of each frame
-            realtime_metrics (List[List[float]]): computed traffic flow in each section of each frame
-
-        Returns:
-            List[List[float]]: updated computed traffic flow in each section of each frame
-        """
-
-        for idx, sections in enumerate(vehicle_metric):
-            num_vehicles = len(sections)
-            if num_vehicles > 0:
-                space_mean_speed = harmonic_mean([speed[0] for speed in sections])
-                flow = int(self.density_conversion(num_vehicles,sections[0][1]) * self.speed_conversion(space_mean_speed))
-                realtime_metrics[idx].append(flow)
-            else:
-                realtime_metrics[idx] = []
-
-        return realtime_metrics
-
-
-    def average_metrics(self, realtime_metrics: List[List[float]]) -> List[float]:
-
-        """Averaged metrics for each section
-
-        Args:
-            realtime_metrics (List[List[float]]): computed traffic flow in each section of each frame
-
-        Returns:
-            List[float]: averaged traffic flow of 10 frames
-        """
-
-        mean_flow = []
-
-        for section in realtime_metrics:
-            section_mean = int(sum(section) / len(section)) if len(section) > 0 else 0
-            mean_flow.append(section_mean)
-
-        return mean_flow
-
-
-    def refresh_window(self, vehicle_list: List[Any], frame: int) -> None:
+    def refresh_window(self, snapshot: FrameSnapshot) -> None:
 
         """Refreshes window per frame
 
         Args:
-            vehicle_list (List[Any]): list of Vehicle or Convoy instances
-            frame (int): frame counter
+            snapshot (FrameSnapshot): vehicle attributes of the frame
         """
 
-        vehicle_metrics = [[], [], [], []]
-
         # Drawing the vehicles
-        for vehicle in vehicle_list:
+        for vehicle_type, x, y in zip(snapshot.vehicle_types, snapshot.x.tolist(), snapshot.y.tolist()):
+            image = self.acc_image if vehicle_type == 'acc' else self.shc_image
+            self.bg.draw_vehicle(image, self.vehicle_length, self.vehicle_width, vehicle_loc=[x, y])
 
-            if isinstance(vehicle, Convoy):
-                for convoy in vehicle.convoy_list:
-                    # Indexing the convoy
-                    vehicle_id = convoy.vehicle_id()
-                    self.assign_section(loc=vehicle_id['location'], speed=vehicle_id['speed'], vehicle_metrics=vehicle_metrics)
-                    self.bg.draw_vehicle(self.acc_image, self.vehicle_length, self.vehicle_width, vehicle_loc=vehicle_id['location'])
-
-            else:
-                vehicle_id = vehicle.vehicle_id()
-                self.assign_section(loc=vehicle_id['location'], speed=vehicle_id['speed'], vehicle_metrics=vehicle_metrics)
-                self.bg.draw_vehicle(self.shc_image, self.vehicle_length, self.vehicle_width, vehicle_loc=vehicle_id['location'])
-
-        self.realtime_flow = self.compute_metrics(vehicle_metrics, self.realtime_flow)
-
-        # Average for every 10 frames
-        if (frame%10 == 0):
-            self.mean_flow = self.average_metrics(realtime_metrics=self.realtime_flow)
+        # Displaying the flow of the last detector interval at the metric locations
+        latest = None if self.sim.detectors is None else self.sim.detectors.latest()
+        if latest is not None:
+            # Sections past the end of the road emit NaN
+            flows = [int(flow) for flow in np.nan_to_num(latest['flow'][:len(self.metric_list)])]
+            self.mean_flow = flows + [0] * (len(self.metric_list) - len(flows))
 
 
     def out_bound_check(self, loc: float, diff: float) -> float:
@@ -450,13 +339,26 @@ class Window:
             self.bg.scroll_pos = x - 385
 
 
+    def apply_settings(self) -> None:
+
+        """Applies the selected buttons and slider values to the simulation
+        """
+
+        changes = {"vehicle_inflow": self.inflow_value, "onramp_inflow": self.onramp_value}
+        for button in self.global_buttons:
+            if button.is_selected:
+                changes.update(button.settings())
+
+        self.sim.update_config(**changes)
+
+
     def run_window(self) -> None:
 
         """Execute the window display
         """
 
         clock = pygame.time.Clock()
-        frame = 0
+        frame = 0 # simulation step
         self.create_buttons()
 
         while self.is_running:
@@ -470,6 +372,7 @@ class Window:
             # Road closure and logic buttons buttons
             self.global_buttons.draw(self.win)
             self.global_buttons.update()
+            self.apply_settings()
 
             # Simulation Button Presses
             restart = self.sim_button_press()
@@ -484,9 +387,9 @@ class Window:
                     if event.key == pygame.K_q:
                         self.is_running = False
                     if event.key == pygame.K_d:
-                        simulation_params['playback_speed'] = min(simulation_params['playback_speed'] + 1, 7)
+                        self.playback_speed = min(self.playback_speed + 1, 7)
                     if event.key == pygame.K_a:
-                        simulation_params['playback_speed'] = max(1, simulation_params['playback_speed'] - 1)
+                        self.playback_speed = max(1, self.playback_speed - 1)
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:  # Left mouse button
                         # Checking for logic button press
@@ -510,32 +413,33 @@ class Window:
                     self.onramp_value = self.onramp_slider.slider_value()
                 elif self.speed_slider.slide_rect.collidepoint(pygame.mouse.get_pos()) and pygame.mouse.get_pressed()[0]:
                     self.speed_slider.move_slider(pygame.mouse.get_pos())
-                    simulation_params['playback_speed'] = self.speed_slider.slider_value()
+                    self.playback_speed = self.speed_slider.slider_value()
 
             if not self.is_paused:
-                # Updates simulation frame
-                vehicle_list, _ = self.sim.update_frame(is_recording=self.is_recording, frame=frame, restart=restart)
+                # Playback speed is the number of simulation steps per rendered frame
+                for step in range(self.playback_speed):
+                    self.sim.update_frame(is_recording=self.is_recording, frame=frame, restart=restart and step == 0)
+                    frame += 1
 
                 # Display newly updated frame on Window
-                self.refresh_window(vehicle_list=vehicle_list, frame=frame)
-                frame += 1
+                self.refresh_window(snapshot=self.sim.frame_snapshot())
                 pygame.display.update()
-                clock.tick(1./self.ts * simulation_params['playback_speed'])
+                clock.tick(1./self.ts)
             else:
-                self.refresh_window(vehicle_list=vehicle_list, frame=frame)
+                self.refresh_window(snapshot=self.sim.frame_snapshot())
                 pygame.display.update()
 
             # Resets simulation parameters
             if restart:
                 frame = 0
-                self.realtime_flow = [[], [], [], []]
-                vehicle_list, _ = self.sim.update_frame(is_recording=self.is_recording, frame=frame, restart=restart)
-                self.refresh_window(vehicle_list=vehicle_list, frame=frame)
+                self.mean_flow = []
+                self.sim.update_frame(is_recording=self.is_recording, frame=frame, restart=restart)
+                self.refresh_window(snapshot=self.sim.frame_snapshot())
                 pygame.display.update()
-                clock.tick(1./self.ts * simulation_params['playback_speed'])
+                clock.tick(1./self.ts)
 
         # Saves Data
-        if simulation_params['testing']:
+        if self.sim.config.testing:
             self.sim.saving_record()
             print("Saving Record")
         elif self.has_recorded: